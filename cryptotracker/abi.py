@@ -0,0 +1,251 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ape import Contract, networks
+from ape.contracts import ContractInstance
+from django.conf import settings
+
+from cryptotracker.constants import (
+    MULTICALL3_ADDRESS,
+    NETWORKS,
+    POOL_TYPES,
+    PROTOCOLS_DATA,
+    TOKENS,
+)
+
+
+def _function(
+    name: str,
+    inputs: List[str],
+    outputs: List[Dict],
+    state_mutability: str = "view",
+) -> Dict:
+    return {
+        "type": "function",
+        "name": name,
+        "stateMutability": state_mutability,
+        "inputs": [
+            {"name": f"arg{i}", "type": type_} for i, type_ in enumerate(inputs)
+        ],
+        "outputs": outputs,
+    }
+
+
+def _uint(name: str = "") -> Dict:
+    return {"name": name, "type": "uint256"}
+
+
+# Minimal ABIs of the interfaces the app reads. Binding a contract with one of them
+# needs no explorer lookup.
+MINIMAL_ABIS: Dict[str, List[Dict]] = {
+    "ERC20": [
+        _function("balanceOf", ["address"], [_uint()]),
+    ],
+    # aggregate3 is payable in the deployed contract. It is declared as view here so
+    # that ape routes it through eth_call instead of building a transaction.
+    "MULTICALL3": [
+        {
+            "type": "function",
+            "name": "aggregate3",
+            "stateMutability": "view",
+            "inputs": [
+                {
+                    "name": "calls",
+                    "type": "tuple[]",
+                    "components": [
+                        {"name": "target", "type": "address"},
+                        {"name": "allowFailure", "type": "bool"},
+                        {"name": "callData", "type": "bytes"},
+                    ],
+                }
+            ],
+            "outputs": [
+                {
+                    "name": "returnData",
+                    "type": "tuple[]",
+                    "components": [
+                        {"name": "success", "type": "bool"},
+                        {"name": "returnData", "type": "bytes"},
+                    ],
+                }
+            ],
+        },
+        _function("getEthBalance", ["address"], [_uint("balance")]),
+    ],
+    "LIQUITY_STAKING": [
+        _function("stakes", ["address"], [_uint()]),
+        _function("getPendingETHGain", ["address"], [_uint()]),
+        _function("getPendingLUSDGain", ["address"], [_uint()]),
+    ],
+    "LIQUITY_V1_STABILITY_POOL": [
+        _function(
+            "deposits",
+            ["address"],
+            [_uint("initialValue"), {"name": "frontEndTag", "type": "address"}],
+        ),
+        _function("getDepositorETHGain", ["address"], [_uint()]),
+        _function("getDepositorLQTYGain", ["address"], [_uint()]),
+    ],
+    "LIQUITY_V2_GOVERNANCE": [
+        _function(
+            "deriveUserProxyAddress", ["address"], [{"name": "", "type": "address"}]
+        ),
+    ],
+    "LIQUITY_V2_STABILITY_POOL": [
+        _function("deposits", ["address"], [_uint()]),
+        _function("getDepositorCollGain", ["address"], [_uint()]),
+        _function("getDepositorYieldGain", ["address"], [_uint()]),
+    ],
+    "AAVE_POOL_ADDRESSES_PROVIDER": [
+        _function("getPoolDataProvider", [], [{"name": "", "type": "address"}]),
+    ],
+    "AAVE_PROTOCOL_DATA_PROVIDER": [
+        _function(
+            "getAllReservesTokens",
+            [],
+            [
+                {
+                    "name": "",
+                    "type": "tuple[]",
+                    "components": [
+                        {"name": "symbol", "type": "string"},
+                        {"name": "tokenAddress", "type": "address"},
+                    ],
+                }
+            ],
+        ),
+        _function(
+            "getUserReserveData",
+            ["address", "address"],
+            [
+                _uint("currentATokenBalance"),
+                _uint("currentStableDebt"),
+                _uint("currentVariableDebt"),
+                _uint("principalStableDebt"),
+                _uint("scaledVariableDebt"),
+                _uint("stableBorrowRate"),
+                _uint("liquidityRate"),
+                {"name": "stableRateLastUpdated", "type": "uint40"},
+                {"name": "usageAsCollateralEnabled", "type": "bool"},
+            ],
+        ),
+    ],
+}
+
+# Interface of each pool type of the protocols in PROTOCOLS_DATA
+PROTOCOL_POOL_INTERFACES = {
+    ("LQTY_V1", POOL_TYPES["STAKING"]): "LIQUITY_STAKING",
+    ("LQTY_V1", POOL_TYPES["STABILITY_POOL"]): "LIQUITY_V1_STABILITY_POOL",
+    ("LQTY_V2", POOL_TYPES["STAKING"]): "LIQUITY_V2_GOVERNANCE",
+    ("LQTY_V2", POOL_TYPES["STABILITY_POOL"]): "LIQUITY_V2_STABILITY_POOL",
+    ("AAVE_V3", POOL_TYPES["LENDING"]): "AAVE_POOL_ADDRESSES_PROVIDER",
+}
+
+
+def chain_key(network_choice: str) -> str:
+    """
+    Returns the "ecosystem:network" part of an ape network choice, e.g. "ethereum:mainnet".
+    """
+    return ":".join(network_choice.split(":")[:2])
+
+
+class AbiStore:
+    """
+    On-disk store of contract ABIs keyed by (chain, address).
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _path(self, chain: str, address: str) -> Path:
+        return self.directory / chain.replace(":", "_") / f"{address.lower()}.json"
+
+    def get(self, chain: str, address: str) -> Optional[List[Dict]]:
+        path = self._path(chain, address)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logging.warning(f"Invalid ABI cache file {path}: {e}")
+            return None
+
+    def put(self, chain: str, address: str, abi: List[Dict]) -> None:
+        path = self._path(chain, address)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(abi))
+
+    def seed(self) -> int:
+        """
+        Stores the minimal ABI of every contract address listed in TOKENS and PROTOCOLS_DATA.
+        Returns:
+            int: The number of ABIs written.
+        """
+        count = 0
+        for network, chain in _network_chains().items():
+            self.put(chain, MULTICALL3_ADDRESS, MINIMAL_ABIS["MULTICALL3"])
+            count += 1
+            for token in TOKENS.values():
+                address = token["token_address"].get(network)
+                if address and address != "NativeToken":
+                    self.put(chain, address, MINIMAL_ABIS["ERC20"])
+                    count += 1
+        for protocol_key, protocol_data in PROTOCOLS_DATA.items():
+            for network, chain in _network_chains().items():
+                for pool in protocol_data.get(network, []):
+                    interface = PROTOCOL_POOL_INTERFACES.get(
+                        (protocol_key, pool["type"])
+                    )
+                    if interface and pool["contract_address"]:
+                        self.put(
+                            chain, pool["contract_address"], MINIMAL_ABIS[interface]
+                        )
+                        count += 1
+        return count
+
+
+def _network_chains() -> Dict[str, str]:
+    return {
+        network["name"]: chain_key(network["url_rpc"]) for network in NETWORKS.values()
+    }
+
+
+abi_store = AbiStore(settings.ABI_CACHE_DIR)
+
+
+def get_contract(
+    address: Optional[str], interface: Optional[str] = None
+) -> ContractInstance:
+    """
+    Binds a contract on the active network, avoiding explorer lookups when the ABI is known.
+    The ABI is taken from the bundled minimal ABIs when an interface is given, then from the
+    on-disk ABI store. Otherwise it is resolved by ape and saved in the store for the next time.
+    Args:
+        address (str): The contract address. None, as read from a pool without
+            contract_address, raises a ValueError.
+        interface (str, optional): A key of MINIMAL_ABIS.
+    Returns:
+        ContractInstance: The bound contract.
+    """
+    if not address:
+        raise ValueError(f"No contract address given for {interface or 'a contract'}")
+    chain = chain_key(networks.provider.network_choice)
+    abi = MINIMAL_ABIS[interface] if interface else abi_store.get(chain, address)
+    if abi:
+        return Contract(address, abi=abi, fetch_from_explorer=False, detect_proxy=False)
+
+    contract = Contract(address)
+    try:
+        abi_store.put(
+            chain,
+            address,
+            [
+                item.model_dump(mode="json", by_alias=True)
+                for item in contract.contract_type.abi
+            ],
+        )
+    except Exception as e:
+        logging.warning(f"Could not cache the ABI of {address}: {e}")
+    return contract
@@ -1,6 +1,22 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Sum
 
-from cryptotracker.models import Account, Cryptocurrency, Network, Pool, Price, Protocol
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    Network,
+    Pool,
+    Price,
+    Protocol,
+    SnapshotRun,
+    SnapshotStageTiming,
+    SnapshotWorkUnit,
+)
+from cryptotracker.tasks import resume_snapshot, unresumable_reason
+from cryptotracker.timing import source_trends, summarise_sources
+
+# Most recent runs compared per source above the list of runs
+TREND_RUNS = 10
 
 
 # Register your models here.
@@ -28,9 +44,116 @@ class ProtocolAdmin(admin.ModelAdmin):
     pass
 
 
+class SnapshotRunAdmin(admin.ModelAdmin):
+    """Runs of the snapshot pipeline, with the time spent on each source"""
+
+    list_display = ("snapshot", "user", "started_at", "duration", "units", "failed_units", "calls", "bytes", "errors")
+    list_select_related = ("snapshot", "user")
+    date_hierarchy = "started_at"
+    actions = ["resume_snapshots"]
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                calls=Sum("stages__calls"),
+                bytes=Sum("stages__bytes"),
+                errors=Sum("stages__errors"),
+            )
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Duration (s)")
+    def duration(self, run):
+        return None if run.duration is None else round(run.duration, 1)
+
+    @admin.display(ordering="calls")
+    def calls(self, run):
+        return run.calls
+
+    @admin.display(ordering="bytes")
+    def bytes(self, run):
+        return run.bytes
+
+    @admin.display(ordering="errors")
+    def errors(self, run):
+        return run.errors
+
+    @admin.action(description="Resume the unfinished work units of the selected snapshots")
+    def resume_snapshots(self, request, queryset):
+        queued = 0
+        for snapshot_id in set(queryset.values_list("snapshot_id", flat=True)):
+            reason = unresumable_reason(snapshot_id)
+            if reason is not None:
+                self.message_user(request, f"Snapshot {snapshot_id} cannot be resumed: {reason}", messages.WARNING)
+                continue
+            resume_snapshot.delay(snapshot_id)
+            queued += 1
+        self.message_user(request, f"Queued the resumption of {queued} snapshots")
+
+    def changelist_view(self, request, extra_context=None):
+        runs = list(SnapshotRun.objects.select_related("snapshot")[:TREND_RUNS])[::-1]
+        extra_context = {**(extra_context or {}), "trend_runs": runs, "trends": source_trends(runs)}
+        return super().changelist_view(request, extra_context)
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        stages = SnapshotStageTiming.objects.filter(run_id=object_id)
+        extra_context = {
+            **(extra_context or {}),
+            "sources": summarise_sources(stages),
+            "slowest_stages": stages.select_related("user_address", "network").order_by("-duration")[:10],
+        }
+        return super().change_view(request, object_id, form_url, extra_context)
+
+
+class SnapshotStageTimingAdmin(admin.ModelAdmin):
+    """Timings of the stages of the runs, totalled per source for the filtered stages"""
+
+    list_display = ("run", "source", "user_address", "network", "duration", "write_duration", "calls", "bytes", "errors", "rows")
+    list_filter = ("source", "network", "run")
+    list_select_related = ("run", "user_address", "network")
+    ordering = ("-run", "-duration")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        # Redirects and error pages have no changelist to summarise
+        if hasattr(response, "context_data") and "cl" in response.context_data:
+            response.context_data["sources"] = summarise_sources(response.context_data["cl"].queryset)
+        return response
+
+
+class SnapshotWorkUnitAdmin(admin.ModelAdmin):
+    """Completion state of the work units of the snapshots"""
+
+    list_display = ("snapshot", "source", "user_address", "network", "status", "attempts", "error", "updated_at")
+    list_filter = ("status", "source", "snapshot")
+    list_select_related = ("snapshot", "user_address", "network")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Cryptocurrency, CryptocurrencyAdmin)
 admin.site.register(Price, PriceAdmin)
 admin.site.register(Account, AccountAdmin)
 admin.site.register(Network, NetworkAdmin)
 admin.site.register(Pool, PoolAdmin)
 admin.site.register(Protocol, ProtocolAdmin)
+admin.site.register(SnapshotRun, SnapshotRunAdmin)
+admin.site.register(SnapshotStageTiming, SnapshotStageTimingAdmin)
+admin.site.register(SnapshotWorkUnit, SnapshotWorkUnitAdmin)
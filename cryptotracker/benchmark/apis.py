@@ -0,0 +1,192 @@
+import re
+from typing import Any, Dict, List
+
+from cryptotracker.benchmark.server import (
+    Response,
+    StandInServer,
+    derived_address,
+    digest,
+    token_amount,
+)
+from cryptotracker.protocols.liquity_pools import LQTY_V2_SUBGRAPH_ID
+from cryptotracker.protocols.uniswap import UNISWAP_V3_SUBGRAPH_ID
+
+# Symbols of the tokens of the mocked Uniswap V3 positions
+UNISWAP_TOKENS = ("WETH", "USDC")
+
+# First index of the validators assigned to the addresses
+FIRST_VALIDATOR_INDEX = 1_000_000
+
+
+def _price(crypto_id: str) -> float:
+    """
+    Returns a stable price between 0.01 and 10000 EUR.
+    """
+    return round(0.01 + digest(crypto_id, "price") % 1_000_000 / 100, 2)
+
+
+class CoinGeckoStandIn(StandInServer):
+    """
+    Stands in for the CoinGecko endpoints of settings.COINGECKO_API_URL.
+    """
+
+    name = "coingecko"
+
+    def handle_get(self, path: str, params: Dict[str, str]) -> Response:
+        parts = path.strip("/").split("/")
+        if parts == ["simple", "price"]:
+            self.count("simple/price")
+            return 200, {
+                crypto_id: {params["vs_currencies"]: _price(crypto_id)}
+                for crypto_id in params["ids"].split(",")
+            }
+        if len(parts) == 3 and parts[0] == "coins" and parts[2] == "history":
+            self.count("coins/history")
+            return 200, {"market_data": {"current_price": {"eur": _price(parts[1])}}}
+        if parts[0] == "coins" and parts[2:] == ["market_chart", "range"]:
+            self.count("coins/market_chart/range")
+            day = 24 * 60 * 60
+            start, end = int(params["from"]), int(params["to"])
+            return 200, {
+                "prices": [
+                    [timestamp * 1000, _price(parts[1])]
+                    for timestamp in range(start, end + 1, day)
+                ]
+            }
+        return super().handle_get(path, params)
+
+
+class BeaconchainStandIn(StandInServer):
+    """
+    Stands in for the Beaconcha.in validator endpoints of settings.BEACONCHAIN_API_URL.
+    Each address withdraws from `validators` validators, numbered in the order the
+    addresses are first looked up.
+    """
+
+    name = "beaconchain"
+
+    def __init__(self, validators: int = 2, latency: float = 0.0):
+        super().__init__(latency)
+        self.validators = validators
+        self.indexes: Dict[str, List[int]] = {}
+
+    def _indexes_of(self, address: str) -> List[int]:
+        with self._lock:
+            if address.lower() not in self.indexes:
+                first = FIRST_VALIDATOR_INDEX + len(self.indexes) * self.validators
+                self.indexes[address.lower()] = list(
+                    range(first, first + self.validators)
+                )
+            return self.indexes[address.lower()]
+
+    def handle_get(self, path: str, params: Dict[str, str]) -> Response:
+        parts = path.strip("/").split("/")
+        if parts[0] != "validator" or len(parts) < 2:
+            return super().handle_get(path, params)
+
+        if parts[1] == "withdrawalCredentials":
+            self.count("validator/withdrawalCredentials")
+            return 200, {
+                "data": [
+                    {"validatorindex": index, "publickey": self._pubkey(index)}
+                    for index in self._indexes_of(parts[2])
+                ]
+            }
+
+        indexes = [int(index) for index in parts[1].split(",")]
+        if parts[2:] == ["execution", "performance"]:
+            self.count("validator/execution/performance")
+            return 200, {
+                "data": [
+                    {
+                        "validatorindex": index,
+                        "performanceTotal": token_amount(index, "execution") // 100,
+                    }
+                    for index in indexes
+                ]
+            }
+        if parts[2:] == ["performance"]:
+            self.count("validator/performance")
+            return 200, {
+                "data": [
+                    {
+                        "validatorindex": index,
+                        "performancetotal": token_amount(index, "consensus") // 10**11,
+                    }
+                    for index in indexes
+                ]
+            }
+        self.count("validator")
+        return 200, {
+            "data": [
+                {
+                    "validatorindex": index,
+                    "pubkey": self._pubkey(index),
+                    "withdrawalcredentials": f"0x01{'0' * 22}{index:040x}",
+                    "balance": 32 * 10**9 + digest(index, "balance") % 10**9,
+                    "activationepoch": 200_000 + index % 10_000,
+                    "status": "active_online",
+                }
+                for index in indexes
+            ]
+        }
+
+    def _pubkey(self, index: int) -> str:
+        return f"0x{digest(index, 'pubkey') % 2**384:096x}"
+
+
+class SubgraphStandIn(StandInServer):
+    """
+    Stands in for the Liquity V2 and Uniswap V3 subgraphs of settings.THE_GRAPH_API_URL.
+    Each address has `troves` troves and `positions` Uniswap V3 positions.
+    """
+
+    name = "subgraph"
+
+    def __init__(self, troves: int = 1, positions: int = 1, latency: float = 0.0):
+        super().__init__(latency)
+        self.troves = troves
+        self.positions = positions
+
+    def handle_post(self, path: str, body: Any) -> Response:
+        subgraph_id = path.rstrip("/").split("/")[-1]
+        match = re.search(r'(?:borrower|owner):\s*"(0x[0-9a-fA-F]{40})"', body["query"])
+        if match is None:
+            return 400, {"errors": [{"message": "No address in the query"}]}
+        address = match.group(1)
+
+        if subgraph_id == LQTY_V2_SUBGRAPH_ID:
+            self.count("liquity v2 troves")
+            return 200, {"data": {"troves": self._troves(address)}}
+        if subgraph_id == UNISWAP_V3_SUBGRAPH_ID:
+            self.count("uniswap v3 positions")
+            return 200, {"data": {"positions": self._positions(address)}}
+        return 404, {"errors": [{"message": f"Unknown subgraph {subgraph_id}"}]}
+
+    def _troves(self, address: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": derived_address(address, "trove", index),
+                "createdAt": "1735689600",
+                "collateral": {"collIndex": index % 3},
+                "deposit": str(token_amount(address, "deposit", index)),
+                "debt": str(token_amount(address, "debt", index) // 10),
+                "interestRate": str(5 * 10**16),
+            }
+            for index in range(self.troves)
+        ]
+
+    def _positions(self, address: str) -> List[Dict[str, Any]]:
+        positions = []
+        for index in range(self.positions):
+            position: Dict[str, Any] = {
+                "id": str(digest(address, "position", index) % 10**6),
+                "liquidity": "1",
+            }
+            for key, symbol in enumerate(UNISWAP_TOKENS):
+                amount = token_amount(address, symbol, index) / 10**18
+                position[f"token{key}"] = {"symbol": symbol, "decimals": "18"}
+                position[f"depositedToken{key}"] = str(amount)
+                position[f"collectedFeesToken{key}"] = str(round(amount / 100, 6))
+            positions.append(position)
+        return positions
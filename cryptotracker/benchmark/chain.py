@@ -0,0 +1,191 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+
+from eth_abi import decode, encode
+from eth_typing import ABIFunction
+from eth_utils.abi import (
+    function_abi_to_4byte_selector,
+    get_abi_input_types,
+    get_abi_output_types,
+)
+
+from cryptotracker.abi import MINIMAL_ABIS, PROTOCOL_POOL_INTERFACES
+from cryptotracker.benchmark.server import (
+    Response,
+    StandInServer,
+    derived_address,
+    token_amount,
+)
+from cryptotracker.constants import MULTICALL3_ADDRESS, PROTOCOLS_DATA, TOKENS
+
+# Block every snapshot is pinned to
+BLOCK_NUMBER = 20_000_000
+
+# Address returned by the getPoolDataProvider call of the Aave pool addresses provider
+AAVE_DATA_PROVIDER_ADDRESS = derived_address("aave", "data provider")
+
+# Reserves listed by the Aave data provider
+AAVE_RESERVES = ("WETH", "wstETH", "USDC")
+
+ZERO_HASH = "0x" + "00" * 32
+
+
+class ChainStandIn(StandInServer):
+    """
+    JSON-RPC node standing in for the chains read by the snapshot tasks, one chain per
+    URL path ("/<chain ID>"). The contracts of MULTICALL3, the tokens and the protocol pools
+    are mocked from their minimal ABIs: every address holds a stable, non-zero amount in
+    each of them, so that every read of the pipeline produces rows.
+    """
+
+    name = "rpc"
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        # ABI entry of each mocked function, keyed by contract address and selector
+        self.functions: Dict[str, Dict[bytes, ABIFunction]] = {}
+        self._mock(MULTICALL3_ADDRESS, "MULTICALL3")
+        self._mock(AAVE_DATA_PROVIDER_ADDRESS, "AAVE_PROTOCOL_DATA_PROVIDER")
+        for token in TOKENS.values():
+            for address in token["token_address"].values():
+                if address and address != "NativeToken":
+                    self._mock(address, "ERC20")
+        for protocol_key, protocol_data in PROTOCOLS_DATA.items():
+            for pools in protocol_data.values():
+                if not isinstance(pools, list):
+                    continue
+                for pool in pools:
+                    interface = PROTOCOL_POOL_INTERFACES.get(
+                        (protocol_key, pool["type"])
+                    )
+                    if interface and pool["contract_address"]:
+                        self._mock(pool["contract_address"], interface)
+
+        self.special_functions: Dict[str, Callable[[str, List[Any]], List[Any]]] = {
+            "aggregate3": self._aggregate3,
+            "getPoolDataProvider": lambda target, args: [AAVE_DATA_PROVIDER_ADDRESS],
+            "getAllReservesTokens": self._reserves,
+        }
+
+    def url_of(self, chain_id: int) -> str:
+        return f"{self.url}/{chain_id}"
+
+    def _mock(self, address: str, interface: str) -> None:
+        functions = [
+            cast(ABIFunction, function) for function in MINIMAL_ABIS[interface]
+        ]
+        self.functions[address.lower()] = {
+            function_abi_to_4byte_selector(function): function for function in functions
+        }
+
+    def handle_post(self, path: str, body: Any) -> Response:
+        chain_id = int(path.strip("/") or 1)
+        if isinstance(body, list):
+            return 200, [self._rpc(chain_id, request) for request in body]
+        return 200, self._rpc(chain_id, body)
+
+    def _rpc(self, chain_id: int, request: Dict) -> Dict:
+        method, params = request["method"], request.get("params", [])
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        if method == "eth_call":
+            result = self.call(params[0]["to"], bytes.fromhex(params[0]["data"][2:]))
+            if result is None:
+                response["error"] = {"code": 3, "message": "execution reverted"}
+            else:
+                response["result"] = "0x" + result.hex()
+            return response
+
+        self.count(method)
+        results = {
+            "web3_clientVersion": lambda: "Geth/v1.14.0-stand-in",
+            "eth_chainId": lambda: hex(chain_id),
+            "net_version": lambda: str(chain_id),
+            "eth_blockNumber": lambda: hex(BLOCK_NUMBER),
+            "eth_getBlockByNumber": lambda: self._block(params[0]),
+            "eth_getBalance": lambda: hex(token_amount(params[0], "native")),
+            "eth_getCode": lambda: "0x6080604052",
+            "eth_gasPrice": lambda: hex(10**9),
+        }
+        if method not in results:
+            response["error"] = {"code": -32601, "message": f"{method} not supported"}
+        else:
+            response["result"] = results[method]()
+        return response
+
+    def call(self, target: str, data: bytes, via: str = "eth_call") -> Optional[bytes]:
+        """
+        Executes a read of a mocked contract and returns its ABI-encoded output,
+        or None when the contract or function is unknown.
+        The read is counted as "<via>:<function name>".
+        """
+        function = self.functions.get(target.lower(), {}).get(data[:4])
+        if function is None:
+            self.count(f"{via}:unknown")
+            return None
+        self.count(f"{via}:{function['name']}")
+
+        args = list(decode(get_abi_input_types(function), data[4:]))
+        output_types = get_abi_output_types(function)
+        special = self.special_functions.get(function["name"])
+        if special is not None:
+            values = special(target, args)
+        else:
+            values = [
+                self._value(type_, target, function["name"], index, args)
+                for index, type_ in enumerate(output_types)
+            ]
+        return encode(output_types, values)
+
+    def _value(
+        self, type_: str, target: str, name: str, index: int, args: List[Any]
+    ) -> Any:
+        if type_.startswith("uint"):
+            return token_amount(target, name, index, *args) % 2 ** int(type_[4:])
+        if type_ == "address":
+            return derived_address(target, name, *args)
+        if type_ == "bool":
+            return True
+        raise ValueError(f"No mocked value of type {type_}")
+
+    def _aggregate3(self, target: str, args: List[Any]) -> List[Any]:
+        results: List[Tuple[bool, bytes]] = []
+        for call_target, _, call_data in args[0]:
+            result = self.call(call_target, call_data, via="aggregate3")
+            results.append((result is not None, result or b""))
+        return [results]
+
+    def _reserves(self, target: str, args: List[Any]) -> List[Any]:
+        return [
+            [
+                (token["symbol"], token["token_address"]["Ethereum"])
+                for token in TOKENS.values()
+                if token["symbol"] in AAVE_RESERVES
+            ]
+        ]
+
+    def _block(self, block_id: str) -> Dict:
+        number = (
+            BLOCK_NUMBER if block_id in ("latest", "pending") else int(block_id, 16)
+        )
+        return {
+            "number": hex(number),
+            "hash": "0x" + f"{number:064x}",
+            "parentHash": "0x" + f"{number - 1:064x}",
+            "timestamp": hex(1_700_000_000 + number * 12),
+            "gasLimit": hex(30_000_000),
+            "gasUsed": "0x0",
+            "baseFeePerGas": hex(10**9),
+            "difficulty": "0x0",
+            "totalDifficulty": "0x0",
+            "size": "0x0",
+            "nonce": "0x0000000000000000",
+            "miner": "0x" + "00" * 20,
+            "extraData": "0x",
+            "logsBloom": "0x" + "00" * 256,
+            "mixHash": ZERO_HASH,
+            "receiptsRoot": ZERO_HASH,
+            "sha3Uncles": ZERO_HASH,
+            "stateRoot": ZERO_HASH,
+            "transactionsRoot": ZERO_HASH,
+            "transactions": [],
+            "uncles": [],
+        }
@@ -0,0 +1,182 @@
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator, List, NamedTuple
+
+from ape import networks
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import override_settings
+from eth_utils import to_checksum_address
+
+from cryptotracker.abi import chain_key
+from cryptotracker.benchmark.apis import (
+    BeaconchainStandIn,
+    CoinGeckoStandIn,
+    SubgraphStandIn,
+)
+from cryptotracker.benchmark.chain import ChainStandIn
+from cryptotracker.benchmark.server import StandInServer, derived_address
+from cryptotracker.models import (
+    Account,
+    Network,
+    PoolBalanceSnapshot,
+    PoolRewardsSnapshot,
+    PortfolioValuation,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    TroveSnapshot,
+    UserAddress,
+    ValidatorSnapshot,
+    WalletType,
+)
+from cryptotracker.providers import provider_manager
+from cryptotracker.tasks import run_daily_snapshot_update
+from dcp.celery import app
+
+# Rows of a snapshot counted after each run
+SNAPSHOT_MODELS = (
+    Price,
+    SnapshotAssets,
+    ValidatorSnapshot,
+    PoolBalanceSnapshot,
+    PoolRewardsSnapshot,
+    TroveSnapshot,
+    PortfolioValuation,
+)
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+class PipelineRun(NamedTuple):
+    """
+    The measures of one run of the snapshot pipeline.
+    """
+
+    addresses: int
+    wall_time: float
+    # Requests served by each stand-in, by endpoint
+    calls: Dict[str, Counter]
+    # Database statements, by type (SELECT, INSERT, ...)
+    statements: Counter
+    # Rows of the snapshot, by model
+    rows: Dict[str, int]
+    summary: str
+
+    @property
+    def writes(self) -> int:
+        return sum(self.statements[statement] for statement in WRITE_STATEMENTS)
+
+
+@contextmanager
+def stand_ins(
+    latency: float = 0.0, validators: int = 2, troves: int = 1, positions: int = 1
+) -> Iterator[List[StandInServer]]:
+    """
+    Starts the local stand-ins of the chains and APIs read by the pipeline, and points the
+    settings at them for the duration of the context. The provider of each chain is
+    connected up front, and Celery tasks run eagerly, in the calling process, so that a
+    snapshot runs end to end in one call.
+    Args:
+        latency (float): Seconds each stand-in waits before responding.
+        validators (int): Validators of each address.
+        troves (int): Liquity V2 troves of each address.
+        positions (int): Uniswap V3 positions of each address.
+    Yields:
+        list: The started stand-ins.
+    """
+    chain = ChainStandIn(latency)
+    coingecko = CoinGeckoStandIn(latency)
+    beaconchain = BeaconchainStandIn(validators, latency)
+    subgraph = SubgraphStandIn(troves, positions, latency)
+    servers: List[StandInServer] = [chain, coingecko, beaconchain, subgraph]
+
+    rpc_urls = {}
+    for network in Network.objects.all():
+        if not network.url_rpc:
+            continue
+        chain_choice = chain_key(network.url_rpc)
+        ecosystem, network_name = chain_choice.split(":")
+        chain_id = networks.get_ecosystem(ecosystem).get_network(network_name).chain_id
+        rpc_urls[chain_choice] = chain.url_of(chain_id)
+
+    eager = app.conf.task_always_eager
+    with ExitStack() as stack:
+        for server in servers:
+            stack.enter_context(server)
+        stack.enter_context(
+            override_settings(
+                COINGECKO_API_URL=coingecko.url,
+                BEACONCHAIN_API_URL=beaconchain.url,
+                THE_GRAPH_API_URL=subgraph.url,
+                RPC_URLS=rpc_urls,
+            )
+        )
+        stack.callback(provider_manager.close_all)
+        # Workers keep their provider connections open across snapshots
+        for network in Network.objects.all():
+            if network.url_rpc:
+                with provider_manager.borrow(network.url_rpc):
+                    pass
+        app.conf.task_always_eager = True
+        try:
+            yield servers
+        finally:
+            app.conf.task_always_eager = eager
+
+
+def seed_addresses(count: int, prefix: str = "benchmark") -> User:
+    """
+    Creates a user with `count` addresses.
+    """
+    user = User.objects.create(username=f"{prefix}-{count}-{User.objects.count()}")
+    account = Account.objects.create(user=user, name="Benchmark")
+    wallet_type = WalletType.objects.first()
+    UserAddress.objects.bulk_create(
+        UserAddress(
+            user=user,
+            public_address=to_checksum_address(derived_address(user.username, index)),
+            account=account,
+            wallet_type=wallet_type,
+        )
+        for index in range(count)
+    )
+    return user
+
+
+def run_pipeline(user: User, servers: List[StandInServer]) -> PipelineRun:
+    """
+    Runs run_daily_snapshot_update for the addresses of a user, and measures it.
+    Args:
+        user (User): The user whose addresses are read.
+        servers (list): The stand-ins started by stand_ins.
+    Returns:
+        PipelineRun: The measures of the run.
+    """
+    for server in servers:
+        server.reset()
+    statements: Counter = Counter()
+
+    def count_statement(execute, sql, params, many, context):
+        statements[sql.split(None, 1)[0].upper()] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_statement):
+        start = time.perf_counter()
+        result = run_daily_snapshot_update.apply(kwargs={"user_id": user.id}).get()
+        summary = result.get()
+        wall_time = time.perf_counter() - start
+
+    snapshot = Snapshot.objects.latest("id")
+    return PipelineRun(
+        addresses=UserAddress.objects.filter(user=user).count(),
+        wall_time=wall_time,
+        calls={server.name: Counter(server.calls) for server in servers},
+        statements=statements,
+        rows={
+            model.__name__: model.objects.filter(snapshot=snapshot).count()
+            for model in SNAPSHOT_MODELS
+        },
+        summary=summary,
+    )
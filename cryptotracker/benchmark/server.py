@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple, Type
+from urllib.parse import parse_qs, urlsplit
+
+# Status code and JSON body of a response
+Response = Tuple[int, Any]
+
+
+def digest(*parts: Any) -> int:
+    """
+    Returns a stable integer derived from the parts, so that the stand-ins return the
+    same data for the same address on every run.
+    """
+    key = ":".join(str(part).lower() for part in parts)
+    return int.from_bytes(hashlib.sha256(key.encode()).digest(), "big")
+
+
+def token_amount(*parts: Any) -> int:
+    """
+    Returns a stable amount between 0.1 and 100 tokens (18 decimals) derived from the parts.
+    """
+    return (1 + digest(*parts) % 1000) * 10**17
+
+
+def derived_address(*parts: Any) -> str:
+    """
+    Returns a stable address derived from the parts.
+    """
+    return f"0x{digest(*parts) % 2**160:040x}"
+
+
+class StandInServer:
+    """
+    A local HTTP server standing in for an external service during a benchmark.
+    It listens on a free port of 127.0.0.1, waits `latency` seconds before each response
+    to mimic the round trip to the real service, and counts the requests by endpoint.
+    Subclasses implement handle_get and/or handle_post.
+    """
+
+    name = "stand-in"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def count(self, endpoint: str, calls: int = 1) -> None:
+        with self._lock:
+            self.calls[endpoint] += calls
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+    def handle_get(self, path: str, params: Dict[str, str]) -> Response:
+        return 404, {"error": f"No GET endpoint {path}"}
+
+    def handle_post(self, path: str, body: Any) -> Response:
+        return 404, {"error": f"No POST endpoint {path}"}
+
+    def _serve(self, request: BaseHTTPRequestHandler) -> None:
+        url = urlsplit(request.path)
+        try:
+            if request.command == "POST":
+                length = int(request.headers.get("Content-Length", 0))
+                status, payload = self.handle_post(
+                    url.path, json.loads(request.rfile.read(length) or b"null")
+                )
+            else:
+                params = {
+                    key: values[-1] for key, values in parse_qs(url.query).items()
+                }
+                status, payload = self.handle_get(url.path, params)
+        except Exception as e:
+            logging.exception(f"{self.name} stand-in failed to serve {request.path}")
+            status, payload = 500, {"error": str(e)}
+
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def _handler_class(self) -> Type[BaseHTTPRequestHandler]:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keeps the connections of the HTTP clients open, like the real services,
+            # without delaying the body written after the headers
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stand_in._serve(self)
+
+            def do_POST(self):
+                stand_in._serve(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
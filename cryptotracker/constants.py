@@ -10,6 +10,11 @@ ERROR_TYPES = {
 
 ETHEREUM_RPC = "ethereum:mainnet:alchemy"
 
+# Multicall3 is deployed at the same address on every supported network
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# Maximum number of reads packed in a single aggregate3 call
+MULTICALL_CHUNK_SIZE = 500
+
 WALLET_TYPES = {
     "HOT": "HOT",
     "COLD": "COLD",
@@ -2,10 +2,12 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Dict, List, Optional, Union
 
-from cryptotracker.models import Snapshot, UserAddress, Validator, ValidatorSnapshot
-from cryptotracker.utils import APIquery, get_last_price
+from django.conf import settings
 
-BEACONCHAN_API = "https://beaconcha.in/api/v1/validator"
+from cryptotracker.models import Snapshot, UserAddress, Validator, ValidatorSnapshot
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.utils import APIquery
+from cryptotracker.writer import SnapshotWriter, save_row
 
 
 class ValidatorDetails:
@@ -49,19 +51,23 @@ def get_last_validators(
     """
     last_validators = ValidatorSnapshot.objects.filter(
         validator__user_address__in=user_addresses, snapshot=snapshot
-    )
+    ).select_related("validator__user_address")
     if not last_validators:
         return None
     return list(last_validators)
 
 
 def get_aggregated_staking(
-    user_addresses: List[UserAddress], snapshot: Optional[Snapshot] = None
+    user_addresses: List[UserAddress],
+    snapshot: Optional[Snapshot] = None,
+    prices: Optional[PriceMatrix] = None,
 ) -> Optional[Dict[str, Union[int, Decimal]]]:
     """
     Get the aggregated staking information for a list of user_addresses.
     Args:
         user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot, optional): The snapshot to value (default: the last one).
+        prices (PriceMatrix, optional): The prices of the snapshot, loaded if not given.
     Returns:
         dict: A dictionary containing the aggregated staking information or None if no validators exist.
     """
@@ -80,7 +86,9 @@ def get_aggregated_staking(
     for validator in last_validators:
         balance += validator.balance
         rewards += validator.rewards
-    current_price = get_last_price("ethereum", last_validators[0].snapshot.date)
+    if prices is None:
+        prices = PriceMatrix.for_snapshot(snapshot)
+    current_price = prices.get("ethereum")
     balance_eur = balance * current_price
     total_eth_staking = {
         "num_validators": num_validators,
@@ -91,12 +99,17 @@ def get_aggregated_staking(
     return total_eth_staking
 
 
-def fetch_staking_assets(user_address: UserAddress, snapshot: Snapshot) -> None:
+def fetch_staking_assets(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """
     Fetch the staking assets of a user from the Ethereum blockchain and store them in the database.
     Args:
         user_address (UserAddress): The UserAddress object.
         snapshot (Snapshot): The Snapshot object.
+        writer (SnapshotWriter, optional): The writer of the work unit.
     """
     validators = get_validators_from_withdrawal(user_address.public_address)
 
@@ -118,15 +131,22 @@ def fetch_staking_assets(user_address: UserAddress, snapshot: Snapshot) -> None:
         )
 
         # Save the validator snapshot
-        ValidatorSnapshot.objects.create(
-            validator=validator_obj,
-            balance=validator.balance,
-            status=validator.status,
-            rewards=rewards[str(validator.index)]["performance"],
-            snapshot=snapshot,
+        save_row(
+            ValidatorSnapshot(
+                validator=validator_obj,
+                balance=validator.balance,
+                status=validator.status,
+                rewards=rewards[str(validator.index)]["performance"],
+                snapshot=snapshot,
+            ),
+            writer,
         )
 
 
+def _validator_url(path: str) -> str:
+    return f"{settings.BEACONCHAIN_API_URL}/validator/{path}"
+
+
 def get_validators_from_withdrawal(user_address: str) -> List[int]:
     """
     Get the validator indexes from the withdrawal credentials using Beaconcha API.
@@ -138,7 +158,7 @@ def get_validators_from_withdrawal(user_address: str) -> List[int]:
     validators: List[int] = []
     params = {"limit": 10, "offset": 0}
 
-    url = f"{BEACONCHAN_API}/withdrawalCredentials/{user_address}"
+    url = _validator_url(f"withdrawalCredentials/{user_address}")
     # Fetch validator data from the API
     data = APIquery(url, params=params)
     if data is None:
@@ -161,7 +181,7 @@ def get_validators_info(validator_indexes: List[int]) -> List[ValidatorDetails]:
     """
     validator_details_list: List[ValidatorDetails] = []
     validator_indexes_str = ",".join(map(str, validator_indexes))
-    url = f"{BEACONCHAN_API}/{validator_indexes_str}"
+    url = _validator_url(validator_indexes_str)
     params: dict = {}
 
     data = APIquery(url, params)
@@ -203,7 +223,7 @@ def get_rewards(validator_indexes: List[int]) -> Dict[str, Dict[str, float]]:
     validator_indexes_str = ",".join(map(str, validator_indexes))
     # Fetch rewards data from the API
     # Get the current execution reward performance
-    url = f"{BEACONCHAN_API}/{validator_indexes_str}/execution/performance"
+    url = _validator_url(f"{validator_indexes_str}/execution/performance")
     data = APIquery(url, {})
     if data is not None:
         for validator in data["data"]:
@@ -216,7 +236,7 @@ def get_rewards(validator_indexes: List[int]) -> Dict[str, Dict[str, float]]:
             )
 
     # Get the current consensus reward performance
-    url = f"{BEACONCHAN_API}/{validator_indexes_str}/performance"
+    url = _validator_url(f"{validator_indexes_str}/performance")
     data = APIquery(url, {})
     if data is not None:
         for validator in data["data"]:
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cryptotracker.models import Cryptocurrency
+from cryptotracker.tasks import backfill_prices
+
+
+class Command(BaseCommand):
+    help = "Backfill the daily closing prices of the cryptocurrencies over a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            help="First day to backfill (YYYY-MM-DD). Defaults to one year ago.",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            help="Last day to backfill (YYYY-MM-DD). Defaults to today.",
+        )
+        parser.add_argument(
+            "--coins",
+            nargs="+",
+            help="Coingecko IDs of the cryptocurrencies. Defaults to all of them.",
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="run_async",
+            help="Queue the backfill as a Celery task instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        end = options["end"] or date.today()
+        start = options["start"] or end - timedelta(days=365)
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        crypto_ids = options["coins"] or list(
+            Cryptocurrency.objects.values_list("name", flat=True)
+        )
+        if options["run_async"]:
+            result = backfill_prices.delay(
+                start.isoformat(), end.isoformat(), crypto_ids
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued backfill task {result.id}"))
+            return
+
+        stored = backfill_prices(start.isoformat(), end.isoformat(), crypto_ids)
+        for crypto_id, count in stored.items():
+            if count < 0:
+                self.stdout.write(self.style.ERROR(f"{crypto_id}: failed"))
+            else:
+                self.stdout.write(f"{crypto_id}: {count} days")
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled prices from {start} to {end}")
+        )
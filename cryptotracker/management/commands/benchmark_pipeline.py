@@ -0,0 +1,123 @@
+import logging
+from io import StringIO
+from typing import List
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from cryptotracker.benchmark.pipeline import (
+    PipelineRun,
+    run_pipeline,
+    seed_addresses,
+    stand_ins,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the snapshot pipeline end to end against local stand-ins of the chains "
+        "(JSON-RPC), Beaconcha.in, The Graph and CoinGecko, in a throwaway database, "
+        "and report its wall time, external calls and database writes per address count."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--addresses",
+            default="1,10,50",
+            help="Comma-separated address counts to run the pipeline for (default: 1,10,50).",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=2,
+            help="Snapshots taken of each address count. The first one also creates "
+            "the validators, troves and pool positions (default: 2).",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Milliseconds each stand-in waits before responding (default: 0).",
+        )
+        parser.add_argument(
+            "--validators",
+            type=int,
+            default=2,
+            help="Validators of each address (default: 2).",
+        )
+        parser.add_argument(
+            "--troves",
+            type=int,
+            default=1,
+            help="Liquity V2 troves of each address (default: 1).",
+        )
+        parser.add_argument(
+            "--positions",
+            type=int,
+            default=1,
+            help="Uniswap V3 positions of each address (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            address_counts = [int(count) for count in options["addresses"].split(",")]
+        except ValueError:
+            raise CommandError("--addresses must be a comma-separated list of numbers")
+
+        # The pipeline logs every address, unit and request
+        if options["verbosity"] < 2:
+            logging.disable(logging.WARNING)
+        databases = setup_databases(
+            verbosity=0,
+            interactive=False,
+            aliases={"default"},
+            serialized_aliases=set(),
+        )
+        try:
+            call_command("initialize_db", stdout=StringIO())
+            runs = self._benchmark(address_counts, options)
+        finally:
+            teardown_databases(databases, verbosity=0)
+            logging.disable(logging.NOTSET)
+        self._report(runs, options["verbosity"])
+
+    def _benchmark(self, address_counts: List[int], options) -> List[PipelineRun]:
+        runs = []
+        with stand_ins(
+            latency=options["latency"] / 1000,
+            validators=options["validators"],
+            troves=options["troves"],
+            positions=options["positions"],
+        ) as servers:
+            for count in address_counts:
+                user = seed_addresses(count)
+                for _ in range(options["runs"]):
+                    runs.append(run_pipeline(user, servers))
+        return runs
+
+    def _report(self, runs: List[PipelineRun], verbosity: int) -> None:
+        services = list(runs[0].calls) if runs else []
+        header = (
+            f"{'addresses':>9} {'wall (s)':>9} {'s/address':>9} "
+            + " ".join(f"{service:>11}" for service in services)
+            + f" {'db reads':>9} {'db writes':>9} {'rows':>7}"
+        )
+        self.stdout.write(header)
+        for run in runs:
+            self.stdout.write(
+                f"{run.addresses:>9} {run.wall_time:>9.2f} "
+                f"{run.wall_time / run.addresses:>9.3f} "
+                + " ".join(
+                    f"{sum(run.calls[service].values()):>11}" for service in services
+                )
+                + f" {run.statements['SELECT']:>9} {run.writes:>9}"
+                f" {sum(run.rows.values()):>7}"
+            )
+            if verbosity >= 2:
+                for service in services:
+                    for endpoint, calls in sorted(run.calls[service].items()):
+                        self.stdout.write(f"    {service} {endpoint}: {calls}")
+                for model_name, rows in run.rows.items():
+                    self.stdout.write(f"    rows {model_name}: {rows}")
+                self.stdout.write(f"    {run.summary}")
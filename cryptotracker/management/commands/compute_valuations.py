@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from cryptotracker.models import Snapshot
+from cryptotracker.valuation import covered_addresses, write_portfolio_valuations
+
+
+class Command(BaseCommand):
+    help = "Store the per-address valuations of past snapshots (those without valuations by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute the valuations of every snapshot.",
+        )
+
+    def handle(self, *args, **options):
+        snapshots = Snapshot.objects.all()
+        if not options["all"]:
+            snapshots = snapshots.filter(valuations__isnull=True)
+
+        for snapshot in snapshots:
+            try:
+                count = write_portfolio_valuations(
+                    snapshot, covered_addresses(snapshot)
+                )
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Snapshot {snapshot}: {e}"))
+                continue
+            self.stdout.write(f"Snapshot {snapshot}: {count} valuations")
+        self.stdout.write(self.style.SUCCESS("Valuations stored"))
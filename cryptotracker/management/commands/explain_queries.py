@@ -0,0 +1,84 @@
+from datetime import datetime, time, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, QuerySet, Sum
+
+from cryptotracker.models import (
+    PoolBalanceSnapshot,
+    PoolRewardsSnapshot,
+    PortfolioValuation,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    TroveSnapshot,
+    UserAddress,
+    ValidatorSnapshot,
+)
+
+
+def access_paths(snapshot_id: int, address_ids: list[int]) -> dict[str, QuerySet]:
+    """
+    Returns the hot read queries of the app, keyed by a short description.
+    """
+    day = datetime.now(timezone.utc).date()
+    day_start = datetime.combine(day, time.min, timezone.utc)
+    return {
+        "latest snapshot (ordering -date)": Snapshot.objects.all()[:1],
+        "snapshot of a day (date range)": Snapshot.objects.filter(
+            date__gte=day_start, date__lt=day_start + timedelta(days=1)
+        )[:1],
+        "prices of a snapshot": Price.objects.filter(
+            snapshot_id=snapshot_id
+        ).values_list("cryptocurrency_id", "price"),
+        "price by (cryptocurrency, snapshot)": Price.objects.filter(
+            cryptocurrency_id=1, snapshot_id=snapshot_id
+        ).values_list("price")[:1],
+        "assets by (snapshot, address)": SnapshotAssets.objects.filter(
+            snapshot_id=snapshot_id, user_address_id__in=address_ids
+        )
+        .values("user_address_id", "cryptocurrency_id")
+        .annotate(quantity_sum=Sum("quantity"))
+        .order_by(),
+        "pool balances by (snapshot, position)": PoolBalanceSnapshot.objects.filter(
+            snapshot_id=snapshot_id, pool_position__user_address_id__in=address_ids
+        )
+        .values("pool_position_id", "token_id")
+        .annotate(quantity_sum=Sum("quantity"))
+        .order_by(),
+        "pool rewards by (snapshot, position)": PoolRewardsSnapshot.objects.filter(
+            snapshot_id=snapshot_id, pool_position__user_address_id__in=address_ids
+        ),
+        "validators by (snapshot, address)": ValidatorSnapshot.objects.filter(
+            snapshot_id=snapshot_id, validator__user_address_id__in=address_ids
+        )
+        .values(address_id=F("validator__user_address_id"))
+        .annotate(balance_sum=Sum("balance"))
+        .order_by(),
+        "troves by (snapshot, address)": TroveSnapshot.objects.filter(
+            snapshot_id=snapshot_id, trove__user_address_id__in=address_ids
+        )
+        .values(address_id=F("trove__user_address_id"))
+        .annotate(balance_sum=Sum("balance"))
+        .order_by(),
+        "valuations of addresses over a range": PortfolioValuation.objects.filter(
+            user_address_id__in=address_ids,
+            snapshot__date__gte=day_start - timedelta(days=365),
+        )
+        .values("snapshot_id")
+        .annotate(total_sum=Sum("total"))
+        .order_by(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Print the query plan of each hot read path of the snapshot tables"
+
+    def handle(self, *args, **options):
+        snapshot = Snapshot.objects.first()
+        snapshot_id = snapshot.id if snapshot else 1
+        address_ids = list(UserAddress.objects.values_list("id", flat=True)[:10]) or [1]
+
+        for name, queryset in access_paths(snapshot_id, address_ids).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
@@ -0,0 +1,442 @@
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, NamedTuple
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models import Max
+
+from cryptotracker.constants import POOL_TYPES
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    CryptocurrencyNetwork,
+    Pool,
+    PoolBalanceSnapshot,
+    PoolPosition,
+    PoolRewardsSnapshot,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    Trove,
+    TroveSnapshot,
+    UserAddress,
+    Validator,
+    ValidatorSnapshot,
+    WalletType,
+)
+from cryptotracker.valuation import write_portfolio_valuations
+
+USERNAME_PREFIX = "synthetic-"
+PASSWORD = "synthetic"
+
+# Daily volatility of the stablecoins, whatever --volatility is
+STABLE_VOLATILITY = 0.001
+
+# Collaterals of the Liquity V2 troves, and the share of their value borrowed
+TROVE_COLLATERALS = ("WETH", "wstETH", "rETH")
+TROVE_LOAN_TO_VALUE = 0.5
+
+
+class Holding(NamedTuple):
+    """A quantity that follows its own random walk from one snapshot to the next"""
+
+    key: tuple
+    quantity: float
+
+
+def _is_stable(crypto: Cryptocurrency) -> bool:
+    return "USD" in crypto.symbol.upper() or crypto.symbol.upper() in ("BOLD", "DAI")
+
+
+def _decimal(value: float, places: int) -> Decimal:
+    return Decimal(f"{value:.{places}f}")
+
+
+def _next_user_index() -> int:
+    """
+    Returns the suffix of the next synthetic username, after the highest existing one
+    so that it stays free once some synthetic users were deleted.
+    """
+    suffixes = [
+        username[len(USERNAME_PREFIX) :]
+        for username in User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).values_list("username", flat=True)
+    ]
+    return max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=-1) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, addresses and a history of snapshots (prices, assets, "
+        "pool balances and rewards, validators, troves and valuations) to benchmark the "
+        "read path at production scale. Needs the data of initialize_db."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10, help="Users to create (default: 10)."
+        )
+        parser.add_argument(
+            "--addresses",
+            type=int,
+            default=5,
+            help="Addresses per user (default: 5).",
+        )
+        parser.add_argument(
+            "--snapshots",
+            type=int,
+            default=30,
+            help="Snapshots to create, the last one at the start of today (default: 30).",
+        )
+        parser.add_argument(
+            "--interval-hours",
+            type=int,
+            default=24,
+            help="Hours between two snapshots (default: 24).",
+        )
+        parser.add_argument(
+            "--tokens",
+            type=int,
+            default=8,
+            help="Tokens held by each address (default: 8).",
+        )
+        parser.add_argument(
+            "--positions",
+            type=int,
+            default=2,
+            help="Pool positions of each address (default: 2).",
+        )
+        parser.add_argument(
+            "--staking-share",
+            type=float,
+            default=0.3,
+            help="Share of the addresses with validators (default: 0.3).",
+        )
+        parser.add_argument(
+            "--validators",
+            type=int,
+            default=2,
+            help="Validators of each staking address (default: 2).",
+        )
+        parser.add_argument(
+            "--trove-share",
+            type=float,
+            default=0.2,
+            help="Share of the addresses with a trove (default: 0.2).",
+        )
+        parser.add_argument(
+            "--quantity-sigma",
+            type=float,
+            default=1.5,
+            help="Sigma of the log-normal distribution of the quantities (default: 1.5).",
+        )
+        parser.add_argument(
+            "--volatility",
+            type=float,
+            default=0.03,
+            help="Standard deviation of the log returns of the prices and quantities "
+            "between two snapshots (default: 0.03).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per INSERT statement (default: 5000).",
+        )
+        parser.add_argument(
+            "--no-valuations",
+            action="store_true",
+            help="Do not store the per-address valuations of the snapshots.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default: 0)."
+        )
+
+    def handle(self, *args, **options):
+        self.first_user = _next_user_index()
+        # Reruns with the same seed add different addresses, validators and troves
+        self.rng = random.Random(options["seed"] + self.first_user)
+        self.options = options
+        self.counts: Counter = Counter()
+
+        self.cryptocurrencies = list(Cryptocurrency.objects.all())
+        self.tokens = list(
+            CryptocurrencyNetwork.objects.select_related("cryptocurrency")
+        )
+        self.pools = list(Pool.objects.select_related("type"))
+        self.borrowing_pools = [
+            pool for pool in self.pools if pool.type.name == POOL_TYPES["BORROWING"]
+        ]
+        self.collaterals = [
+            crypto
+            for crypto in self.cryptocurrencies
+            if crypto.symbol in TROVE_COLLATERALS
+        ]
+        self.bold = next(
+            (crypto for crypto in self.cryptocurrencies if crypto.symbol == "BOLD"),
+            None,
+        )
+        self.wallet_types = list(WalletType.objects.all())
+        if not (self.tokens and self.pools and self.wallet_types):
+            raise CommandError("No tokens or pools found, run initialize_db first.")
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            user_addresses = self._create_portfolios()
+        self.stdout.write(
+            f"Created {len(user_addresses)} addresses of {options['users']} users "
+            f"(password: {PASSWORD})"
+        )
+
+        self.prices = {
+            crypto.id: math.exp(self.rng.gauss(2, 2)) if not _is_stable(crypto) else 0.9
+            for crypto in self.cryptocurrencies
+        }
+        last_date = datetime.now(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        interval = timedelta(hours=options["interval_hours"])
+        for index in range(options["snapshots"]):
+            date = last_date - interval * (options["snapshots"] - 1 - index)
+            with transaction.atomic():
+                snapshot = self._create_snapshot(date)
+            if not options["no_valuations"]:
+                self.counts["PortfolioValuation"] += write_portfolio_valuations(
+                    snapshot, user_addresses
+                )
+            if (index + 1) % 100 == 0:
+                self.stdout.write(f"{index + 1} snapshots written")
+
+        for model_name, count in sorted(self.counts.items()):
+            self.stdout.write(f"{model_name}: {count} rows")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {options['snapshots']} snapshots in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+        )
+
+    def _create_portfolios(self) -> List[UserAddress]:
+        """
+        Creates the users, their accounts and addresses, and what each address holds:
+        tokens, pool positions, validators and troves, with their initial quantities.
+        """
+        options = self.options
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            User(
+                username=f"{USERNAME_PREFIX}{self.first_user + index}",
+                password=password,
+            )
+            for index in range(options["users"])
+        )
+        accounts = Account.objects.bulk_create(
+            Account(user=user, name=f"Account {index}")
+            for user in users
+            for index in range(self.rng.randint(1, 3))
+        )
+        accounts_of: Dict[int, List[Account]] = {}
+        for account in accounts:
+            accounts_of.setdefault(account.user_id, []).append(account)
+        user_addresses = UserAddress.objects.bulk_create(
+            UserAddress(
+                user=user,
+                public_address=f"0x{self.rng.getrandbits(160):040x}",
+                account=self.rng.choice(accounts_of[user.id]),
+                wallet_type=self.rng.choice(self.wallet_types),
+                name=f"Address {index}",
+            )
+            for user in users
+            for index in range(options["addresses"])
+        )
+
+        self.assets: List[Holding] = []
+        positions: List[PoolPosition] = []
+        validators: List[Validator] = []
+        troves: List[Trove] = []
+        next_validator_index = (
+            Validator.objects.aggregate(last=Max("validator_index"))["last"] or 0
+        ) + 1
+        for user_address in user_addresses:
+            for token in self.rng.sample(
+                self.tokens, min(options["tokens"], len(self.tokens))
+            ):
+                self.assets.append(
+                    Holding((user_address.id, token.id), self._quantity())
+                )
+            for index in range(options["positions"]):
+                positions.append(
+                    PoolPosition(
+                        pool=self.rng.choice(self.pools),
+                        user_address=user_address,
+                        position_id=str(index),
+                    )
+                )
+            if self.rng.random() < options["staking_share"]:
+                for _ in range(options["validators"]):
+                    validators.append(
+                        Validator(
+                            user_address=user_address,
+                            validator_index=next_validator_index,
+                            public_key=f"0x{self.rng.getrandbits(384):096x}",
+                            activation_date="2023-01-01",
+                        )
+                    )
+                    next_validator_index += 1
+            if (
+                self.borrowing_pools
+                and self.collaterals
+                and self.rng.random() < options["trove_share"]
+            ):
+                troves.append(
+                    Trove(
+                        user_address=user_address,
+                        pool=self.rng.choice(self.borrowing_pools),
+                        trove_id=f"0x{self.rng.getrandbits(160):040x}",
+                        token=self.rng.choice(self.collaterals),
+                    )
+                )
+
+        # Each position holds one or two tokens and earns rewards in one of them
+        self.pool_balances: List[Holding] = []
+        self.pool_rewards: List[Holding] = []
+        for position in PoolPosition.objects.bulk_create(positions):
+            position_tokens = self.rng.sample(self.cryptocurrencies, 2)
+            for crypto in position_tokens[: self.rng.randint(1, 2)]:
+                self.pool_balances.append(
+                    Holding((position.id, crypto.id), self._quantity())
+                )
+            self.pool_rewards.append(
+                Holding((position.id, position_tokens[0].id), self._quantity() / 100)
+            )
+        self.validators = [
+            Holding((validator.id,), 32.0)
+            for validator in Validator.objects.bulk_create(validators)
+        ]
+        self.troves = [
+            Holding((trove.id, trove.token_id), self._quantity())
+            for trove in Trove.objects.bulk_create(troves)
+        ]
+        return user_addresses
+
+    def _quantity(self) -> float:
+        return math.exp(self.rng.gauss(0, self.options["quantity_sigma"]))
+
+    def _step(self, holdings: List[Holding], drift: float = 0.0) -> List[Holding]:
+        volatility = self.options["volatility"]
+        return [
+            Holding(
+                holding.key,
+                holding.quantity * math.exp(self.rng.gauss(drift, volatility)),
+            )
+            for holding in holdings
+        ]
+
+    def _create_snapshot(self, date: datetime) -> Snapshot:
+        """
+        Moves the prices and quantities one step and writes them as a new snapshot.
+        """
+        snapshot = Snapshot.objects.create(date=date)
+        for crypto in self.cryptocurrencies:
+            volatility = (
+                STABLE_VOLATILITY if _is_stable(crypto) else self.options["volatility"]
+            )
+            self.prices[crypto.id] *= math.exp(self.rng.gauss(0, volatility))
+
+        self.assets = self._step(self.assets)
+        self.pool_balances = self._step(self.pool_balances)
+        # Rewards accrue, validators earn a small yield and troves move with the market
+        self.pool_rewards = self._step(self.pool_rewards, drift=0.01)
+        self.validators = [
+            Holding(validator.key, validator.quantity * 1.0001)
+            for validator in self.validators
+        ]
+        self.troves = self._step(self.troves)
+
+        self._write(
+            Price,
+            [
+                Price(
+                    cryptocurrency_id=crypto_id,
+                    price=_decimal(max(price, 0.01), 2),
+                    snapshot=snapshot,
+                )
+                for crypto_id, price in self.prices.items()
+            ],
+        )
+        self._write(
+            SnapshotAssets,
+            [
+                SnapshotAssets(
+                    user_address_id=user_address_id,
+                    cryptocurrency_id=token_id,
+                    quantity=_decimal(quantity, 5),
+                    snapshot=snapshot,
+                )
+                for (user_address_id, token_id), quantity in self.assets
+            ],
+        )
+        for model, holdings in (
+            (PoolBalanceSnapshot, self.pool_balances),
+            (PoolRewardsSnapshot, self.pool_rewards),
+        ):
+            self._write(
+                model,
+                [
+                    model(
+                        pool_position_id=position_id,
+                        token_id=crypto_id,
+                        quantity=_decimal(quantity, 5),
+                        snapshot=snapshot,
+                    )
+                    for (position_id, crypto_id), quantity in holdings
+                ],
+            )
+        self._write(
+            ValidatorSnapshot,
+            [
+                ValidatorSnapshot(
+                    validator_id=validator_id,
+                    balance=_decimal(balance, 5),
+                    status="active_ongoing",
+                    rewards=_decimal(balance - 32, 5),
+                    snapshot=snapshot,
+                )
+                for (validator_id,), balance in self.validators
+            ],
+        )
+        self._write(
+            TroveSnapshot,
+            [self._trove_snapshot(trove, snapshot) for trove in self.troves],
+        )
+        return snapshot
+
+    def _trove_snapshot(self, trove: Holding, snapshot: Snapshot) -> TroveSnapshot:
+        """
+        Values a trove the way the Liquity V2 protocol does: its collateral in EUR
+        minus its BOLD debt in EUR.
+        """
+        trove_id, crypto_id = trove.key
+        collateral_eur = trove.quantity * self.prices[crypto_id]
+        bold_price = self.prices[self.bold.id] if self.bold else 1.0
+        debt = collateral_eur * TROVE_LOAN_TO_VALUE / bold_price
+        return TroveSnapshot(
+            trove_id=trove_id,
+            collateral=_decimal(trove.quantity, 5),
+            debt=_decimal(debt, 5),
+            balance=_decimal(collateral_eur - debt * bold_price, 5),
+            interest_rate=Decimal("5.00"),
+            snapshot=snapshot,
+        )
+
+    def _write(self, model: type[models.Model], rows: List[models.Model]) -> None:
+        model._default_manager.bulk_create(rows, batch_size=self.options["batch_size"])
+        self.counts[model.__name__] += len(rows)
@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from cryptotracker.models import Snapshot, SnapshotRun, SnapshotWorkUnit
+from cryptotracker.tasks import resume_snapshot, unresumable_reason
+from dcp.celery import app
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run the failed or missing work units of a snapshot (the latest one by default) "
+        "into the same snapshot, without fetching the completed units again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--snapshot",
+            type=int,
+            help="ID of the snapshot to resume. Defaults to the latest snapshot.",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="Restrict the units to the addresses of this user ID. "
+            "Defaults to the user the snapshot was taken for.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the state of the work units of the snapshot.",
+        )
+        parser.add_argument(
+            "--eager",
+            action="store_true",
+            help="Run the work units in this process instead of queueing them to the workers.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Resume a snapshot whose units were not tracked or that is not pinned to "
+            "any block. Its rows are fetched again at the latest blocks, overwriting them.",
+        )
+
+    def handle(self, *args, **options):
+        if options["snapshot"] is None:
+            snapshot = Snapshot.objects.first()
+            if snapshot is None:
+                raise CommandError("There is no snapshot to resume")
+        else:
+            try:
+                snapshot = Snapshot.objects.get(id=options["snapshot"])
+            except Snapshot.DoesNotExist:
+                raise CommandError(f"Snapshot {options['snapshot']} does not exist")
+
+        self._report(snapshot)
+        last_run = SnapshotRun.objects.filter(snapshot=snapshot).first()
+        if last_run is not None and last_run.finished_at is None:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"The last run of snapshot {snapshot.id} has not finished: "
+                    "its pending units may still be running"
+                )
+            )
+        reason = unresumable_reason(snapshot.id)
+        if reason is not None and not options["force"]:
+            message = (
+                f"Snapshot {snapshot.id} cannot be resumed: {reason}. "
+                "Use --force to fetch it again at the latest blocks."
+            )
+            if options["dry_run"]:
+                self.stdout.write(self.style.WARNING(message))
+                return
+            raise CommandError(message)
+        if options["dry_run"]:
+            return
+
+        if not options["eager"]:
+            result = resume_snapshot.delay(
+                snapshot.id, options["user"], options["force"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued resume task {result.id}"))
+            return
+
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        try:
+            result = resume_snapshot.apply(
+                args=(snapshot.id, options["user"], options["force"])
+            ).get()
+        finally:
+            app.conf.task_always_eager = eager
+        if result is None:
+            self.stdout.write(
+                self.style.SUCCESS(f"Snapshot {snapshot.id} has no unfinished units")
+            )
+            return
+        self.stdout.write(result.get())
+        self._report(snapshot)
+
+    def _report(self, snapshot: Snapshot) -> None:
+        counts = (
+            SnapshotWorkUnit.objects.filter(snapshot=snapshot)
+            .values("source", "status")
+            .annotate(units=Count("id"))
+            .order_by("source", "status")
+        )
+        self.stdout.write(f"Work units of snapshot {snapshot.id} ({snapshot}):")
+        for row in counts:
+            self.stdout.write(f"    {row['source']} {row['status']}: {row['units']}")
+        if not counts:
+            self.stdout.write("    none tracked, every unit will be fetched")
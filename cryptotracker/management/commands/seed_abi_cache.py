@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from cryptotracker.abi import abi_store
+
+
+class Command(BaseCommand):
+    help = "Seed the on-disk ABI store with the minimal ABIs of the known token and protocol contracts"
+
+    def handle(self, *args, **options):
+        count = abi_store.seed()
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded {count} ABIs in {abi_store.directory}")
+        )
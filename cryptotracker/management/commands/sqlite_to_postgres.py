@@ -0,0 +1,141 @@
+from typing import Dict, List, Set, Type
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, models, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+
+def _sorted_models(database: str) -> List[Type[models.Model]]:
+    """
+    Returns the concrete models stored in a database, each after the models it references.
+    """
+    candidates = [
+        model
+        for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed
+        and not model._meta.proxy
+        and router.allow_migrate_model(database, model)
+    ]
+    dependencies: Dict[Type[models.Model], Set[Type[models.Model]]] = {
+        model: {
+            field.related_model
+            for field in model._meta.concrete_fields
+            if isinstance(field.related_model, type)
+            and field.related_model is not model
+        }
+        for model in candidates
+    }
+
+    ordered: List[Type[models.Model]] = []
+    while dependencies:
+        ready = [
+            model
+            for model, references in dependencies.items()
+            if not references & dependencies.keys()
+        ]
+        if not ready:
+            raise CommandError(
+                f"Circular references between {', '.join(m.__name__ for m in dependencies)}"
+            )
+        for model in ready:
+            ordered.append(model)
+            del dependencies[model]
+    return ordered
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every table of the SQLite database (the 'sqlite' alias) into the default "
+        "PostgreSQL database, replacing its content, and reset its ID sequences."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default="sqlite",
+            help="The database alias to copy from (default: sqlite).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows read and inserted per query (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        source, target = options["source"], "default"
+        if source not in connections:
+            raise CommandError(
+                f"No '{source}' database configured, set POSTGRES_DB to use PostgreSQL."
+            )
+        executor = MigrationExecutor(connections[source])
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise CommandError(
+                f"The '{source}' database has unapplied migrations, "
+                f"run migrate --database {source} first."
+            )
+
+        call_command("migrate", database=target, verbosity=0)
+        # Empties every table, including the content types and permissions created by
+        # migrate, so that all the rows keep the IDs they have in the source database
+        call_command(
+            "flush",
+            database=target,
+            interactive=False,
+            inhibit_post_migrate=True,
+            verbosity=0,
+        )
+
+        copied = _sorted_models(target)
+        with transaction.atomic(using=target):
+            for model in copied:
+                count = self._copy(model, source, target, options["batch_size"])
+                self.stdout.write(f"{model._meta.label}: {count} rows")
+
+        statements = connections[target].ops.sequence_reset_sql(no_style(), copied)
+        with connections[target].cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS(f"Copied {len(copied)} tables"))
+
+    def _copy(
+        self, model: Type[models.Model], source: str, target: str, batch_size: int
+    ) -> int:
+        # bulk_create sets these to the current time, so they are written back after it
+        auto_fields = [
+            field.name
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+            or getattr(field, "auto_now_add", False)
+        ]
+
+        count = 0
+        rows = model._base_manager.using(source).order_by("pk")
+        batch: List[models.Model] = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                count += self._insert(model, batch, target, auto_fields)
+                batch = []
+        if batch:
+            count += self._insert(model, batch, target, auto_fields)
+        return count
+
+    def _insert(
+        self,
+        model: Type[models.Model],
+        batch: List[models.Model],
+        target: str,
+        auto_fields: List[str],
+    ) -> int:
+        values = [[getattr(row, field) for field in auto_fields] for row in batch]
+        model._base_manager.using(target).bulk_create(batch)
+        if auto_fields:
+            for row, row_values in zip(batch, values):
+                for field, value in zip(auto_fields, row_values):
+                    setattr(row, field, value)
+            model._base_manager.using(target).bulk_update(batch, auto_fields)
+        return len(batch)
@@ -0,0 +1,257 @@
+import multiprocessing
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    CryptocurrencyNetwork,
+    Pool,
+    Snapshot,
+    SnapshotAssets,
+    UserAddress,
+    WalletType,
+)
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.valuation import compute_address_totals
+from cryptotracker.writer import SnapshotWriter
+
+STRESS_USERNAME = "sqlite-stress"
+
+# Timings in seconds and error messages of a worker process
+WorkerResult = Tuple[List[float], List[str]]
+
+
+def _write(snapshot_id: int, address_id: int, units: int, rows: int) -> WorkerResult:
+    """
+    Writes work units the way a snapshot task does: each unit buffers asset rows and pool
+    rows in a SnapshotWriter, whose flush reads the pool positions then writes, in one
+    transaction.
+    """
+    connections.close_all()
+    snapshot = Snapshot.objects.get(id=snapshot_id)
+    user_address = UserAddress.objects.get(id=address_id)
+    tokens = list(CryptocurrencyNetwork.objects.select_related("cryptocurrency")[:rows])
+    pools = list(Pool.objects.all()[:5])
+
+    times: List[float] = []
+    errors: List[str] = []
+    for _ in range(units):
+        start = time.perf_counter()
+        try:
+            with SnapshotWriter(snapshot) as writer:
+                for index in range(rows):
+                    writer.add(
+                        SnapshotAssets(
+                            user_address=user_address,
+                            cryptocurrency=tokens[index % len(tokens)],
+                            quantity=Decimal(1),
+                            snapshot=snapshot,
+                        )
+                    )
+                for pool in pools:
+                    writer.add_pool_row(
+                        pool, user_address, tokens[0].cryptocurrency.symbol, Decimal(1)
+                    )
+        except OperationalError as e:
+            errors.append(f"write: {e}")
+            continue
+        times.append(time.perf_counter() - start)
+    connections.close_all()
+    return times, errors
+
+
+def _read(snapshot_id: int, address_ids: List[int], stop) -> WorkerResult:
+    """
+    Values the addresses of the snapshot over and over, like the portfolio pages do,
+    until the writers are done.
+    """
+    connections.close_all()
+    snapshot = Snapshot.objects.get(id=snapshot_id)
+    addresses = list(UserAddress.objects.filter(id__in=address_ids))
+    # Fixed prices, so that the reads only measure the database
+    prices = PriceMatrix(
+        snapshot,
+        {
+            name: Decimal(1)
+            for name in Cryptocurrency.objects.values_list("name", flat=True)
+        },
+    )
+
+    times: List[float] = []
+    errors: List[str] = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            compute_address_totals(addresses, snapshot, prices)
+        except OperationalError as e:
+            errors.append(f"read: {e}")
+            continue
+        times.append(time.perf_counter() - start)
+    connections.close_all()
+    return times, errors
+
+
+@contextmanager
+def sqlite_file(path: Path) -> Iterator[None]:
+    """
+    Points the default connection of this process, and of the processes it forks, at a
+    SQLite file opened with the options of settings.SQLITE_DATABASE (WAL, timeout and
+    IMMEDIATE transactions), then restores the configured database.
+    Args:
+        path (Path): The SQLite file.
+    """
+    database = connections.configure_settings(
+        {"default": {**settings.SQLITE_DATABASE, "NAME": str(path)}}
+    )["default"]
+    configured = connections["default"]
+    connections["default"] = DatabaseWrapper(database, "default")
+    try:
+        yield
+    finally:
+        connections["default"].close()
+        connections["default"] = configured
+        # The content types of the SQLite file are not those of the configured database
+        ContentType.objects.clear_cache()
+
+
+def _summary(times: List[float]) -> str:
+    if not times:
+        return "-"
+    return (
+        f"median {statistics.median(times) * 1000:.1f}ms, "
+        f"max {max(times) * 1000:.1f}ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent snapshot writer processes next to portfolio reads against a new "
+        "SQLite file opened with the settings of the project, and report lock errors "
+        "and latencies. The file is deleted afterwards; the configured database is "
+        "never touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            type=Path,
+            required=True,
+            help="Path of the SQLite file to create for the test. It must not exist.",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=4,
+            help="Concurrent writer processes (default: 4).",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=2,
+            help="Concurrent reader processes (default: 2).",
+        )
+        parser.add_argument(
+            "--units",
+            type=int,
+            default=20,
+            help="Work units written by each writer (default: 20).",
+        )
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=50,
+            help="Asset rows written by each work unit (default: 50).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["database"].resolve()
+        if path.exists():
+            raise CommandError(
+                f"{path} already exists: give the path of a new file, the test fills it "
+                "with its own rows"
+            )
+        files = [path.with_name(path.name + suffix) for suffix in ("", "-wal", "-shm")]
+        try:
+            with sqlite_file(path):
+                call_command("migrate", verbosity=0)
+                call_command("initialize_db", stdout=StringIO())
+                self._run(path, options)
+        finally:
+            for file in files:
+                file.unlink(missing_ok=True)
+
+    def _run(self, path: Path, options) -> None:
+        wallet_type = WalletType.objects.first()
+        if not CryptocurrencyNetwork.objects.exists() or wallet_type is None:
+            raise CommandError("No tokens found, initialize_db did not complete.")
+
+        user = User.objects.create(username=STRESS_USERNAME)
+        account = Account.objects.create(user=user, name="Stress test")
+        address_ids = [
+            UserAddress.objects.create(
+                user=user,
+                public_address=f"0x{index:040x}",
+                account=account,
+                wallet_type=wallet_type,
+            ).id
+            for index in range(options["writers"])
+        ]
+        snapshot = Snapshot.objects.create(date=datetime.now(timezone.utc))
+        # The worker processes are forked and open their own connections
+        connections.close_all()
+
+        context = multiprocessing.get_context("fork")
+        stop = context.Manager().Event()
+        with context.Pool(options["writers"] + options["readers"]) as pool:
+            start = time.perf_counter()
+            reads = [
+                pool.apply_async(_read, (snapshot.id, address_ids, stop))
+                for _ in range(options["readers"])
+            ]
+            writes = [
+                pool.apply_async(
+                    _write,
+                    (snapshot.id, address_id, options["units"], options["rows"]),
+                )
+                for address_id in address_ids
+            ]
+            write_results = [result.get() for result in writes]
+            elapsed = time.perf_counter() - start
+            stop.set()
+            read_results = [result.get() for result in reads]
+
+        written = SnapshotAssets.objects.filter(snapshot=snapshot).count()
+        write_times = [t for times, _ in write_results for t in times]
+        read_times = [t for times, _ in read_results for t in times]
+        errors = [e for _, errs in write_results + read_results for e in errs]
+
+        self.stdout.write(f"Database: {path}")
+        self.stdout.write(
+            f"Writers: {options['writers']} x {options['units']} units, "
+            f"{written} asset rows written in {elapsed:.2f}s"
+        )
+        self.stdout.write(f"Unit write time: {_summary(write_times)}")
+        self.stdout.write(
+            f"Reads: {len(read_times)}, read time: {_summary(read_times)}"
+        )
+        if errors:
+            self.stdout.write(
+                self.style.ERROR(f"{len(errors)} errors, e.g. {errors[0]}")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("No lock errors"))
@@ -0,0 +1,167 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+# The processes forked by a server or a prefork worker write their metrics to files in
+# this directory, which the process serving the metrics aggregates. It must be set in
+# the environment before prometheus_client is imported.
+MULTIPROC_DIR_VARIABLE = "PROMETHEUS_MULTIPROC_DIR"
+
+VIEW_DURATION = Histogram(
+    "cryptotracker_view_duration_seconds",
+    "Time to serve a request, by view, HTTP method and status.",
+    ["view", "method", "status"],
+)
+VIEW_QUERIES = Histogram(
+    "cryptotracker_view_queries",
+    "Database queries run to serve a request, by view.",
+    ["view"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+TASK_DURATION = Histogram(
+    "cryptotracker_task_duration_seconds",
+    "Run time of the Celery tasks, by task.",
+    ["task"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+TASK_OUTCOMES = Counter(
+    "cryptotracker_tasks",
+    "Celery tasks run, by task and final state (SUCCESS, FAILURE, RETRY, ...).",
+    ["task", "state"],
+)
+EXTERNAL_REQUESTS = Counter(
+    "cryptotracker_external_requests",
+    "HTTP requests to external APIs, by host and status code ('error' without response).",
+    ["host", "status"],
+)
+EXTERNAL_DURATION = Histogram(
+    "cryptotracker_external_request_duration_seconds",
+    "Response time of the external APIs, by host.",
+    ["host"],
+)
+RPC_CALLS = Counter(
+    "cryptotracker_rpc_calls",
+    "JSON-RPC requests, by network, method and outcome (ok or error).",
+    ["network", "method", "outcome"],
+)
+RPC_DURATION = Histogram(
+    "cryptotracker_rpc_duration_seconds",
+    "Response time of the JSON-RPC requests, by network and method.",
+    ["network", "method"],
+)
+
+# Start time of the Celery tasks running in this process, by task ID
+_task_starts: Dict[str, float] = {}
+_task_starts_lock = threading.Lock()
+
+
+def observe_view(
+    view: str, method: str, status: int, seconds: float, queries: int
+) -> None:
+    VIEW_DURATION.labels(view, method, str(status)).observe(seconds)
+    VIEW_QUERIES.labels(view).observe(queries)
+
+
+def observe_external_request(
+    url: str, status: str, seconds: Optional[float] = None
+) -> None:
+    """
+    Counts a request to an external API.
+    Args:
+        url (str): The requested URL, only its host is kept.
+        status (str): The HTTP status code, or "error" when no response was received.
+        seconds (float, optional): The response time, when a response was received.
+    """
+    host = urlparse(url).hostname or "unknown"
+    EXTERNAL_REQUESTS.labels(host, status).inc()
+    if seconds is not None:
+        EXTERNAL_DURATION.labels(host).observe(seconds)
+
+
+def observe_rpc_call(network: str, method: str, seconds: float, error: bool) -> None:
+    RPC_CALLS.labels(network, method, "error" if error else "ok").inc()
+    RPC_DURATION.labels(network, method).observe(seconds)
+
+
+def task_started(task_id: str) -> None:
+    with _task_starts_lock:
+        _task_starts[task_id] = time.perf_counter()
+
+
+def task_finished(task_id: str, task_name: str, state: Optional[str]) -> None:
+    with _task_starts_lock:
+        start = _task_starts.pop(task_id, None)
+    if start is not None:
+        TASK_DURATION.labels(task_name).observe(time.perf_counter() - start)
+    TASK_OUTCOMES.labels(task_name, state or "UNKNOWN").inc()
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Returns the registry to expose: the metrics written by all the processes to the
+    PROMETHEUS_MULTIPROC_DIR directory when it is set, those of this process otherwise.
+    """
+    if not os.environ.get(MULTIPROC_DIR_VARIABLE):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> bytes:
+    """
+    Returns the metrics in the Prometheus text format (CONTENT_TYPE_LATEST).
+    """
+    return generate_latest(metrics_registry())
+
+
+def reset_multiprocess_metrics() -> None:
+    """
+    Empties the PROMETHEUS_MULTIPROC_DIR directory, if set, so that the metrics of a
+    previous run of the worker are not aggregated with the new ones.
+    """
+    directory = os.environ.get(MULTIPROC_DIR_VARIABLE)
+    if not directory:
+        return
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def start_metrics_server(port: int, addr: str) -> None:
+    """
+    Serves the metrics over HTTP from a background thread, for the processes without a
+    web server (the Celery workers). A port already in use is logged, not raised.
+    Args:
+        port (int): The port to listen on, 0 to not serve the metrics.
+        addr (str): The address to listen on.
+    """
+    if not port:
+        return
+    try:
+        start_http_server(port, addr, registry=metrics_registry())
+    except OSError as e:
+        logging.error(f"Could not serve the metrics on {addr}:{port}: {e}")
+        return
+    logging.info(f"Serving the metrics on http://{addr}:{port}/metrics")
+
+
+def process_exited(pid: int) -> None:
+    """
+    Drops the live metrics of an exited process from the multiprocess directory.
+    """
+    if os.environ.get(MULTIPROC_DIR_VARIABLE):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,54 @@
+import time
+
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+
+from cryptotracker.metrics import observe_view
+from cryptotracker.utils import clear_price_memo
+
+
+class PriceMemoMiddleware:
+    """
+    Scopes the get_last_price memo to a single request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        clear_price_memo()
+        try:
+            return self.get_response(request)
+        finally:
+            clear_price_memo()
+
+
+class MetricsMiddleware:
+    """
+    Records the time taken and the database queries run by each request, by view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        # The view name keeps the label set bounded, unlike the path
+        resolver_match = getattr(request, "resolver_match", None)
+        observe_view(
+            resolver_match.view_name if resolver_match else "unresolved",
+            request.method or "",
+            response.status_code,
+            time.perf_counter() - start,
+            queries,
+        )
+        return response
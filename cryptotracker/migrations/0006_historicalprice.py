@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 20:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cryptotracker", "0005_snapshotblock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HistoricalPrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("price", models.DecimalField(decimal_places=2, max_digits=20)),
+                (
+                    "cryptocurrency",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cryptotracker.cryptocurrency",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("cryptocurrency", "date"),
+                        name="unique_historical_price",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cryptotracker", "0007_portfoliovaluation"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="poolbalancesnapshot",
+            index=models.Index(
+                fields=["snapshot", "pool_position", "token", "quantity"],
+                name="pool_balance_snapshot_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="poolrewardssnapshot",
+            index=models.Index(
+                fields=["snapshot", "pool_position"], name="pool_rewards_snapshot_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="portfoliovaluation",
+            index=models.Index(
+                fields=["user_address", "snapshot", "total"],
+                name="valuation_address_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="price",
+            index=models.Index(
+                fields=["snapshot", "cryptocurrency", "price"],
+                name="price_snapshot_crypto_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="snapshot",
+            index=models.Index(fields=["-date"], name="snapshot_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="snapshotassets",
+            index=models.Index(
+                fields=["snapshot", "user_address", "cryptocurrency", "quantity"],
+                name="assets_snapshot_address_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trovesnapshot",
+            index=models.Index(
+                fields=["snapshot", "trove", "balance"], name="trove_snapshot_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="validatorsnapshot",
+            index=models.Index(
+                fields=["snapshot", "validator", "balance"],
+                name="validator_snapshot_idx",
+            ),
+        ),
+    ]
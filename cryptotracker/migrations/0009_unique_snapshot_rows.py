@@ -0,0 +1,118 @@
+# Generated by Django 5.2 on 2026-10-18 21:16
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+# Rows written twice for the same key (e.g. by a retried task), deduplicated below
+SNAPSHOT_ROW_KEYS = {
+    "Price": ("snapshot", "cryptocurrency"),
+    "SnapshotAssets": ("snapshot", "user_address", "cryptocurrency"),
+    "ValidatorSnapshot": ("snapshot", "validator"),
+    "PoolBalanceSnapshot": ("snapshot", "pool_position", "token"),
+    "PoolRewardsSnapshot": ("snapshot", "pool_position", "token"),
+    "TroveSnapshot": ("snapshot", "trove"),
+}
+
+
+def _duplicates(model, fields):
+    return (
+        model.objects.values(*fields)
+        .annotate(count=Count("id"), keep_id=Max("id"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+
+
+def deduplicate_rows(apps, schema_editor):
+    """
+    Keeps the last row of each key, so that the unique constraints can be created.
+    Duplicate pool positions are merged first, moving their snapshot rows to the kept one.
+    """
+    PoolPosition = apps.get_model("cryptotracker", "PoolPosition")
+    for group in _duplicates(PoolPosition, ("pool", "user_address", "position_id")):
+        duplicate_ids = list(
+            PoolPosition.objects.filter(
+                pool=group["pool"],
+                user_address=group["user_address"],
+                position_id=group["position_id"],
+            )
+            .exclude(id=group["keep_id"])
+            .values_list("id", flat=True)
+        )
+        for model_name in ("PoolBalanceSnapshot", "PoolRewardsSnapshot"):
+            apps.get_model("cryptotracker", model_name).objects.filter(
+                pool_position_id__in=duplicate_ids
+            ).update(pool_position_id=group["keep_id"])
+        PoolPosition.objects.filter(id__in=duplicate_ids).delete()
+
+    for model_name, fields in SNAPSHOT_ROW_KEYS.items():
+        model = apps.get_model("cryptotracker", model_name)
+        for group in _duplicates(model, fields):
+            model.objects.filter(**{field: group[field] for field in fields}).exclude(
+                id=group["keep_id"]
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cryptotracker", "0008_snapshot_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="poolbalancesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("snapshot", "pool_position", "token"),
+                name="unique_pool_balance_snapshot",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="poolposition",
+            constraint=models.UniqueConstraint(
+                fields=("pool", "user_address", "position_id"),
+                name="unique_pool_position",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="poolposition",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("position_id__isnull", True)),
+                fields=("pool", "user_address"),
+                name="unique_pool_position_without_id",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="poolrewardssnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("snapshot", "pool_position", "token"),
+                name="unique_pool_rewards_snapshot",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="price",
+            constraint=models.UniqueConstraint(
+                fields=("snapshot", "cryptocurrency"), name="unique_price"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="snapshotassets",
+            constraint=models.UniqueConstraint(
+                fields=("snapshot", "user_address", "cryptocurrency"),
+                name="unique_snapshot_asset",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="trovesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("snapshot", "trove"), name="unique_trove_snapshot"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="validatorsnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("snapshot", "validator"), name="unique_validator_snapshot"
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2 on 2026-10-18 21:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cryptotracker", "0010_snapshotrun"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SnapshotWorkUnit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=20)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("success", "Success"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                ("error", models.CharField(blank=True, max_length=200)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "network",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cryptotracker.network",
+                    ),
+                ),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="work_units",
+                        to="cryptotracker.snapshot",
+                    ),
+                ),
+                (
+                    "user_address",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cryptotracker.useraddress",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("user_address__isnull", False)),
+                        fields=("snapshot", "source", "user_address"),
+                        name="unique_address_work_unit",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("network__isnull", False)),
+                        fields=("snapshot", "source", "network"),
+                        name="unique_network_work_unit",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(
+                            ("network__isnull", True), ("user_address__isnull", True)
+                        ),
+                        fields=("snapshot", "source"),
+                        name="unique_snapshot_work_unit",
+                    ),
+                ],
+            },
+        ),
+    ]
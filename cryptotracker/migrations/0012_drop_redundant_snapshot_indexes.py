@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 22:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cryptotracker", "0011_snapshotworkunit"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="poolbalancesnapshot",
+            name="pool_balance_snapshot_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="poolrewardssnapshot",
+            name="pool_rewards_snapshot_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="price",
+            name="price_snapshot_crypto_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="snapshotassets",
+            name="assets_snapshot_address_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="trovesnapshot",
+            name="trove_snapshot_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="validatorsnapshot",
+            name="validator_snapshot_idx",
+        ),
+    ]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from django.contrib.auth.models import User
 from django.db import models
 
@@ -36,10 +38,34 @@ class Price(models.Model):
     price = models.DecimalField(max_digits=20, decimal_places=2)
     snapshot = models.ForeignKey("Snapshot", on_delete=models.CASCADE)
 
+    class Meta:
+        # The unique indexes of the snapshot rows also serve their reads by snapshot
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "cryptocurrency"], name="unique_price"),
+        ]
+
     def __str__(self):
         return f"{self.cryptocurrency.name} - {self.price} - {self.snapshot}"
 
 
+class HistoricalPrice(models.Model):
+    """Daily closing price of a cryptocurrency, used when a snapshot has no Price row"""
+
+    cryptocurrency = models.ForeignKey("Cryptocurrency", on_delete=models.CASCADE)
+    date = models.DateField()
+    price = models.DecimalField(max_digits=20, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cryptocurrency", "date"], name="unique_historical_price"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.cryptocurrency.name} - {self.price} - {self.date}"
+
+
 class Account(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=20)
@@ -74,6 +100,13 @@ class SnapshotAssets(models.Model):
     quantity = models.DecimalField(max_digits=20, decimal_places=5)
     snapshot = models.ForeignKey("Snapshot", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "user_address", "cryptocurrency"], name="unique_snapshot_asset"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.cryptocurrency.cryptocurrency.name} - {self.quantity} - {self.snapshot}"
 
@@ -95,6 +128,11 @@ class ValidatorSnapshot(models.Model):
     rewards = models.DecimalField(max_digits=20, decimal_places=5)
     snapshot = models.ForeignKey("Snapshot", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "validator"], name="unique_validator_snapshot"),
+        ]
+
     def __str__(self):
         return f"{self.validator} - {self.balance}"
 
@@ -137,6 +175,19 @@ class PoolPosition(models.Model):
     user_address = models.ForeignKey("UserAddress", on_delete=models.CASCADE)
     position_id = models.CharField(max_length=20, blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["pool", "user_address", "position_id"], name="unique_pool_position"
+            ),
+            # NULLs are distinct in unique constraints, so one position per pool without an ID
+            models.UniqueConstraint(
+                fields=["pool", "user_address"],
+                condition=models.Q(position_id__isnull=True),
+                name="unique_pool_position_without_id",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.position_id}"
 
@@ -147,6 +198,13 @@ class PoolBalanceSnapshot(models.Model):
     quantity = models.DecimalField(max_digits=20, decimal_places=5)
     snapshot = models.ForeignKey("Snapshot", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "pool_position", "token"], name="unique_pool_balance_snapshot"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.pool_position} - {self.quantity} - {self.snapshot}"
 
@@ -157,6 +215,13 @@ class PoolRewardsSnapshot(models.Model):
     quantity = models.DecimalField(max_digits=20, decimal_places=5)
     snapshot = models.ForeignKey("Snapshot", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "pool_position", "token"], name="unique_pool_rewards_snapshot"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.pool_position} - {self.quantity} - {self.snapshot}"
 
@@ -178,6 +243,11 @@ class TroveSnapshot(models.Model):
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
     snapshot = models.ForeignKey("Snapshot", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "trove"], name="unique_trove_snapshot"),
+        ]
+
     def __str__(self):
         return f"{self.trove} - {self.collateral} - {self.snapshot}"
 
@@ -187,10 +257,177 @@ class Snapshot(models.Model):
 
     class Meta:
         ordering = ["-date"]  # "Sort by descending date (most recent first)"
+        indexes = [
+            # Serves the default ordering and the date range lookups
+            models.Index(fields=["-date"], name="snapshot_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.date}"
 
+    def block_number(self, network_name: str) -> Optional[int]:
+        """
+        Returns the block number the snapshot is pinned to on a network,
+        or None to read the latest block.
+        """
+        if not hasattr(self, "_block_numbers"):
+            self._block_numbers = dict(
+                self.blocks.values_list("network__name", "block_number")
+            )
+        return self._block_numbers.get(network_name)
+
+
+class SnapshotBlock(models.Model):
+    """Block number of each network at which the data of a snapshot is read"""
+
+    snapshot = models.ForeignKey(
+        "Snapshot", on_delete=models.CASCADE, related_name="blocks"
+    )
+    network = models.ForeignKey("Network", on_delete=models.CASCADE)
+    block_number = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "network"], name="unique_snapshot_network_block"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot} - {self.network.name} #{self.block_number}"
+
+
+class PortfolioValuation(models.Model):
+    """EUR value of an address at a snapshot per category, computed once the snapshot completes"""
+
+    user_address = models.ForeignKey("UserAddress", on_delete=models.CASCADE)
+    snapshot = models.ForeignKey(
+        "Snapshot", on_delete=models.CASCADE, related_name="valuations"
+    )
+    assets = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    staking = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    protocols = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    troves = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "user_address"], name="unique_portfolio_valuation"
+            )
+        ]
+        indexes = [
+            # Value history of a set of addresses
+            models.Index(fields=["user_address", "snapshot", "total"], name="valuation_address_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_address} - {self.total} - {self.snapshot}"
+
+
+class SnapshotRun(models.Model):
+    """One run of the snapshot pipeline, with the timings of its stages"""
+
+    snapshot = models.ForeignKey(
+        "Snapshot", on_delete=models.CASCADE, related_name="runs"
+    )
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    units = models.IntegerField(default=0)
+    failed_units = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"Run of snapshot {self.snapshot} ({self.units} units, {self.failed_units} failed)"
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Wall time of the run in seconds, None while it is running"""
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+
+class SnapshotWorkUnit(models.Model):
+    """Completion state of a work unit of a snapshot, so that a resumed run only retries the unfinished ones"""
+
+    PENDING = "pending"
+    SUCCESS = "success"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (SUCCESS, "Success"), (FAILED, "Failed")]
+
+    snapshot = models.ForeignKey(
+        "Snapshot", on_delete=models.CASCADE, related_name="work_units"
+    )
+    source = models.CharField(max_length=20)
+    user_address = models.ForeignKey(
+        "UserAddress", on_delete=models.CASCADE, null=True, blank=True
+    )
+    network = models.ForeignKey(
+        "Network", on_delete=models.CASCADE, null=True, blank=True
+    )
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    error = models.CharField(max_length=200, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # NULLs are distinct in unique constraints, so one constraint per kind of unit
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "source", "user_address"],
+                condition=models.Q(user_address__isnull=False),
+                name="unique_address_work_unit",
+            ),
+            models.UniqueConstraint(
+                fields=["snapshot", "source", "network"],
+                condition=models.Q(network__isnull=False),
+                name="unique_network_work_unit",
+            ),
+            models.UniqueConstraint(
+                fields=["snapshot", "source"],
+                condition=models.Q(user_address__isnull=True, network__isnull=True),
+                name="unique_snapshot_work_unit",
+            ),
+        ]
+
+    def __str__(self):
+        target = self.user_address or self.network or "all"
+        return f"{self.snapshot} - {self.source} - {target}: {self.status}"
+
+
+class SnapshotStageTiming(models.Model):
+    """Duration, external calls and writes of one stage (source of an address or network) of a run"""
+
+    run = models.ForeignKey(
+        "SnapshotRun", on_delete=models.CASCADE, related_name="stages"
+    )
+    source = models.CharField(max_length=20)
+    user_address = models.ForeignKey(
+        "UserAddress", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    network = models.ForeignKey(
+        "Network", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    duration = models.FloatField(default=0)
+    write_duration = models.FloatField(default=0)
+    calls = models.IntegerField(default=0)
+    bytes = models.BigIntegerField(default=0)
+    errors = models.IntegerField(default=0)
+    rows = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Trend of a source across the runs
+            models.Index(fields=["source", "run"], name="stage_timing_source_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} - {self.source} - {self.duration:.2f}s"
+
 
 class ErrorTypes(models.Model):
     error_type = models.CharField(max_length=20)
@@ -0,0 +1,105 @@
+import logging
+from typing import Callable, List, NamedTuple, Optional
+
+from eth_abi import decode, encode
+
+from cryptotracker.abi import get_contract
+from cryptotracker.constants import MULTICALL3_ADDRESS, MULTICALL_CHUNK_SIZE
+
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")  # balanceOf(address)
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex("4d2301cc")  # getEthBalance(address)
+
+
+class Call(NamedTuple):
+    """
+    A single read packed into a Multicall3 aggregate3 request.
+    `fallback` is used to fetch the value directly, at the given block, when the batched call fails.
+    """
+
+    target: str
+    call_data: bytes
+    fallback: Callable[[Optional[int]], int]
+
+
+def balance_of_call(token_address: str, public_address: str) -> Call:
+    """
+    Builds the ERC-20 balanceOf call of a public address.
+    """
+    return Call(
+        target=token_address,
+        call_data=BALANCE_OF_SELECTOR + encode(["address"], [public_address]),
+        fallback=lambda block_id: get_contract(token_address, "ERC20").balanceOf(
+            public_address, block_id=block_id
+        ),
+    )
+
+
+def native_balance_call(provider, public_address: str) -> Call:
+    """
+    Builds the Multicall3 getEthBalance call of a public address.
+    """
+    return Call(
+        target=MULTICALL3_ADDRESS,
+        call_data=GET_ETH_BALANCE_SELECTOR + encode(["address"], [public_address]),
+        fallback=lambda block_id: provider.get_balance(
+            public_address, block_id=block_id
+        ),
+    )
+
+
+def _fallback(call: Call, block_id: Optional[int]) -> Optional[int]:
+    try:
+        return call.fallback(block_id)
+    except Exception as e:
+        logging.error(f"Fallback call to {call.target} failed: {e}")
+        return None
+
+
+def aggregate(
+    calls: List[Call],
+    chunk_size: int = MULTICALL_CHUNK_SIZE,
+    block_id: Optional[int] = None,
+) -> List[Optional[int]]:
+    """
+    Executes a list of uint256 reads on the active network in Multicall3 aggregate3 calls
+    of at most chunk_size reads each.
+    Calls that fail inside a batch are retried one by one with their fallback.
+    Args:
+        calls (list): A list of Call objects.
+        chunk_size (int): The maximum number of calls packed in a single aggregate3 call.
+        block_id (int, optional): The block to read at (default: latest).
+    Returns:
+        list: The decoded value of each call, in the same order, or None if the call failed.
+    """
+    if not calls:
+        return []
+
+    multicall = get_contract(MULTICALL3_ADDRESS, "MULTICALL3")
+    values: List[Optional[int]] = []
+    for start in range(0, len(calls), chunk_size):
+        values.extend(
+            _aggregate_chunk(multicall, calls[start : start + chunk_size], block_id)
+        )
+    return values
+
+
+def _aggregate_chunk(
+    multicall, calls: List[Call], block_id: Optional[int]
+) -> List[Optional[int]]:
+    try:
+        results = multicall.aggregate3(
+            [(call.target, True, call.call_data) for call in calls],
+            block_id=block_id,
+        )
+    except Exception as e:
+        logging.warning(f"Multicall aggregate3 failed, falling back per call: {e}")
+        return [_fallback(call, block_id) for call in calls]
+
+    values: List[Optional[int]] = []
+    for call, result in zip(calls, results):
+        if result.success and len(result.returnData) >= 32:
+            values.append(decode(["uint256"], bytes(result.returnData))[0])
+        else:
+            logging.warning(f"Multicall call to {call.target} failed, falling back")
+            values.append(_fallback(call, block_id))
+    return values
@@ -0,0 +1,121 @@
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Set
+
+from cryptotracker.models import Cryptocurrency, HistoricalPrice, Price, Snapshot
+from cryptotracker.utils import fetch_cryptocurrency_price, fetch_historical_price
+
+
+class PriceMatrix:
+    """
+    Prices of the cryptocurrencies at a snapshot, loaded with a single query and shared by
+    all the valuation helpers of a request. Prices missing from the snapshot are resolved
+    together in one pass: stored daily closes first, then the Coingecko API.
+    """
+
+    def __init__(self, snapshot: Snapshot, prices: Dict[str, Decimal]):
+        self.snapshot = snapshot
+        self.prices = prices
+        # Cryptocurrencies whose price could not be resolved, not to be fetched again
+        self._unresolved: Set[str] = set()
+
+    @classmethod
+    def for_snapshot(cls, snapshot: Snapshot) -> "PriceMatrix":
+        """
+        Loads the prices stored with a snapshot.
+        Args:
+            snapshot (Snapshot): The Snapshot object.
+        Returns:
+            PriceMatrix: The prices of the snapshot.
+        """
+        prices = dict(
+            Price.objects.filter(snapshot=snapshot).values_list(
+                "cryptocurrency__name", "price"
+            )
+        )
+        return cls(snapshot, prices)
+
+    def __contains__(self, crypto_id: str) -> bool:
+        return crypto_id in self.prices
+
+    def get(self, crypto_id: str) -> Decimal:
+        """
+        Returns the price of a cryptocurrency, resolving it if the snapshot has none.
+        Args:
+            crypto_id (str): The ID of the cryptocurrency.
+        Returns:
+            Decimal: The price of the cryptocurrency.
+        """
+        if crypto_id not in self.prices:
+            self.resolve([crypto_id])
+        if crypto_id not in self.prices:
+            raise ValueError(
+                f"Price data for {crypto_id} on {self.snapshot.date.date()} not found."
+            )
+        return self.prices[crypto_id]
+
+    def resolve(self, crypto_ids: Iterable[str]) -> None:
+        """
+        Resolves in one pass the prices of the given cryptocurrencies that the snapshot has not.
+        Callers that know all the cryptocurrencies they will value should call it before get.
+        Args:
+            crypto_ids (list): The IDs of the cryptocurrencies.
+        """
+        missing = {
+            crypto_id
+            for crypto_id in crypto_ids
+            if crypto_id not in self.prices and crypto_id not in self._unresolved
+        }
+        if not missing:
+            return
+
+        day = self.snapshot.date.date()
+        self.prices.update(
+            HistoricalPrice.objects.filter(
+                cryptocurrency__name__in=missing, date=day
+            ).values_list("cryptocurrency__name", "price")
+        )
+        missing -= self.prices.keys()
+        if not missing:
+            return
+
+        logging.info(f"Fetching the prices of {sorted(missing)} on {day}")
+        fetched = self._fetch(sorted(missing))
+        cryptocurrencies = {
+            crypto.name: crypto
+            for crypto in Cryptocurrency.objects.filter(name__in=fetched)
+        }
+        HistoricalPrice.objects.bulk_create(
+            [
+                HistoricalPrice(
+                    cryptocurrency=cryptocurrencies[crypto_id], date=day, price=price
+                )
+                for crypto_id, price in fetched.items()
+                if crypto_id in cryptocurrencies
+            ],
+            ignore_conflicts=True,
+        )
+        self.prices.update(fetched)
+        self._unresolved |= missing - fetched.keys()
+
+    def _fetch(self, crypto_ids: list[str]) -> Dict[str, Decimal]:
+        """
+        Fetches prices from the API: a single request for today's snapshots, one request
+        per cryptocurrency for older ones (the history endpoint takes a single coin).
+        """
+        day = self.snapshot.date.date()
+        fetched: Dict[str, Decimal] = {}
+        if day == datetime.now(timezone.utc).date():
+            prices = fetch_cryptocurrency_price(crypto_ids) or {}
+            for crypto_id in crypto_ids:
+                price: Optional[Dict] = prices.get(crypto_id)
+                if price and "eur" in price:
+                    fetched[crypto_id] = Decimal(str(price["eur"]))
+            return fetched
+
+        for crypto_id in crypto_ids:
+            historical_price = fetch_historical_price(crypto_id, day)
+            if historical_price:
+                fetched[crypto_id] = historical_price
+        return fetched
@@ -1,18 +1,25 @@
 import logging
+from typing import Optional
 
-from ape import Contract, networks
-
+from cryptotracker.abi import get_contract
 from cryptotracker.models import Pool, ProtocolNetwork, Snapshot, UserAddress
 from cryptotracker.protocols.protocols import save_pool_snapshot
+from cryptotracker.providers import provider_manager
+from cryptotracker.writer import SnapshotWriter
 from cryptotracker.constants import POOL_TYPES, PROTOCOLS_DATA
 
 
-def update_aave_lending_pools(user_address: UserAddress, snapshot: Snapshot) -> None:
+def update_aave_lending_pools(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """
     Save the AAVE V3 lending pool participation of a given user_address (acting as a supplier only).
     Args:
         user_address (UserAddress): The user_address to check.
-
+        snapshot (Snapshot): The snapshot object, read at its pinned block.
+        writer (SnapshotWriter, optional): The writer of the work unit.
     """
     logging.info("Searching AAVE pools")
     protocols = ProtocolNetwork.objects.filter(
@@ -21,21 +28,25 @@ def update_aave_lending_pools(user_address: UserAddress, snapshot: Snapshot) ->
     pools = Pool.objects.filter(
         protocol_network__in=protocols,
         type__name=POOL_TYPES["LENDING"],
-    )
+    ).select_related("protocol_network__network")
 
     for pool in pools:
         network = pool.protocol_network.network
 
-        with networks.parse_network_choice(network.url_rpc):
-            contract = Contract(pool.contract_address)
-            provider_address = contract.getPoolDataProvider()
-            provider = Contract(provider_address)
-            tokens = provider.getAllReservesTokens()
+        block_id = snapshot.block_number(network.name)
+
+        with provider_manager.borrow(network.url_rpc):
+            contract = get_contract(
+                pool.contract_address, "AAVE_POOL_ADDRESSES_PROVIDER"
+            )
+            provider_address = contract.getPoolDataProvider(block_id=block_id)
+            provider = get_contract(provider_address, "AAVE_PROTOCOL_DATA_PROVIDER")
+            tokens = provider.getAllReservesTokens(block_id=block_id)
             for token in tokens:
                 token_address = token[1]
                 try:
                     aave_pool_data = provider.getUserReserveData(
-                        token_address, user_address.public_address
+                        token_address, user_address.public_address, block_id=block_id
                     )
                 except Exception as e:
                     logging.error(f"Error fetching data for {token_address}: {e}")
@@ -52,4 +63,5 @@ def update_aave_lending_pools(user_address: UserAddress, snapshot: Snapshot) ->
                     token[0],
                     aave_pool_data.currentATokenBalance / 1e18,
                     snapshot,
+                    writer=writer,
                 )
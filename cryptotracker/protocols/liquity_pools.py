@@ -1,7 +1,8 @@
 import logging
-from ape import Contract, networks
+from typing import Optional
 from decimal import Decimal
 
+from cryptotracker.abi import get_contract
 from cryptotracker.models import (
     Pool,
     Snapshot,
@@ -20,26 +21,43 @@ from cryptotracker.constants import (
 )
 from cryptotracker.protocols.protocols import save_pool_snapshot
 from cryptotracker.protocols.subgraph import send_graphql_query
+from cryptotracker.providers import provider_manager
 from cryptotracker.utils import get_last_price
 from cryptotracker.error_traking import log_snapshot_error
+from cryptotracker.writer import SnapshotWriter, save_row
 
 LQTY_V2_SUBGRAPH_ID = "6bg574MHrEZXopJDYTu7S7TAvJKEMsV111gpKLM7ZCA7"
 
 
-def get_proxy_staking_contract(user_address: UserAddress) -> str:
+def get_ethereum_block(snapshot: Snapshot) -> Optional[int]:
+    """
+    Returns the Ethereum block the snapshot is pinned to (None for the latest block).
+    """
+    return snapshot.block_number(NETWORKS["ETHEREUM"]["name"])
+
+
+def get_proxy_staking_contract(user_address: UserAddress, snapshot: Snapshot) -> str:
     LQTY_V2_STAKING = Pool.objects.get(
         type__name=POOL_TYPES["STAKING"],
         protocol_network__protocol__name=PROTOCOLS_DATA["LQTY_V2"]["name"],
         protocol_network__network__name=NETWORKS["ETHEREUM"]["name"],
     )
 
-    with networks.parse_network_choice(ETHEREUM_RPC):
-        lqty_govern_contract = Contract(LQTY_V2_STAKING.contract_address)
-        return lqty_govern_contract.deriveUserProxyAddress(user_address.public_address)
+    with provider_manager.borrow(ETHEREUM_RPC):
+        lqty_govern_contract = get_contract(
+            LQTY_V2_STAKING.contract_address, "LIQUITY_V2_GOVERNANCE"
+        )
+        return lqty_govern_contract.deriveUserProxyAddress(
+            user_address.public_address, block_id=get_ethereum_block(snapshot)
+        )
 
 
 def get_lqty_stakes(
-    address: str, pool: Pool, snapshot: Snapshot, user_address: UserAddress
+    address: str,
+    pool: Pool,
+    snapshot: Snapshot,
+    user_address: UserAddress,
+    writer: Optional[SnapshotWriter] = None,
 ) -> None:
     """
     Helper to query the LQTY stakes of a given public user_address using the staking pool v1 and save the snapshot
@@ -55,13 +73,15 @@ def get_lqty_stakes(
         protocol_network__network__name=NETWORKS["ETHEREUM"]["name"],
     )
 
-    with networks.parse_network_choice(ETHEREUM_RPC):
-        contract = Contract(LQTY_V1_STAKING.contract_address)
-        lqty_stakes = contract.stakes(address)
+    block_id = get_ethereum_block(snapshot)
+
+    with provider_manager.borrow(ETHEREUM_RPC):
+        contract = get_contract(LQTY_V1_STAKING.contract_address, "LIQUITY_STAKING")
+        lqty_stakes = contract.stakes(address, block_id=block_id)
         if not lqty_stakes:
             return
-        eth_rewards = contract.getPendingETHGain(address)
-        lusd_rewards = contract.getPendingLUSDGain(address)
+        eth_rewards = contract.getPendingETHGain(address, block_id=block_id)
+        lusd_rewards = contract.getPendingLUSDGain(address, block_id=block_id)
 
     save_pool_snapshot(
         pool=pool,
@@ -69,6 +89,7 @@ def get_lqty_stakes(
         token_symbol="LQTY",
         quantity=lqty_stakes / 1e18,
         snapshot=snapshot,
+        writer=writer,
     )
     # Save PoolRewardsSnapshot
     save_pool_snapshot(
@@ -78,6 +99,7 @@ def get_lqty_stakes(
         quantity=eth_rewards / 1e18,
         snapshot=snapshot,
         is_reward=True,
+        writer=writer,
     )
     save_pool_snapshot(
         pool=pool,
@@ -86,10 +108,15 @@ def get_lqty_stakes(
         quantity=lusd_rewards / 1e18,
         snapshot=snapshot,
         is_reward=True,
+        writer=writer,
     )
 
 
-def update_lqty_v1_staking(user_address: UserAddress, snapshot: Snapshot) -> None:
+def update_lqty_v1_staking(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """
     Saves a snapshot of the total LQTY v1 stakes of a given user_address.
     Args:
@@ -103,11 +130,15 @@ def update_lqty_v1_staking(user_address: UserAddress, snapshot: Snapshot) -> Non
         protocol_network__network__name=NETWORKS["ETHEREUM"]["name"],
     )
     get_lqty_stakes(
-        user_address.public_address, LQTY_V1_STAKING, snapshot, user_address
+        user_address.public_address, LQTY_V1_STAKING, snapshot, user_address, writer
     )
 
 
-def update_lqty_v2_staking(user_address: UserAddress, snapshot: Snapshot) -> None:
+def update_lqty_v2_staking(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """
     Saves the total LQTY V2 governance stakes of a given user_address.
     Args:
@@ -121,12 +152,16 @@ def update_lqty_v2_staking(user_address: UserAddress, snapshot: Snapshot) -> Non
         protocol_network__network__name=NETWORKS["ETHEREUM"]["name"],
     )
 
-    proxy_contract = get_proxy_staking_contract(user_address)
+    proxy_contract = get_proxy_staking_contract(user_address, snapshot)
     logging.info(f"Proxy contract for {user_address.public_address}: {proxy_contract}")
-    get_lqty_stakes(proxy_contract, LQTY_V2_STAKING, snapshot, user_address)
+    get_lqty_stakes(proxy_contract, LQTY_V2_STAKING, snapshot, user_address, writer)
 
 
-def update_lqty_stability_pool(user_address: UserAddress, snapshot: Snapshot) -> None:
+def update_lqty_stability_pool(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """
     Saves the LQTY V1 stability pool participation of a given user_address.
     Args:
@@ -140,13 +175,21 @@ def update_lqty_stability_pool(user_address: UserAddress, snapshot: Snapshot) ->
         protocol_network__network__name=NETWORKS["ETHEREUM"]["name"],
     )
 
-    with networks.parse_network_choice(ETHEREUM_RPC):
-        contract = Contract(LQTY_V1_STABILITY_POOL.contract_address)
-        deposits = contract.deposits(user_address.public_address)
+    block_id = get_ethereum_block(snapshot)
+
+    with provider_manager.borrow(ETHEREUM_RPC):
+        contract = get_contract(
+            LQTY_V1_STABILITY_POOL.contract_address, "LIQUITY_V1_STABILITY_POOL"
+        )
+        deposits = contract.deposits(user_address.public_address, block_id=block_id)
         if not deposits.initialValue:
             return
-        ETH_gains = contract.getDepositorETHGain(user_address.public_address)
-        LQTY_gains = contract.getDepositorLQTYGain(user_address.public_address)
+        ETH_gains = contract.getDepositorETHGain(
+            user_address.public_address, block_id=block_id
+        )
+        LQTY_gains = contract.getDepositorLQTYGain(
+            user_address.public_address, block_id=block_id
+        )
 
     # Save PoolBalanceSnapshot
     save_pool_snapshot(
@@ -155,6 +198,7 @@ def update_lqty_stability_pool(user_address: UserAddress, snapshot: Snapshot) ->
         token_symbol="LUSD",
         quantity=deposits.initialValue / 1e18,
         snapshot=snapshot,
+        writer=writer,
     )
     # Save PoolRewardsSnapshot
     save_pool_snapshot(
@@ -164,6 +208,7 @@ def update_lqty_stability_pool(user_address: UserAddress, snapshot: Snapshot) ->
         quantity=ETH_gains / 1e18,
         snapshot=snapshot,
         is_reward=True,
+        writer=writer,
     )
     save_pool_snapshot(
         pool=LQTY_V1_STABILITY_POOL,
@@ -172,11 +217,14 @@ def update_lqty_stability_pool(user_address: UserAddress, snapshot: Snapshot) ->
         quantity=LQTY_gains / 1e18,
         snapshot=snapshot,
         is_reward=True,
+        writer=writer,
     )
 
 
 def update_lqty_stability_pool_v2(
-    user_address: UserAddress, snapshot: Snapshot
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
 ) -> None:
     """
     Saves a snapshot of the participation of a given user_address in the three LIQUITY V2 stabiity pools .
@@ -191,14 +239,20 @@ def update_lqty_stability_pool_v2(
         protocol_network__network__name=NETWORKS["ETHEREUM"]["name"],
     )
 
-    with networks.parse_network_choice(ETHEREUM_RPC):
+    block_id = get_ethereum_block(snapshot)
+
+    with provider_manager.borrow(ETHEREUM_RPC):
         for pool in LQTY_V2_STABILITY_POOLS:
-            contract = Contract(pool.contract_address)
-            deposits = contract.deposits(user_address.public_address)
+            contract = get_contract(pool.contract_address, "LIQUITY_V2_STABILITY_POOL")
+            deposits = contract.deposits(user_address.public_address, block_id=block_id)
             if not deposits:
                 continue
-            coll_gains = contract.getDepositorCollGain(user_address.public_address)
-            yield_gains = contract.getDepositorYieldGain(user_address.public_address)
+            coll_gains = contract.getDepositorCollGain(
+                user_address.public_address, block_id=block_id
+            )
+            yield_gains = contract.getDepositorYieldGain(
+                user_address.public_address, block_id=block_id
+            )
 
             # Save PoolBalanceSnapshot
             save_pool_snapshot(
@@ -207,6 +261,7 @@ def update_lqty_stability_pool_v2(
                 token_symbol="BOLD",
                 quantity=deposits / 1e18,
                 snapshot=snapshot,
+                writer=writer,
             )
             # Save PoolRewardsSnapshot gains (BOLD) and collateral (WETH, wstETH, and rETH)
             save_pool_snapshot(
@@ -216,6 +271,7 @@ def update_lqty_stability_pool_v2(
                 quantity=yield_gains / 1e18,
                 snapshot=snapshot,
                 is_reward=True,
+                writer=writer,
             )
 
             token_symbol = pool.description
@@ -229,10 +285,15 @@ def update_lqty_stability_pool_v2(
                 quantity=coll_gains / 1e18,
                 snapshot=snapshot,
                 is_reward=True,
+                writer=writer,
             )
 
 
-def get_troves(user_address: UserAddress, snapshot: Snapshot) -> None:
+def get_troves(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """Query all the troves for a given user_address using The Graph API"""
     error = ERROR_TYPES["TROVE"]
 
@@ -301,25 +362,33 @@ def get_troves(user_address: UserAddress, snapshot: Snapshot) -> None:
         debt_eur = debt * get_last_price(TOKENS["BOLD"]["name"], snapshot.date)
         balance = collateral_eur - debt_eur
 
-        TroveSnapshot.objects.create(
-            trove=trove_obj,
-            collateral=collateral,
-            debt=debt,
-            balance=balance,
-            interest_rate=Decimal(trove["interestRate"]) / Decimal(1e16),
-            snapshot=snapshot,
+        save_row(
+            TroveSnapshot(
+                trove=trove_obj,
+                collateral=collateral,
+                debt=debt,
+                balance=balance,
+                interest_rate=Decimal(trove["interestRate"]) / Decimal(1e16),
+                snapshot=snapshot,
+            ),
+            writer,
         )
 
 
-def update_lqty_pools(user_address: UserAddress, snapshot: Snapshot) -> None:
+def update_lqty_pools(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """
     Updates the snapshots of the LQTY pools participation for a given user_address.
     Args:
         user_address (UserAddress): The user_address to check.
         snapshot (Snapshot): The snapshot object to associate with the updates.
+        writer (SnapshotWriter, optional): The writer of the work unit.
     """
-    update_lqty_stability_pool(user_address, snapshot)
-    update_lqty_stability_pool_v2(user_address, snapshot)
-    update_lqty_v1_staking(user_address, snapshot)
-    update_lqty_v2_staking(user_address, snapshot)
-    get_troves(user_address, snapshot)
+    update_lqty_stability_pool(user_address, snapshot, writer)
+    update_lqty_stability_pool_v2(user_address, snapshot, writer)
+    update_lqty_v1_staking(user_address, snapshot, writer)
+    update_lqty_v2_staking(user_address, snapshot, writer)
+    get_troves(user_address, snapshot, writer)
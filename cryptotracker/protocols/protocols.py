@@ -2,11 +2,10 @@ import logging
 
 from collections import defaultdict
 from decimal import Decimal
-from typing import Optional, Dict
-from django.db.models import QuerySet
+from typing import Dict, List, Optional, Union
+from django.db.models import Exists, OuterRef, Prefetch, QuerySet
 
 from cryptotracker.models import (
-    Cryptocurrency,
     Pool,
     PoolBalanceSnapshot,
     PoolPosition,
@@ -15,7 +14,8 @@ from cryptotracker.models import (
     TroveSnapshot,
     UserAddress,
 )
-from cryptotracker.utils import get_last_price
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.writer import SnapshotWriter, snapshot_writer
 
 
 def save_pool_snapshot(
@@ -26,41 +26,26 @@ def save_pool_snapshot(
     snapshot: Snapshot,
     is_reward: bool = False,
     pool_id: Optional[str] = None,
+    writer: Optional[SnapshotWriter] = None,
 ) -> None:
     """
     Saves the pool balance or rewards to the database.
     Args:
-        pool_position (PoolPosition): Pool Position
-        pool_id (str, optional): The ID of the pool (default: None).
-        token (Cryptocurrency): The cryptocurrency object.
+        pool (Pool): The pool.
+        address (UserAddress): The owner of the position.
+        token_symbol (str): The symbol of the token.
         quantity (Decimal): The quantity of the token.
         snapshot (Snapshot): The snapshot object.
         is_reward (bool): Whether the data is a reward (default: False).
+        pool_id (str, optional): The ID of the position within the pool (default: None).
+        writer (SnapshotWriter, optional): The writer of the work unit. The row is buffered
+            in it, or written immediately when not given.
     """
     try:
-        token = Cryptocurrency.objects.get(symbol=token_symbol)
-
-        pool_position, created = PoolPosition.objects.get_or_create(
-            user_address=address,
-            pool=pool,
-            position_id=pool_id,
-        )
-
-        if created:
-            logging.info(f"Created new pool position: {pool_position}")
-        else:
-            logging.info(f"Found existing pool position: {pool_position}")
-
-        snapshot_model = PoolRewardsSnapshot if is_reward else PoolBalanceSnapshot
-
-        pool_snapshot = snapshot_model(
-            pool_position=pool_position,
-            token=token,
-            quantity=quantity,
-            snapshot=snapshot,
-        )
-
-        pool_snapshot.save()
+        with snapshot_writer(snapshot, writer) as unit_writer:
+            unit_writer.add_pool_row(
+                pool, address, token_symbol, quantity, is_reward, pool_id
+            )
     except Exception as e:
         logging.warning(
             f"Error saving pool {pool} {'reward' if is_reward else 'balance'}: {e}"
@@ -68,12 +53,21 @@ def save_pool_snapshot(
 
 
 class PoolData:
-    def __init__(self, pool_position: PoolPosition, snapshot: Snapshot):
+    def __init__(
+        self,
+        pool_position: PoolPosition,
+        snapshot: Snapshot,
+        prices: Optional[PriceMatrix] = None,
+    ):
         """
         Initialize PoolData with a pool position and snapshot.
+        The balances are valued with the given prices, loaded for the snapshot if not given.
+        Positions loaded by get_protocols_snapshots carry their balances and rewards
+        of the snapshot already, and are not queried again.
         """
         self.pool_position = pool_position
         self.snapshot = snapshot
+        self.prices = prices or PriceMatrix.for_snapshot(snapshot)
         self.protocol = self._protocol()
         self.balances = self._get_balance()
         self.rewards = self._get_rewards()
@@ -82,37 +76,25 @@ class PoolData:
     def _protocol(self) -> str:
         return self.pool_position.pool.protocol_network.protocol.name
 
-    def _get_balance(self) -> Optional[QuerySet]:
+    def _get_balance(self) -> Union[QuerySet, List[PoolBalanceSnapshot]]:
         """
         Fetch the balance snapshot for the pool position and snapshot.
         """
-        try:
-            return PoolBalanceSnapshot.objects.filter(
-                pool_position=self.pool_position, snapshot=self.snapshot
-            )
-        except PoolBalanceSnapshot.DoesNotExist:
-            logging.warning(
-                ValueError(
-                    f"No balance found for pool {self.pool_position} in snapshot {self.snapshot}"
-                )
-            )
-            return None
+        if hasattr(self.pool_position, "snapshot_balances"):
+            return self.pool_position.snapshot_balances
+        return PoolBalanceSnapshot.objects.filter(
+            pool_position=self.pool_position, snapshot=self.snapshot
+        ).select_related("token")
 
-    def _get_rewards(self) -> Optional[QuerySet]:
+    def _get_rewards(self) -> Union[QuerySet, List[PoolRewardsSnapshot]]:
         """
         Fetch the rewards snapshots for the pool position and snapshot.
         """
-        try:
-            return PoolRewardsSnapshot.objects.filter(
-                pool_position=self.pool_position, snapshot=self.snapshot
-            )
-        except PoolBalanceSnapshot.DoesNotExist:
-            logging.warning(
-                ValueError(
-                    f"No balance found for pool {self.pool_position} in snapshot {self.snapshot}"
-                )
-            )
-            return None
+        if hasattr(self.pool_position, "snapshot_rewards"):
+            return self.pool_position.snapshot_rewards
+        return PoolRewardsSnapshot.objects.filter(
+            pool_position=self.pool_position, snapshot=self.snapshot
+        ).select_related("token")
 
     def _calculate_balance_eur(self) -> Optional[Decimal]:
         """
@@ -120,41 +102,95 @@ class PoolData:
         """
         if not self.balances:
             return None
-        balance_eu = 0
+        balance_eu = Decimal(0)
         for balance in self.balances:
-            current_price = get_last_price(balance.token.name, self.snapshot.date)
+            current_price = self.prices.get(balance.token.name)
             balance_eu += balance.quantity * current_price
 
-        return Decimal(balance_eu)
+        return balance_eu
+
+
+def get_pool_positions(user_addresses: list, snapshot: Snapshot) -> List[PoolPosition]:
+    """
+    Loads the pool positions of a list of user_addresses that hold a balance in a snapshot,
+    with their pool, protocol, network and owner joined and their balances and rewards of the
+    snapshot prefetched (as snapshot_balances and snapshot_rewards).
+    The number of queries does not depend on the number of positions.
+    Args:
+        user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot): The snapshot object.
+    Returns:
+        list: The PoolPosition objects.
+    """
+    balances = PoolBalanceSnapshot.objects.filter(snapshot=snapshot).select_related(
+        "token"
+    )
+    rewards = PoolRewardsSnapshot.objects.filter(snapshot=snapshot).select_related(
+        "token"
+    )
+    return list(
+        PoolPosition.objects.filter(user_address__in=user_addresses)
+        .filter(Exists(balances.filter(pool_position=OuterRef("pk"))))
+        .select_related(
+            "user_address",
+            "pool__type",
+            "pool__protocol_network__protocol",
+            "pool__protocol_network__network",
+        )
+        .prefetch_related(
+            Prefetch(
+                "poolbalancesnapshot_set",
+                queryset=balances,
+                to_attr="snapshot_balances",
+            ),
+            Prefetch(
+                "poolrewardssnapshot_set", queryset=rewards, to_attr="snapshot_rewards"
+            ),
+        )
+    )
 
 
 def get_protocols_snapshots(
-    user_addresses: list, snapshot: Optional[Snapshot] = None
+    user_addresses: list,
+    snapshot: Optional[Snapshot] = None,
+    prices: Optional[PriceMatrix] = None,
 ) -> dict:
     """
     Fetches the last snapshot of the protocols in the database.
-
+    Args:
+        user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot, optional): The snapshot to value (default: the last one).
+        prices (PriceMatrix, optional): The prices of the snapshot, loaded if not given.
     """
     if snapshot is None:
         snapshot = Snapshot.objects.first()
 
-    user_pools = PoolPosition.objects.filter(user_address__in=user_addresses)
+    user_pools = get_pool_positions(user_addresses, snapshot) if snapshot else []
 
     if not user_pools or not snapshot:
         logging.warning("No user pools or last snapshot found.")
         return {"pool_data": {}, "troves": []}
 
+    if prices is None:
+        prices = PriceMatrix.for_snapshot(snapshot)
+    prices.resolve(
+        balance.token.name
+        for pool_position in user_pools
+        # Prefetched by get_pool_positions
+        for balance in getattr(pool_position, "snapshot_balances")
+    )
+
     pool_data = []
 
     for pool_position in user_pools:
-        data = PoolData(pool_position, snapshot)
+        data = PoolData(pool_position, snapshot, prices)
         if data.balances:
             pool_data.append(data)
 
     troves = TroveSnapshot.objects.filter(
         trove__user_address__in=user_addresses,
         snapshot=snapshot,
-    )
+    ).select_related("trove__token")
 
     grouped_data = defaultdict(list)
 
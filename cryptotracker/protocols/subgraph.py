@@ -1,9 +1,13 @@
 import os
 
 import requests
+from django.conf import settings
 
 import logging
 
+from cryptotracker.metrics import observe_external_request
+from cryptotracker.timing import record_call
+
 THE_GRAPH_API_KEY = os.environ.get("THE_GRAPH_API_KEY")
 
 
@@ -11,7 +15,7 @@ def send_graphql_query(id: str, query: str, variables=None) -> dict:
     """
     Sends a GraphQL query to The Graph API and returns the response as a dictionary.
     """
-    url = f"https://gateway.thegraph.com/api/subgraphs/id/{id}"
+    url = f"{settings.THE_GRAPH_API_URL}/subgraphs/id/{id}"
 
     headers = {
         "Content-Type": "application/json",
@@ -25,7 +29,16 @@ def send_graphql_query(id: str, query: str, variables=None) -> dict:
 
     try:
         logging.debug(f"Sending GraphQL query to {url} with payload: {payload}")
-        response = requests.post(url, headers=headers, json=payload)
+        try:
+            response = requests.post(url, headers=headers, json=payload)
+        except requests.exceptions.RequestException:
+            record_call(0, error=True)
+            observe_external_request(url, "error")
+            raise
+        record_call(len(response.content), error=not response.ok)
+        observe_external_request(
+            url, str(response.status_code), response.elapsed.total_seconds()
+        )
         logging.debug(f"Received response: {response.json()}")
         response.raise_for_status()
         if "errors" in response.json():
@@ -1,13 +1,20 @@
 import logging
+from typing import Optional
+
 from cryptotracker.constants import NETWORKS, POOL_TYPES, PROTOCOLS_DATA
 from cryptotracker.models import Cryptocurrency, Pool, Snapshot, UserAddress
 from cryptotracker.protocols.protocols import save_pool_snapshot
 from cryptotracker.protocols.subgraph import send_graphql_query
+from cryptotracker.writer import SnapshotWriter
 
 UNISWAP_V3_SUBGRAPH_ID = "5zvR82QoaXYFyDEKLZ9t6v9adgnptxYpKpSbxtgVENFV"
 
 
-def update_uniswap_v3_positions(user_address: UserAddress, snapshot: Snapshot) -> None:
+def update_uniswap_v3_positions(
+    user_address: UserAddress,
+    snapshot: Snapshot,
+    writer: Optional[SnapshotWriter] = None,
+) -> None:
     """Query all the troves for a given user_address using The Graph API and save snapshots"""
     logging.info("Quering Uniswap v3 subgraph")
 
@@ -62,6 +69,7 @@ def update_uniswap_v3_positions(user_address: UserAddress, snapshot: Snapshot) -
                     quantity=position[f"depositedToken{key}"],
                     snapshot=snapshot,
                     pool_id=str(position["id"]),
+                    writer=writer,
                 )
             if position[f"collectedFeesToken{key}"] != "0":
                 save_pool_snapshot(
@@ -72,4 +80,5 @@ def update_uniswap_v3_positions(user_address: UserAddress, snapshot: Snapshot) -
                     snapshot=snapshot,
                     is_reward=True,
                     pool_id=str(position["id"]),
+                    writer=writer,
                 )
@@ -0,0 +1,161 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from ape import networks
+from ape.api import ProviderAPI
+from django.conf import settings
+
+from cryptotracker.abi import chain_key
+from cryptotracker.metrics import observe_rpc_call
+from cryptotracker.timing import record_call
+
+# Seconds between two health checks of an idle provider connection
+HEALTH_CHECK_INTERVAL = 60
+
+
+def resolve_network_choice(network_choice: str) -> str:
+    """
+    Replaces the provider of a network choice with the JSON-RPC node configured for its
+    chain in settings.RPC_URLS, e.g. "ethereum:mainnet:alchemy" with
+    "ethereum:mainnet:http://localhost:8545".
+    """
+    url = settings.RPC_URLS.get(chain_key(network_choice))
+    if url is None:
+        return network_choice
+    return f"{chain_key(network_choice)}:{url}"
+
+
+def meter_rpc(provider: ProviderAPI, network: str) -> None:
+    """
+    Meters the JSON-RPC requests of a connected provider: their response time and outcome
+    per method in the Prometheus metrics, and each response, with its size and whether it
+    is an error, in the snapshot stage running in the calling thread (see cryptotracker.timing).
+    Providers without a web3 HTTP provider are left as they are.
+    Args:
+        provider (ProviderAPI): The connected provider.
+        network (str): The network label of the metrics, e.g. "ethereum:mainnet".
+    """
+    try:
+        web3_provider = provider.web3.provider
+        make_request = web3_provider.make_request
+        decode = web3_provider.decode_rpc_response
+    except Exception:
+        return
+    # A reconnected provider may keep its web3 provider, already metered
+    if getattr(web3_provider, "_metered", False):
+        return
+
+    def timed_request(method, params):
+        start = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception:
+            observe_rpc_call(network, method, time.perf_counter() - start, error=True)
+            raise
+        observe_rpc_call(
+            network,
+            method,
+            time.perf_counter() - start,
+            error=isinstance(response, dict) and "error" in response,
+        )
+        return response
+
+    def decode_and_record(raw_response: bytes):
+        response = decode(raw_response)
+        responses = response if isinstance(response, list) else [response]
+        record_call(
+            len(raw_response),
+            error=any(isinstance(item, dict) and "error" in item for item in responses),
+        )
+        return response
+
+    setattr(web3_provider, "_metered", True)
+    web3_provider.make_request = timed_request
+    web3_provider.decode_rpc_response = decode_and_record
+
+
+class ProviderManager:
+    """
+    Keeps one open provider connection per network choice for the lifetime of the process
+    (a Celery worker or the web server), so the connection and chain ID handshake
+    are not repeated for every address, pool or task.
+    """
+
+    def __init__(self, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.health_check_interval = health_check_interval
+        self._providers: Dict[str, ProviderAPI] = {}
+        self._last_checked: Dict[str, float] = {}
+
+    @contextmanager
+    def borrow(self, network_choice: Optional[str]) -> Iterator[ProviderAPI]:
+        """
+        Makes the connection of a network the active ape provider for the duration of the context.
+        The connection is opened on first use and stays open when the context exits.
+        Args:
+            network_choice (str): The ape network choice, e.g. "ethereum:mainnet:alchemy".
+                None, as read from a network without url_rpc, raises a ValueError.
+        Yields:
+            ProviderAPI: The connected provider.
+        """
+        if not network_choice:
+            raise ValueError("No network choice given: the network has no url_rpc set")
+        provider = self._get_provider(resolve_network_choice(network_choice))
+        previous_provider = networks.active_provider
+        networks.active_provider = provider
+        try:
+            yield provider
+        finally:
+            networks.active_provider = previous_provider
+
+    def close_all(self) -> None:
+        """
+        Disconnects all the open providers.
+        """
+        for network_choice, provider in self._providers.items():
+            self._disconnect(network_choice, provider)
+        self._providers.clear()
+        self._last_checked.clear()
+
+    def _get_provider(self, network_choice: str) -> ProviderAPI:
+        provider = self._providers.get(network_choice)
+        if provider is not None:
+            if self._is_healthy(network_choice, provider):
+                return provider
+            logging.warning(f"Provider {network_choice} is unhealthy, reconnecting")
+            self._disconnect(network_choice, provider)
+
+        logging.info(f"Opening provider connection to {network_choice}")
+        provider = networks.get_provider_from_choice(network_choice)
+        provider.connect()
+        meter_rpc(provider, chain_key(network_choice))
+        self._providers[network_choice] = provider
+        self._last_checked[network_choice] = time.monotonic()
+        return provider
+
+    def _is_healthy(self, network_choice: str, provider: ProviderAPI) -> bool:
+        """
+        Checks the connection at most once every health_check_interval seconds.
+        """
+        now = time.monotonic()
+        if now - self._last_checked.get(network_choice, 0) < self.health_check_interval:
+            return True
+        try:
+            healthy = provider.is_connected
+        except Exception as e:
+            logging.warning(f"Health check of {network_choice} failed: {e}")
+            healthy = False
+        if healthy:
+            self._last_checked[network_choice] = now
+        return healthy
+
+    def _disconnect(self, network_choice: str, provider: ProviderAPI) -> None:
+        try:
+            provider.disconnect()
+        except Exception as e:
+            logging.warning(f"Error disconnecting from {network_choice}: {e}")
+
+
+# Process-wide manager shared by all the tasks running in a worker
+provider_manager = ProviderManager()
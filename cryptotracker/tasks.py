@@ -1,178 +1,574 @@
 import logging
+import time
 
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, NamedTuple, Optional
 
-from celery import shared_task, group
+from celery import chord, shared_task
 from celery.exceptions import TimeoutError
+from celery.result import AsyncResult
+from django.db.models import F
+from django.utils import timezone
 
-from cryptotracker.models import Cryptocurrency, Price, Snapshot, UserAddress
+from cryptotracker.models import (
+    Cryptocurrency,
+    Network,
+    Price,
+    Snapshot,
+    SnapshotBlock,
+    SnapshotRun,
+    SnapshotWorkUnit,
+    UserAddress,
+)
 from cryptotracker.protocols.aave import update_aave_lending_pools
 from cryptotracker.protocols.liquity_pools import update_lqty_pools
 from cryptotracker.protocols.uniswap import update_uniswap_v3_positions
 from cryptotracker.eth_staking import fetch_staking_assets
-from cryptotracker.tokens import fetch_assets
-from cryptotracker.utils import fetch_cryptocurrency_price
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.providers import provider_manager
+from cryptotracker.timing import StageMeter, record_write, timed_stage
+from cryptotracker.tokens import sweep_assets
+from cryptotracker.valuation import write_portfolio_valuations
+from cryptotracker.writer import SnapshotWriter
+from cryptotracker.utils import (
+    backfill_historical_prices,
+    fetch_cryptocurrency_price,
+    invalidate_price_cache,
+)
+
+
+SNAPSHOT_SOURCES = {
+    "staking": fetch_staking_assets,
+    "liquity": update_lqty_pools,
+    "aave": update_aave_lending_pools,
+    "uniswap": update_uniswap_v3_positions,
+}
+
+
+class WorkUnitKey(NamedTuple):
+    """
+    Identifies a work unit within its snapshot, as stored in SnapshotWorkUnit.
+    """
+
+    source: str
+    user_address_id: Optional[int] = None
+    network_id: Optional[int] = None
 
 
 @shared_task(bind=True)
-def run_daily_snapshot_update(self, user_id: Optional[int] = None) -> group:
+def run_daily_snapshot_update(self, user_id: Optional[int] = None) -> AsyncResult:
     """
     Coordinates the daily snapshot update process.
-    Creates a snapshot and then runs all update tasks in parallel.
+    Creates a snapshot and fans out its work units across the workers as a chord,
+    with finalize_snapshot as the completion callback. The timings of the units are
+    recorded in a SnapshotRun.
+    Returns:
+        AsyncResult: The result of the completion callback.
     """
     # Create the snapshot first
     snapshot_id = create_snapshot()
 
-    # Run tasks in parallel
-    task_group = group(
-        update_cryptocurrency_price.s(snapshot_id),
-        update_assets_database.s(snapshot_id, user_id),
-        update_staking_assets.s(snapshot_id, user_id),
-        update_protocols.s(snapshot_id, user_id),
-    )
+    run = SnapshotRun.objects.create(snapshot_id=snapshot_id, user_id=user_id)
+    units = build_snapshot_units(snapshot_id, user_id, run.id)
+    run.units = len(units)
+    run.save(update_fields=["units"])
+    logging.info(f"Scheduling {len(units)} work units for snapshot {snapshot_id}")
 
-    result = task_group.apply_async()
-    return result
+    return chord(units)(finalize_snapshot.s(snapshot_id, user_id, run.id))
 
 
-@shared_task(bind=True)
-def create_snapshot(self) -> int:
+def unresumable_reason(snapshot_id: int) -> Optional[str]:
     """
-    Creates a new Snapshot entry and returns its ID.
+    Tells why resuming a snapshot would overwrite its stored rows with the current state
+    of the chains: a snapshot taken before its units were tracked, or not pinned to any
+    block, would be fetched again in full at the latest blocks.
+    Args:
+        snapshot_id (int): The ID of the Snapshot.
     Returns:
-        int: The ID of the created Snapshot.
+        str: The reason, or None when the snapshot can be resumed.
     """
-    snapshot = Snapshot.objects.create(date=datetime.now())
-    return snapshot.id
+    if not SnapshotWorkUnit.objects.filter(snapshot_id=snapshot_id).exists():
+        return "its work units were not tracked"
+    if not SnapshotBlock.objects.filter(snapshot_id=snapshot_id).exists():
+        return "it is not pinned to any block"
+    return None
 
 
 @shared_task(bind=True)
-def update_cryptocurrency_price(self, snapshot_id: int) -> str:
+def resume_snapshot(
+    self, snapshot_id: int, user_id: Optional[int] = None, force: bool = False
+) -> Optional[AsyncResult]:
     """
-    Fetches the current price of each cryptocurrency and stores it in the database with the given Snapshot.
+    Re-runs the work units of a snapshot that failed or never completed, into the same
+    snapshot (read at its pinned blocks), in a new SnapshotRun, then stores its valuations
+    again. Only the units recorded as failed or pending are run. Snapshots whose units
+    were not tracked or that are not pinned are refused (see unresumable_reason) unless
+    forced, in which case every unit that did not succeed is run.
     Args:
-        snapshot_id (int): The ID of the Snapshot to associate with the prices.
+        snapshot_id (int): The ID of the Snapshot to resume.
+        user_id (int, optional): Restrict the units to the addresses of this user.
+            Defaults to the user of the first run of the snapshot.
+        force (bool): Resume the snapshot even if it cannot be resumed safely.
     Returns:
-        str: A success message.
+        AsyncResult: The result of the completion callback, or None when every unit
+        of the snapshot already succeeded.
     """
-    logging.info("Updating cryptocurrency prices...", snapshot_id)
-    snapshot = Snapshot.objects.get(id=snapshot_id)
-    cryptocurrencies = Cryptocurrency.objects.all()
-    crypto_ids = [crypto.name for crypto in cryptocurrencies]
-
-    prices = fetch_cryptocurrency_price(crypto_ids)
-    if prices is None:
-        logging.error("Failed to fetch cryptocurrency prices.")
-        return "Failed to update cryptocurrency prices."
-
-    for crypto in crypto_ids:
-        crypto_price = Price(
-            cryptocurrency=Cryptocurrency.objects.get(name=crypto),
-            price=prices[crypto]["eur"],
-            snapshot=snapshot,
+    reason = unresumable_reason(snapshot_id)
+    if reason is not None and not force:
+        raise ValueError(f"Snapshot {snapshot_id} cannot be resumed: {reason}")
+
+    if user_id is None:
+        user_id = (
+            SnapshotRun.objects.filter(snapshot_id=snapshot_id)
+            .order_by("started_at")
+            .values_list("user_id", flat=True)
+            .first()
         )
-        crypto_price.save()
-        logging.info(f"Price of {crypto} updated to {prices[crypto]['eur']} EUR")
-    return "Cryptocurrency prices updated successfully!"
 
+    run = SnapshotRun.objects.create(snapshot_id=snapshot_id, user_id=user_id)
+    units = build_snapshot_units(
+        snapshot_id, user_id, run.id, unfinished_only=True, force=force
+    )
+    run.units = len(units)
+    if not units:
+        run.finished_at = timezone.now()
+        run.save(update_fields=["units", "finished_at"])
+        logging.info(f"Snapshot {snapshot_id} has no unfinished work units")
+        return None
+    run.save(update_fields=["units"])
+    logging.info(f"Resuming snapshot {snapshot_id} with {len(units)} work units")
+
+    return chord(units)(finalize_snapshot.s(snapshot_id, user_id, run.id))
 
-@shared_task(bind=True)
-def update_assets_database(self, snapshot_id: int, user_id: Optional[int]) -> str:
+
+def build_snapshot_units(
+    snapshot_id: int,
+    user_id: Optional[int] = None,
+    run_id: Optional[int] = None,
+    unfinished_only: bool = False,
+    force: bool = False,
+) -> list:
     """
-    Fetches the assets of a user and stores them in the database with the given Snapshot.
+    Splits a snapshot update into independent work units:
+    the prices, the token balances of each network (swept across all the addresses)
+    and one unit per (address, source) for staking and protocols.
+    When a run is given, the units are tracked as pending SnapshotWorkUnit rows.
     Args:
-        snapshot_id (int): The ID of the Snapshot to associate with the assets.
+        snapshot_id (int): The ID of the Snapshot to update.
+        user_id (int, optional): Restrict the units to the addresses of this user.
+        run_id (int, optional): The ID of the SnapshotRun recording the timings of the units.
+        unfinished_only (bool): Only keep the units recorded as failed or pending, to resume
+            the snapshot.
+        force (bool): With unfinished_only, keep every unit that did not succeed,
+            including the units that were never recorded.
     Returns:
-        str: A success message.
+        list: The task signatures of the work units.
     """
-    logging.info("Updating assets database...")
-    snapshot = Snapshot.objects.get(id=snapshot_id)
+    user_addresses = UserAddress.objects.all()
+    if user_id is not None:
+        user_addresses = user_addresses.filter(user_id=user_id)
+    user_address_ids = list(user_addresses.values_list("id", flat=True))
 
-    if user_id is None:
-        logging.info("Automated daily snapshot update initiated.")
-        user_addresses = UserAddress.objects.all()
+    units = [
+        (WorkUnitKey("prices"), update_cryptocurrency_price.si(snapshot_id, run_id))
+    ]
+    if user_address_ids:
+        for network_id in Network.objects.values_list("id", flat=True):
+            units.append(
+                (
+                    WorkUnitKey("tokens", network_id=network_id),
+                    update_network_assets.si(
+                        snapshot_id, network_id, user_address_ids, run_id
+                    ),
+                )
+            )
+        for user_address_id in user_address_ids:
+            for source in SNAPSHOT_SOURCES:
+                units.append(
+                    (
+                        WorkUnitKey(source, user_address_id=user_address_id),
+                        update_address_source.si(
+                            snapshot_id, user_address_id, source, run_id
+                        ),
+                    )
+                )
+
+    if unfinished_only:
+        statuses = {
+            WorkUnitKey(*row[:3]): row[3]
+            for row in SnapshotWorkUnit.objects.filter(
+                snapshot_id=snapshot_id
+            ).values_list("source", "user_address_id", "network_id", "status")
+        }
+        # A unit without a row was never scheduled for this snapshot
+        kept: tuple = (SnapshotWorkUnit.FAILED, SnapshotWorkUnit.PENDING)
+        if force:
+            kept += (None,)
+        units = [(key, unit) for key, unit in units if statuses.get(key) in kept]
+    if run_id is not None:
+        track_work_units(snapshot_id, [key for key, _ in units])
+    return [unit for _, unit in units]
+
+
+def track_work_units(snapshot_id: int, keys: List[WorkUnitKey]) -> None:
+    """
+    Marks the scheduled work units of a snapshot as pending, creating the SnapshotWorkUnit
+    rows of the units scheduled for the first time.
+    Args:
+        snapshot_id (int): The ID of the Snapshot.
+        keys (list): The keys of the scheduled units.
+    """
+    existing: Dict[WorkUnitKey, int] = {
+        WorkUnitKey(*row[1:]): row[0]
+        for row in SnapshotWorkUnit.objects.filter(snapshot_id=snapshot_id).values_list(
+            "id", "source", "user_address_id", "network_id"
+        )
+    }
+    SnapshotWorkUnit.objects.filter(
+        id__in=[existing[key] for key in keys if key in existing]
+    ).update(status=SnapshotWorkUnit.PENDING, error="", updated_at=timezone.now())
+    SnapshotWorkUnit.objects.bulk_create(
+        SnapshotWorkUnit(
+            snapshot_id=snapshot_id,
+            source=key.source,
+            user_address_id=key.user_address_id,
+            network_id=key.network_id,
+        )
+        for key in keys
+        if key not in existing
+    )
+
+
+def fail_on_call_errors(unit: Dict[str, str], stage: StageMeter) -> None:
+    """
+    Fails a work unit whose source returned normally although every one of its external
+    calls failed: the sources skip the data they could not fetch instead of raising.
+    Some of the calls failing is tolerated, as the sources skip single items on purpose
+    (e.g. a reserve Aave cannot read), and only logged.
+    Args:
+        unit (dict): The unit description and its status.
+        stage (StageMeter): The meter of the unit.
+    """
+    if unit["status"] != "success" or not stage.errors:
+        return
+    if stage.errors >= stage.calls:
+        unit["status"] = "failed"
+        unit["error"] = f"{stage.errors} of {stage.calls} external calls failed"
     else:
-        logging.info(f"User initiated a daily snapshot update with user ID: {user_id}")
-        user_addresses = UserAddress.objects.filter(user_id=user_id)
+        logging.warning(
+            f"{stage.errors} of the {stage.calls} external calls of {unit} failed"
+        )
+
 
-    for user_address in user_addresses:
+def complete_work_unit(
+    snapshot_id: int,
+    run_id: Optional[int],
+    key: WorkUnitKey,
+    error: Optional[str] = None,
+) -> None:
+    """
+    Stores the outcome of a work unit scheduled by a run, so that resume_snapshot retries
+    it if it failed. Units run outside of a run are not tracked.
+    Args:
+        snapshot_id (int): The ID of the Snapshot of the unit.
+        run_id (int, optional): The ID of the SnapshotRun that scheduled the unit.
+        key (WorkUnitKey): The key of the unit.
+        error (str, optional): Why the unit failed, None when it succeeded.
+    """
+    if run_id is None:
+        return
+    # The key fields match the model fields, a None ID filters on IS NULL
+    SnapshotWorkUnit.objects.filter(snapshot_id=snapshot_id, **key._asdict()).update(
+        status=SnapshotWorkUnit.SUCCESS if error is None else SnapshotWorkUnit.FAILED,
+        error=(error or "")[:200],
+        attempts=F("attempts") + 1,
+        updated_at=timezone.now(),
+    )
+
+
+@shared_task(bind=True)
+def update_network_assets(
+    self,
+    snapshot_id: int,
+    network_id: int,
+    user_address_ids: List[int],
+    run_id: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Work unit: fetches the token balances of a list of addresses on one network.
+    Args:
+        snapshot_id (int): The ID of the Snapshot to associate with the assets.
+        network_id (int): The ID of the Network to read.
+        user_address_ids (list): The IDs of the UserAddress objects to read.
+        run_id (int, optional): The ID of the SnapshotRun recording the timing of the unit.
+    Returns:
+        dict: The unit description and its status.
+    """
+    unit = {"source": "tokens", "network": str(network_id), "status": "success"}
+    with timed_stage(run_id, "tokens", network_id=network_id) as stage:
         try:
-            logging.info(
-                f"Fetching assets for user_address: {user_address.public_address}"
+            snapshot = Snapshot.objects.get(id=snapshot_id)
+            network = Network.objects.get(id=network_id)
+            user_addresses = list(UserAddress.objects.filter(id__in=user_address_ids))
+            with SnapshotWriter(snapshot) as writer:
+                if sweep_assets(
+                    user_addresses, snapshot, network=network, writer=writer
+                ):
+                    unit["status"] = "failed"
+                    unit["error"] = "The balances could not be fetched"
+        except Exception as e:
+            logging.error(
+                f"An error occurred updating assets of network {network_id}: {e}"
             )
-            fetch_assets(user_address, snapshot)
+            unit["status"] = "failed"
+            unit["error"] = str(e)
+            stage.errors += 1
+        fail_on_call_errors(unit, stage)
+    complete_work_unit(
+        snapshot_id,
+        run_id,
+        WorkUnitKey("tokens", network_id=network_id),
+        unit.get("error"),
+    )
+    return unit
+
+
+@shared_task(bind=True)
+def update_address_source(
+    self,
+    snapshot_id: int,
+    user_address_id: int,
+    source: str,
+    run_id: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Work unit: fetches the data of one source (staking or protocol) for one address.
+    Args:
+        snapshot_id (int): The ID of the Snapshot to associate with the data.
+        user_address_id (int): The ID of the UserAddress to read.
+        source (str): A key of SNAPSHOT_SOURCES.
+        run_id (int, optional): The ID of the SnapshotRun recording the timing of the unit.
+    Returns:
+        dict: The unit description and its status.
+    """
+    unit = {"source": source, "user_address": str(user_address_id), "status": "success"}
+    with timed_stage(run_id, source, user_address_id=user_address_id) as stage:
+        try:
+            snapshot = Snapshot.objects.get(id=snapshot_id)
+            user_address = UserAddress.objects.get(id=user_address_id)
+            logging.info(f"Fetching {source} for user_address: {user_address}")
+            # The rows of the unit are written together once the source has been read
+            with SnapshotWriter(snapshot) as writer:
+                SNAPSHOT_SOURCES[source](user_address, snapshot, writer)
         except TimeoutError:
-            logging.error("TimeoutError: Retrying...")
-            continue
+            logging.error(
+                f"TimeoutError fetching {source} for address {user_address_id}"
+            )
+            unit["status"] = "failed"
+            unit["error"] = "TimeoutError"
+            stage.errors += 1
         except Exception as e:
-            logging.error(f"An error occurred: {e}")
-            continue
-    return "Assets updated successfully!"
+            logging.error(
+                f"An error occurred fetching {source} for address {user_address_id}: {e}"
+            )
+            unit["status"] = "failed"
+            unit["error"] = str(e)
+            stage.errors += 1
+        fail_on_call_errors(unit, stage)
+    complete_work_unit(
+        snapshot_id,
+        run_id,
+        WorkUnitKey(source, user_address_id=user_address_id),
+        unit.get("error"),
+    )
+    return unit
 
 
 @shared_task(bind=True)
-def update_staking_assets(self, snapshot_id: int, user_id: Optional[int]) -> str:
+def finalize_snapshot(
+    self,
+    results: List[Any],
+    snapshot_id: int,
+    user_id: Optional[int] = None,
+    run_id: Optional[int] = None,
+) -> str:
     """
-    Fetches the staking assets of a user and stores them in the database with the given Snapshot.
+    Completion callback of the snapshot chord, called once all the work units have finished.
+    Stores the valuation of every address covered by the snapshot and closes its run.
     Args:
-        snapshot_id (int): The ID of the Snapshot to associate with the staking assets.
+        results (list): The return values of the work units.
+        snapshot_id (int): The ID of the completed Snapshot.
+        user_id (int, optional): The user the snapshot was restricted to.
+        run_id (int, optional): The ID of the SnapshotRun of the snapshot.
     Returns:
-        str: A success message.
+        str: A summary message.
     """
-    snapshot = Snapshot.objects.get(id=snapshot_id)
-
-    if user_id is None:
-        logging.info("Automated daily snapshot update initiated.")
-        user_addresses = UserAddress.objects.all()
-    else:
-        logging.info(f"User initiated a daily snapshot update with user ID: {user_id}")
-        user_addresses = UserAddress.objects.filter(user_id=user_id)
+    failed = [
+        result
+        for result in results
+        if isinstance(result, dict) and result.get("status") == "failed"
+    ]
+    for unit in failed:
+        logging.warning(f"Snapshot {snapshot_id} work unit failed: {unit}")
+    logging.info(
+        f"Snapshot {snapshot_id} completed: {len(results)} work units, {len(failed)} failed"
+    )
 
-    for user_address in user_addresses:
+    user_addresses = UserAddress.objects.all()
+    if user_id is not None:
+        user_addresses = user_addresses.filter(user_id=user_id)
+    with timed_stage(run_id, "valuations") as stage:
         try:
-            logging.info(
-                f"Fetching staking assets for user_address: {user_address.public_address}"
+            start = time.perf_counter()
+            rows = write_portfolio_valuations(
+                Snapshot.objects.get(id=snapshot_id), list(user_addresses)
             )
-            fetch_staking_assets(user_address, snapshot)
-        except TimeoutError:
-            logging.error("TimeoutError: Retrying...")
-            continue
+            record_write(time.perf_counter() - start, rows)
         except Exception as e:
-            logging.error(f"An error occurred: {e}")
+            logging.error(
+                f"Error storing the valuations of snapshot {snapshot_id}: {e}"
+            )
+            stage.errors += 1
+
+    if run_id is not None:
+        SnapshotRun.objects.filter(id=run_id).update(
+            finished_at=timezone.now(), failed_units=len(failed)
+        )
+    return f"Snapshot {snapshot_id} completed with {len(failed)} failed work units."
+
+
+@shared_task(bind=True)
+def create_snapshot(self) -> int:
+    """
+    Creates a new Snapshot entry, pins it to the latest block of each network and returns its ID.
+    Returns:
+        int: The ID of the created Snapshot.
+    """
+    snapshot = Snapshot.objects.create(date=datetime.now())
+    pin_snapshot_blocks(snapshot)
+    return snapshot.id
+
+
+def pin_snapshot_blocks(snapshot: Snapshot) -> None:
+    """
+    Resolves the latest block number of each network and stores it with the snapshot,
+    so that all the reads of the snapshot come from one consistent chain state.
+    Networks whose block cannot be resolved are read at the latest block.
+    Args:
+        snapshot (Snapshot): The Snapshot to pin.
+    """
+    blocks = []
+    for network in Network.objects.all():
+        try:
+            with provider_manager.borrow(network.url_rpc) as provider:
+                block_number = provider.get_block("latest").number
+        except Exception as e:
+            logging.error(f"Could not resolve the block of network {network.name}: {e}")
             continue
-    return "Staking assets updated successfully!"
+        blocks.append(
+            SnapshotBlock(snapshot=snapshot, network=network, block_number=block_number)
+        )
+    SnapshotBlock.objects.bulk_create(blocks)
 
 
 @shared_task(bind=True)
-def update_protocols(self, snapshot_id: int, user_id: Optional[int]) -> str:
+def update_cryptocurrency_price(
+    self, snapshot_id: int, run_id: Optional[int] = None
+) -> Dict[str, str]:
     """
-    Fetches the protocols of a user and stores them in the database with the given Snapshot.
+    Work unit: fetches the current price of each cryptocurrency and stores it with the given
+    Snapshot. The unit fails when some prices are missing, so that they are retried when
+    the snapshot is resumed.
     Args:
-        snapshot_id (int): The ID of the Snapshot to associate with the protocols.
+        snapshot_id (int): The ID of the Snapshot to associate with the prices.
+        run_id (int, optional): The ID of the SnapshotRun recording the timing of the step.
     Returns:
-        str: A success message.
+        dict: The unit description and its status.
     """
+    unit = {"source": "prices", "status": "success"}
+    with timed_stage(run_id, "prices") as stage:
+        try:
+            missing = store_snapshot_prices(snapshot_id)
+            if missing:
+                logging.warning(f"No price returned for {', '.join(missing)}")
+                unit["status"] = "failed"
+                unit["error"] = f"No price returned for {', '.join(missing)}"
+        except Exception as e:
+            logging.error(
+                f"An error occurred updating the prices of snapshot {snapshot_id}: {e}"
+            )
+            unit["status"] = "failed"
+            unit["error"] = str(e)
+            stage.errors += 1
+    complete_work_unit(snapshot_id, run_id, WorkUnitKey("prices"), unit.get("error"))
+    return unit
+
 
+def store_snapshot_prices(snapshot_id: int) -> List[str]:
+    """
+    Stores the price of each cryptocurrency with a Snapshot. All the prices of the snapshot
+    are upserted in one statement, replacing any previous ones. The current prices are
+    fetched for a snapshot of today, the daily closes of its day for an older one
+    (as when it is resumed).
+    Args:
+        snapshot_id (int): The ID of the Snapshot to associate with the prices.
+    Returns:
+        list: The IDs of the cryptocurrencies the API returned no price for.
+    """
+    logging.info(f"Updating cryptocurrency prices of snapshot {snapshot_id}...")
     snapshot = Snapshot.objects.get(id=snapshot_id)
+    cryptocurrencies = {crypto.name: crypto for crypto in Cryptocurrency.objects.all()}
 
-    if user_id is None:
-        logging.info("Automated daily snapshot update initiated.")
-        user_addresses = UserAddress.objects.all()
+    if snapshot.date.date() == timezone.now().date():
+        prices = fetch_cryptocurrency_price(list(cryptocurrencies))
+        if prices is None:
+            raise ValueError("No prices returned")
+        closes = {
+            crypto_id: price["eur"]
+            for crypto_id, price in prices.items()
+            if "eur" in price
+        }
     else:
-        logging.info(f"User initiated a daily snapshot update with user ID: {user_id}")
-        user_addresses = UserAddress.objects.filter(user_id=user_id)
+        # Stored daily closes first, then the history endpoint, as for the valuations
+        matrix = PriceMatrix(snapshot, {})
+        matrix.resolve(cryptocurrencies)
+        closes = matrix.prices
 
-    for user_address in user_addresses:
-        try:
-            logging.info(f"Fetching protocols for user_address: {user_address}")
-            update_lqty_pools(user_address, snapshot)
-            update_aave_lending_pools(user_address, snapshot)
-            update_uniswap_v3_positions(user_address, snapshot)
-        except TimeoutError:
-            logging.error("TimeoutError: Retrying...")
-            continue
-        except Exception as e:
-            logging.error(f"An error occurred: {e}")
-            continue
-    return "Protocols updated successfully!"
+    missing = [crypto_id for crypto_id in cryptocurrencies if crypto_id not in closes]
+    new_prices = [
+        Price(cryptocurrency=crypto, price=closes[crypto_id], snapshot=snapshot)
+        for crypto_id, crypto in cryptocurrencies.items()
+        if crypto_id in closes
+    ]
+    start = time.perf_counter()
+    Price.objects.bulk_create(
+        new_prices,
+        update_conflicts=True,
+        unique_fields=["snapshot", "cryptocurrency"],
+        update_fields=["price"],
+    )
+    record_write(time.perf_counter() - start, len(new_prices))
+    invalidate_price_cache(snapshot.date, cryptocurrencies)
+    logging.info(f"Stored {len(new_prices)} prices of snapshot {snapshot_id}")
+    return missing
+
+
+@shared_task(bind=True)
+def backfill_prices(
+    self, start: str, end: str, crypto_ids: Optional[List[str]] = None
+) -> Dict[str, int]:
+    """
+    Stores the daily closing prices of the cryptocurrencies (all of them by default) over a date range.
+    Args:
+        start (str): The first day of the range, in ISO format.
+        end (str): The last day of the range (included), in ISO format.
+        crypto_ids (list, optional): The IDs of the cryptocurrencies to backfill.
+    Returns:
+        dict: The number of days stored for each cryptocurrency (-1 when the fetch failed).
+    """
+    if crypto_ids is None:
+        crypto_ids = list(Cryptocurrency.objects.values_list("name", flat=True))
+    logging.info(f"Backfilling prices of {len(crypto_ids)} cryptocurrencies")
+    return backfill_historical_prices(
+        crypto_ids, date.fromisoformat(start), date.fromisoformat(end)
+    )
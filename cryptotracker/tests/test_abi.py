@@ -0,0 +1,47 @@
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from cryptotracker.abi import MINIMAL_ABIS, AbiStore, get_contract
+from cryptotracker.constants import PROTOCOLS_DATA, TOKENS
+
+
+class AbiStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = AbiStore(directory.name)
+
+    def test_seed_stores_known_contracts(self):
+        self.assertGreater(self.store.seed(), 0)
+        lqty = TOKENS["LQTY"]["token_address"]["Ethereum"]
+        self.assertEqual(
+            self.store.get("ethereum:mainnet", lqty), MINIMAL_ABIS["ERC20"]
+        )
+        stability_pool = PROTOCOLS_DATA["LQTY_V1"]["Ethereum"][1]["contract_address"]
+        self.assertEqual(
+            self.store.get("ethereum:mainnet", stability_pool),
+            MINIMAL_ABIS["LIQUITY_V1_STABILITY_POOL"],
+        )
+        self.assertIsNone(self.store.get("arbitrum:mainnet", "0x0"))
+
+    @patch("cryptotracker.abi.networks")
+    @patch("cryptotracker.abi.Contract")
+    def test_get_contract_binds_cached_abi_without_lookup(self, contract, networks):
+        networks.provider.network_choice = "ethereum:mainnet:alchemy"
+        self.store.put("ethereum:mainnet", "0xabc", MINIMAL_ABIS["ERC20"])
+        with patch("cryptotracker.abi.abi_store", self.store):
+            get_contract("0xabc")
+        contract.assert_called_once_with(
+            "0xabc",
+            abi=MINIMAL_ABIS["ERC20"],
+            fetch_from_explorer=False,
+            detect_proxy=False,
+        )
+
+    @patch("cryptotracker.abi.Contract")
+    def test_get_contract_rejects_missing_address(self, contract):
+        with self.assertRaisesMessage(ValueError, "LIQUITY_STAKING"):
+            get_contract(None, "LIQUITY_STAKING")
+        contract.assert_not_called()
@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase, override_settings
+from eth_abi import decode, encode
+
+from cryptotracker.benchmark.apis import (
+    BeaconchainStandIn,
+    CoinGeckoStandIn,
+    SubgraphStandIn,
+)
+from cryptotracker.benchmark.chain import ChainStandIn
+from cryptotracker.benchmark.server import token_amount
+from cryptotracker.constants import MULTICALL3_ADDRESS, TOKENS
+from cryptotracker.eth_staking import (
+    get_rewards,
+    get_validators_from_withdrawal,
+    get_validators_info,
+)
+from cryptotracker.multicall import (
+    BALANCE_OF_SELECTOR,
+    GET_ETH_BALANCE_SELECTOR,
+)
+from cryptotracker.protocols.liquity_pools import LQTY_V2_SUBGRAPH_ID
+from cryptotracker.protocols.subgraph import send_graphql_query
+from cryptotracker.providers import resolve_network_choice
+from cryptotracker.utils import fetch_cryptocurrency_price, fetch_price_range
+
+ADDRESS = "0x" + "ab" * 20
+
+
+class ApiStandInTests(SimpleTestCase):
+    """
+    The API clients of the pipeline read the stand-ins once the settings point at them.
+    """
+
+    def test_coingecko(self):
+        with CoinGeckoStandIn() as coingecko, override_settings(
+            COINGECKO_API_URL=coingecko.url
+        ):
+            prices = fetch_cryptocurrency_price(["ethereum", "liquity"])
+            closes = fetch_price_range(
+                "ethereum",
+                datetime(2025, 1, 1, tzinfo=timezone.utc).date(),
+                datetime(2025, 1, 3, tzinfo=timezone.utc).date(),
+            )
+
+        self.assertEqual(set(prices), {"ethereum", "liquity"})
+        self.assertGreater(prices["ethereum"]["eur"], 0)
+        self.assertEqual(len(closes), 3)
+        self.assertEqual(
+            coingecko.calls, {"simple/price": 1, "coins/market_chart/range": 1}
+        )
+
+    def test_beaconchain(self):
+        with BeaconchainStandIn(validators=3) as beaconchain, override_settings(
+            BEACONCHAIN_API_URL=beaconchain.url
+        ):
+            indexes = get_validators_from_withdrawal(ADDRESS)
+            details = get_validators_info(indexes)
+            rewards = get_rewards(indexes)
+            # The same address keeps its validators
+            self.assertEqual(get_validators_from_withdrawal(ADDRESS), indexes)
+
+        self.assertEqual(len(indexes), 3)
+        self.assertEqual([validator.index for validator in details], indexes)
+        self.assertTrue(all(validator.balance >= 32 for validator in details))
+        self.assertEqual(set(rewards), {str(index) for index in indexes})
+        self.assertTrue(all("performance" in reward for reward in rewards.values()))
+
+    def test_subgraph(self):
+        query = f'{{ troves(where: {{ borrower: "{ADDRESS}" }}) {{ id }} }}'
+        with SubgraphStandIn(troves=2) as subgraph, override_settings(
+            THE_GRAPH_API_URL=subgraph.url
+        ):
+            response = send_graphql_query(LQTY_V2_SUBGRAPH_ID, query)
+            unknown = send_graphql_query("unknown", query)
+
+        self.assertEqual(len(response["data"]["troves"]), 2)
+        self.assertEqual(unknown, {})
+
+
+class ChainStandInTests(SimpleTestCase):
+    def setUp(self):
+        self.chain = ChainStandIn()
+        self.weth = TOKENS["WETH"]["token_address"]["Ethereum"]
+
+    def tearDown(self):
+        self.chain.stop()
+
+    def test_aggregate3_reads_each_call(self):
+        calls = [
+            (self.weth, True, BALANCE_OF_SELECTOR + encode(["address"], [ADDRESS])),
+            (
+                MULTICALL3_ADDRESS,
+                True,
+                GET_ETH_BALANCE_SELECTOR + encode(["address"], [ADDRESS]),
+            ),
+            (ADDRESS, True, BALANCE_OF_SELECTOR + encode(["address"], [ADDRESS])),
+        ]
+        selector = bytes.fromhex("82ad56cb")  # aggregate3((address,bool,bytes)[])
+        data = selector + encode(["(address,bool,bytes)[]"], [calls])
+
+        (results,) = decode(
+            ["(bool,bytes)[]"], self.chain.call(MULTICALL3_ADDRESS, data)
+        )
+
+        balance, eth_balance, unknown = results
+        self.assertEqual(
+            decode(["uint256"], balance[1])[0],
+            token_amount(self.weth, "balanceOf", 0, ADDRESS),
+        )
+        self.assertTrue(eth_balance[0])
+        self.assertGreater(decode(["uint256"], eth_balance[1])[0], 0)
+        self.assertEqual(unknown, (False, b""))
+        self.assertEqual(
+            self.chain.calls,
+            {
+                "eth_call:aggregate3": 1,
+                "aggregate3:balanceOf": 1,
+                "aggregate3:getEthBalance": 1,
+                "aggregate3:unknown": 1,
+            },
+        )
+
+    def test_json_rpc(self):
+        status, response = self.chain.handle_post(
+            "/8453",
+            [
+                {"jsonrpc": "2.0", "id": 1, "method": "eth_chainId"},
+                {"jsonrpc": "2.0", "id": 2, "method": "eth_sendTransaction"},
+            ],
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response[0]["result"], hex(8453))
+        self.assertEqual(response[1]["error"]["code"], -32601)
+
+
+class ResolveNetworkChoiceTests(SimpleTestCase):
+    @override_settings(RPC_URLS={"base:mainnet": "http://127.0.0.1:8545"})
+    def test_configured_chain_uses_the_node(self):
+        self.assertEqual(
+            resolve_network_choice("base:mainnet:alchemy"),
+            "base:mainnet:http://127.0.0.1:8545",
+        )
+        self.assertEqual(
+            resolve_network_choice("ethereum:mainnet:alchemy"),
+            "ethereum:mainnet:alchemy",
+        )
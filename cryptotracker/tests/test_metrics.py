@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from cryptotracker.benchmark.apis import CoinGeckoStandIn
+from cryptotracker.providers import meter_rpc
+from cryptotracker.tasks import backfill_prices
+from cryptotracker.utils import fetch_cryptocurrency_price
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsViewTests(TestCase):
+    def test_views_are_timed_and_served(self):
+        labels = {"view": "home", "method": "GET", "status": "200"}
+        before = sample("cryptotracker_view_duration_seconds_count", **labels)
+
+        self.client.get(reverse("home"))
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"cryptotracker_view_queries_bucket", response.content)
+        self.assertEqual(
+            sample("cryptotracker_view_duration_seconds_count", **labels), before + 1
+        )
+
+    def test_only_allowed_clients_are_served(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 404)
+
+
+class ExternalMetricsTests(TestCase):
+    def test_api_requests_are_counted_by_host_and_status(self):
+        labels = {"host": "127.0.0.1", "status": "200"}
+        before = sample("cryptotracker_external_requests_total", **labels)
+        with CoinGeckoStandIn() as coingecko, override_settings(
+            COINGECKO_API_URL=coingecko.url
+        ):
+            fetch_cryptocurrency_price(["ethereum"])
+
+        self.assertEqual(
+            sample("cryptotracker_external_requests_total", **labels), before + 1
+        )
+        self.assertGreater(
+            sample(
+                "cryptotracker_external_request_duration_seconds_count",
+                host="127.0.0.1",
+            ),
+            0,
+        )
+
+    def test_rpc_calls_are_counted_by_network_and_method(self):
+        responses = iter(
+            [{"result": "0x1"}, {"error": {"code": 3, "message": "reverted"}}]
+        )
+        web3_provider = SimpleNamespace(
+            make_request=lambda method, params: next(responses),
+            decode_rpc_response=lambda raw_response: raw_response,
+        )
+        meter_rpc(
+            SimpleNamespace(web3=SimpleNamespace(provider=web3_provider)),
+            "base:mainnet",
+        )
+        labels = {"network": "base:mainnet", "method": "eth_call"}
+        ok = sample("cryptotracker_rpc_calls_total", outcome="ok", **labels)
+        errors = sample("cryptotracker_rpc_calls_total", outcome="error", **labels)
+
+        web3_provider.make_request("eth_call", [])
+        web3_provider.make_request("eth_call", [])
+
+        self.assertEqual(
+            sample("cryptotracker_rpc_calls_total", outcome="ok", **labels), ok + 1
+        )
+        self.assertEqual(
+            sample("cryptotracker_rpc_calls_total", outcome="error", **labels),
+            errors + 1,
+        )
+
+
+class TaskMetricsTests(TestCase):
+    @patch("cryptotracker.tasks.backfill_historical_prices", return_value={})
+    def test_tasks_are_timed_by_outcome(self, backfill_historical_prices):
+        task = "cryptotracker.tasks.backfill_prices"
+        succeeded = sample("cryptotracker_tasks_total", task=task, state="SUCCESS")
+        failed = sample("cryptotracker_tasks_total", task=task, state="FAILURE")
+        timed = sample("cryptotracker_task_duration_seconds_count", task=task)
+
+        backfill_prices.apply(args=("2025-01-01", "2025-01-02", []))
+        backfill_historical_prices.side_effect = RuntimeError("API down")
+        backfill_prices.apply(args=("2025-01-01", "2025-01-02", []))
+
+        self.assertEqual(
+            sample("cryptotracker_tasks_total", task=task, state="SUCCESS"),
+            succeeded + 1,
+        )
+        self.assertEqual(
+            sample("cryptotracker_tasks_total", task=task, state="FAILURE"), failed + 1
+        )
+        self.assertEqual(
+            sample("cryptotracker_task_duration_seconds_count", task=task), timed + 2
+        )
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from eth_abi import encode
+
+from cryptotracker.multicall import Call, aggregate
+
+
+class MulticallTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = [
+            Call(target="0xToken1", call_data=b"", fallback=lambda block_id: 1),
+            Call(target="0xToken2", call_data=b"", fallback=lambda block_id: 2),
+        ]
+
+    @patch("cryptotracker.multicall.get_contract")
+    def test_aggregate_decodes_results(self, contract):
+        contract.return_value.aggregate3.return_value = [
+            SimpleNamespace(success=True, returnData=encode(["uint256"], [10])),
+            SimpleNamespace(success=True, returnData=encode(["uint256"], [0])),
+        ]
+        self.assertEqual(aggregate(self.calls), [10, 0])
+
+    @patch("cryptotracker.multicall.get_contract")
+    def test_aggregate_falls_back_per_failed_call(self, contract):
+        contract.return_value.aggregate3.return_value = [
+            SimpleNamespace(success=True, returnData=encode(["uint256"], [10])),
+            SimpleNamespace(success=False, returnData=b""),
+        ]
+        self.assertEqual(aggregate(self.calls), [10, 2])
+
+    @patch("cryptotracker.multicall.get_contract")
+    def test_aggregate_falls_back_when_batch_fails(self, contract):
+        contract.return_value.aggregate3.side_effect = Exception("reverted")
+        self.assertEqual(aggregate(self.calls), [1, 2])
+
+    @patch("cryptotracker.multicall.get_contract")
+    def test_aggregate_splits_calls_in_chunks(self, contract):
+        contract.return_value.aggregate3.side_effect = lambda calls, block_id: [
+            SimpleNamespace(success=True, returnData=encode(["uint256"], [5]))
+            for _ in calls
+        ]
+        self.assertEqual(aggregate(self.calls, chunk_size=1), [5, 5])
+        self.assertEqual(contract.return_value.aggregate3.call_count, 2)
@@ -0,0 +1,164 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from cryptotracker.models import Cryptocurrency, HistoricalPrice, Price, Snapshot
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.utils import (
+    backfill_historical_prices,
+    clear_price_memo,
+    fetch_price_range,
+    get_last_price,
+    invalidate_price_cache,
+)
+
+
+def _ms(year, month, day, hour):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc).timestamp() * 1000
+
+
+class PriceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_price_memo()
+        self.ethereum = Cryptocurrency.objects.create(
+            name="ethereum", symbol="ETH", image=""
+        )
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        Price.objects.create(
+            cryptocurrency=self.ethereum, price=Decimal("3000"), snapshot=self.snapshot
+        )
+
+    def test_price_is_memoized(self):
+        self.assertEqual(get_last_price("ethereum", self.snapshot.date), 3000)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_last_price("ethereum", self.snapshot.date), 3000)
+
+    def test_shared_cache_outlives_memo(self):
+        get_last_price("ethereum", self.snapshot.date)
+        clear_price_memo()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_last_price("ethereum", self.snapshot.date), 3000)
+
+    def test_invalidation_reloads_price(self):
+        get_last_price("ethereum", self.snapshot.date)
+        Price.objects.update(price=Decimal("3100"))
+        invalidate_price_cache(self.snapshot.date, ["ethereum"])
+        self.assertEqual(get_last_price("ethereum", self.snapshot.date), 3100)
+
+
+class HistoricalPriceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_price_memo()
+        self.ethereum = Cryptocurrency.objects.create(
+            name="ethereum", symbol="ETH", image=""
+        )
+        self.prices = {
+            "prices": [
+                [_ms(2025, 1, 1, 0), 3000.0],
+                [_ms(2025, 1, 1, 23), 3050.0],
+                [_ms(2025, 1, 2, 12), 3100.0],
+            ]
+        }
+
+    @patch("cryptotracker.utils.APIquery")
+    def test_range_is_collapsed_to_daily_closes(self, api_query):
+        api_query.return_value = self.prices
+        closes = fetch_price_range("ethereum", date(2025, 1, 1), date(2025, 1, 2))
+        self.assertEqual(
+            closes,
+            {date(2025, 1, 1): Decimal("3050"), date(2025, 1, 2): Decimal("3100")},
+        )
+        api_query.assert_called_once()
+
+    @patch("cryptotracker.utils.APIquery")
+    def test_long_range_is_requested_in_hourly_chunks(self, api_query):
+        api_query.return_value = {"prices": []}
+        fetch_price_range("ethereum", date(2025, 1, 1), date(2025, 12, 31))
+
+        self.assertEqual(api_query.call_count, 5)
+        for call in api_query.call_args_list:
+            params = call.args[1]
+            # Coingecko only returns hourly samples for ranges of up to 90 days
+            self.assertLessEqual(params["to"] - params["from"], 90 * 24 * 60 * 60)
+
+    @patch("cryptotracker.utils.APIquery")
+    def test_backfill_invalidates_cached_prices(self, api_query):
+        api_query.return_value = self.prices
+        snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+        )
+        HistoricalPrice.objects.create(
+            cryptocurrency=self.ethereum, date=date(2025, 1, 1), price=Decimal("2900")
+        )
+        self.assertEqual(get_last_price("ethereum", snapshot.date), 2900)
+
+        backfill_historical_prices(["ethereum"], date(2025, 1, 1), date(2025, 1, 2))
+
+        self.assertEqual(get_last_price("ethereum", snapshot.date), 3050)
+
+    @patch("cryptotracker.utils.APIquery")
+    def test_backfill_is_idempotent(self, api_query):
+        api_query.return_value = self.prices
+        for _ in range(2):
+            stored = backfill_historical_prices(
+                ["ethereum", "unknown"], date(2025, 1, 1), date(2025, 1, 2)
+            )
+        self.assertEqual(stored, {"ethereum": 2, "unknown": -1})
+        self.assertEqual(HistoricalPrice.objects.count(), 2)
+
+    @patch("cryptotracker.utils.fetch_historical_price")
+    def test_last_price_reads_backfilled_price(self, fetch_historical_price):
+        HistoricalPrice.objects.create(
+            cryptocurrency=self.ethereum, date=date(2025, 1, 1), price=Decimal("3050")
+        )
+        snapshot = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+        self.assertEqual(get_last_price("ethereum", snapshot), 3050)
+        fetch_historical_price.assert_not_called()
+
+
+class PriceMatrixTests(TestCase):
+    def setUp(self):
+        self.ethereum = Cryptocurrency.objects.create(
+            name="ethereum", symbol="ETH", image=""
+        )
+        self.bitcoin = Cryptocurrency.objects.create(
+            name="bitcoin", symbol="BTC", image=""
+        )
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        Price.objects.create(
+            cryptocurrency=self.ethereum, price=Decimal("3000"), snapshot=self.snapshot
+        )
+
+    def test_snapshot_prices_are_loaded_in_one_query(self):
+        with self.assertNumQueries(1):
+            prices = PriceMatrix.for_snapshot(self.snapshot)
+            self.assertEqual(prices.get("ethereum"), 3000)
+            self.assertEqual(prices.get("ethereum"), 3000)
+
+    @patch("cryptotracker.prices.fetch_historical_price")
+    def test_missing_prices_are_resolved_together(self, fetch_historical_price):
+        HistoricalPrice.objects.create(
+            cryptocurrency=self.bitcoin, date=date(2025, 1, 1), price=Decimal("90000")
+        )
+        prices = PriceMatrix.for_snapshot(self.snapshot)
+        with self.assertNumQueries(1):
+            prices.resolve(["ethereum", "bitcoin"])
+        self.assertEqual(prices.get("bitcoin"), 90000)
+        fetch_historical_price.assert_not_called()
+
+    @patch("cryptotracker.prices.fetch_historical_price", return_value=None)
+    def test_unresolved_price_is_fetched_once(self, fetch_historical_price):
+        prices = PriceMatrix.for_snapshot(self.snapshot)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                prices.get("bitcoin")
+        fetch_historical_price.assert_called_once_with("bitcoin", date(2025, 1, 1))
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from cryptotracker.constants import PROTOCOLS_DATA
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    Pool,
+    Price,
+    Snapshot,
+    UserAddress,
+    WalletType,
+)
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.protocols.protocols import get_protocols_snapshots
+from cryptotracker.writer import SnapshotWriter
+
+
+class ProtocolsSnapshotsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+
+    def setUp(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        self.user_address = UserAddress.objects.create(
+            user=user,
+            public_address="0x1234567890abcdef1234567890abcdef12345678",
+            account=Account.objects.create(user=user, name="Test Account"),
+            wallet_type=WalletType.objects.get(name="HOT"),
+        )
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        for symbol, price in [("LUSD", "1"), ("ETH", "3000")]:
+            Price.objects.create(
+                cryptocurrency=Cryptocurrency.objects.get(symbol=symbol),
+                price=Decimal(price),
+                snapshot=self.snapshot,
+            )
+        self.pool = Pool.objects.get(
+            protocol_network__protocol__name=PROTOCOLS_DATA["UNI_V3"]["name"]
+        )
+
+    def _add_positions(self, start, count):
+        with SnapshotWriter(self.snapshot) as writer:
+            for position in range(start, start + count):
+                writer.add_pool_row(
+                    self.pool, self.user_address, "LUSD", 10, position_id=str(position)
+                )
+                writer.add_pool_row(
+                    self.pool,
+                    self.user_address,
+                    "ETH",
+                    1,
+                    is_reward=True,
+                    position_id=str(position),
+                )
+
+    def _count_queries(self):
+        prices = PriceMatrix.for_snapshot(self.snapshot)
+        with self.assertNumQueries(3) as context:
+            protocols = get_protocols_snapshots(
+                [self.user_address], self.snapshot, prices
+            )
+            for pools in protocols["pool_data"].values():
+                for pool in pools:
+                    str(pool.pool_position.pool.type)
+                    str(pool.pool_position.pool.protocol_network.network)
+                    pool.pool_position.user_address.name
+                    [balance.token.symbol for balance in pool.balances]
+                    [reward.token.symbol for reward in pool.rewards]
+        return protocols, len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_positions(self):
+        self._add_positions(0, 1)
+        _, few = self._count_queries()
+        self._add_positions(1, 50)
+        protocols, many = self._count_queries()
+        self.assertEqual(few, many)
+        pools = protocols["pool_data"][PROTOCOLS_DATA["UNI_V3"]["name"]]
+        self.assertEqual(len(pools), 51)
+        self.assertEqual(pools[0].balance_eur, 10)
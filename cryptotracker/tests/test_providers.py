@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from cryptotracker.providers import ProviderManager
+
+
+@patch("cryptotracker.providers.networks")
+class ProviderManagerTests(SimpleTestCase):
+    def test_borrow_reuses_connection(self, networks):
+        manager = ProviderManager()
+        with manager.borrow("ethereum:mainnet:alchemy") as provider:
+            self.assertIs(networks.active_provider, provider)
+        with manager.borrow("ethereum:mainnet:alchemy"):
+            pass
+        networks.get_provider_from_choice.assert_called_once()
+        provider.connect.assert_called_once()
+        provider.disconnect.assert_not_called()
+
+    def test_unhealthy_connection_is_replaced(self, networks):
+        manager = ProviderManager(health_check_interval=0)
+        stale, fresh = MagicMock(), MagicMock()
+        networks.get_provider_from_choice.side_effect = [stale, fresh]
+        with manager.borrow("ethereum:mainnet:alchemy"):
+            pass
+        stale.is_connected = False
+        with manager.borrow("ethereum:mainnet:alchemy") as provider:
+            self.assertIs(provider, fresh)
+        stale.disconnect.assert_called_once()
+
+    def test_network_without_rpc_is_rejected(self, networks):
+        with self.assertRaisesMessage(ValueError, "no url_rpc"):
+            with ProviderManager().borrow(None):
+                pass
+        networks.get_provider_from_choice.assert_not_called()
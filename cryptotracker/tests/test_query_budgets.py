@@ -0,0 +1,197 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cryptotracker.error_traking import log_snapshot_error
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    CryptocurrencyNetwork,
+    Pool,
+    PoolBalanceSnapshot,
+    PoolPosition,
+    PoolRewardsSnapshot,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    Trove,
+    TroveSnapshot,
+    UserAddress,
+    Validator,
+    ValidatorSnapshot,
+    WalletType,
+)
+from cryptotracker.valuation import write_portfolio_valuations
+
+FIRST_SNAPSHOT_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def seed_user(username: str, addresses: int, positions: int) -> User:
+    """
+    Creates a user with the given number of addresses (spread over two accounts and all
+    the wallet types), each with a validator, a trove and the given number of pool positions.
+    """
+    user = User.objects.create_user(username=username, password="testpassword")
+    accounts = [
+        Account.objects.create(user=user, name=f"Account {index}") for index in range(2)
+    ]
+    wallet_types = list(WalletType.objects.all())
+    pool = Pool.objects.first()
+    assert pool is not None
+    for index in range(addresses):
+        user_address = UserAddress.objects.create(
+            user=user,
+            public_address=f"0x{user.id:020x}{index:020x}",
+            account=accounts[index % len(accounts)],
+            wallet_type=wallet_types[index % len(wallet_types)],
+            name=f"Address {index}",
+        )
+        Validator.objects.create(
+            user_address=user_address,
+            validator_index=user.id * 1000 + index,
+            public_key=f"0x{index}",
+            activation_date="2024-01-01",
+        )
+        Trove.objects.create(
+            user_address=user_address,
+            pool=pool,
+            trove_id=str(index),
+            token=Cryptocurrency.objects.get(name="ethereum"),
+        )
+        for position in range(positions):
+            PoolPosition.objects.create(
+                pool=pool, user_address=user_address, position_id=str(position)
+            )
+    return user
+
+
+def seed_snapshot(days: int) -> Snapshot:
+    """
+    Creates a completed snapshot holding prices, assets, validators, pool balances and
+    rewards, troves, errors and valuations for every address.
+    """
+    snapshot = Snapshot.objects.create(date=FIRST_SNAPSHOT_DATE + timedelta(days=days))
+    Price.objects.bulk_create(
+        Price(cryptocurrency=crypto, price=Decimal(index + 1), snapshot=snapshot)
+        for index, crypto in enumerate(Cryptocurrency.objects.all())
+    )
+    tokens = list(CryptocurrencyNetwork.objects.select_related("cryptocurrency")[:3])
+    user_addresses = list(UserAddress.objects.all())
+    for user_address in user_addresses:
+        SnapshotAssets.objects.bulk_create(
+            SnapshotAssets(
+                cryptocurrency=token,
+                user_address=user_address,
+                quantity=Decimal(1),
+                snapshot=snapshot,
+            )
+            for token in tokens
+        )
+        log_snapshot_error(snapshot, "Test error", user_address)
+    ValidatorSnapshot.objects.bulk_create(
+        ValidatorSnapshot(
+            validator=validator,
+            balance=Decimal(32),
+            status="active_ongoing",
+            rewards=Decimal(1),
+            snapshot=snapshot,
+        )
+        for validator in Validator.objects.all()
+    )
+    TroveSnapshot.objects.bulk_create(
+        TroveSnapshot(
+            trove=trove,
+            collateral=Decimal(10),
+            debt=Decimal(1000),
+            balance=Decimal(2000),
+            interest_rate=Decimal(5),
+            snapshot=snapshot,
+        )
+        for trove in Trove.objects.all()
+    )
+    pool_tokens = list(Cryptocurrency.objects.all()[:2])
+    balances: List[PoolBalanceSnapshot] = []
+    rewards: List[PoolRewardsSnapshot] = []
+    for position in PoolPosition.objects.all():
+        for token in pool_tokens:
+            row = dict(
+                pool_position=position,
+                token=token,
+                quantity=Decimal(1),
+                snapshot=snapshot,
+            )
+            balances.append(PoolBalanceSnapshot(**row))
+            rewards.append(PoolRewardsSnapshot(**row))
+    PoolBalanceSnapshot.objects.bulk_create(balances)
+    PoolRewardsSnapshot.objects.bulk_create(rewards)
+    write_portfolio_valuations(snapshot, user_addresses)
+    return snapshot
+
+
+class ViewQueryBudgetTests(TestCase):
+    """
+    Each view must run a fixed number of queries, whatever the number of addresses,
+    positions and snapshots of the portfolio.
+    """
+
+    # Queries of each view, including the session and user lookups of the request
+    BUDGETS = {
+        "portfolio": 12,
+        "accounts": 6,
+        "user_addresses": 7,
+        "address_detail": 12,
+        "statistics": 6,
+        "staking": 5,
+        "rewards": 7,
+        "portfolio_history": 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+        cls.small_user = seed_user("small", addresses=1, positions=1)
+        cls.large_user = seed_user("large", addresses=8, positions=4)
+        for days in range(3):
+            seed_snapshot(days)
+
+    def _url(self, view: str, user: User) -> str:
+        if view == "address_detail":
+            public_address = UserAddress.objects.filter(user=user)[0].public_address
+            return reverse(view, args=[public_address])
+        return reverse(view)
+
+    def _count_queries(self, view: str, user: User) -> int:
+        self.client.force_login(user)
+        url = self._url(view, user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def _count_all(self, user: User) -> Dict[str, int]:
+        return {view: self._count_queries(view, user) for view in self.BUDGETS}
+
+    def test_views_stay_within_budget(self):
+        for view, budget in self.BUDGETS.items():
+            with self.subTest(view=view):
+                self.assertLessEqual(self._count_queries(view, self.large_user), budget)
+
+    def test_budget_does_not_depend_on_addresses_and_positions(self):
+        self.assertEqual(
+            self._count_all(self.small_user), self._count_all(self.large_user)
+        )
+
+    def test_budget_does_not_depend_on_snapshots(self):
+        before = self._count_all(self.large_user)
+        for days in range(3, 6):
+            seed_snapshot(days)
+        self.assertEqual(before, self._count_all(self.large_user))
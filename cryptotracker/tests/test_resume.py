@@ -0,0 +1,262 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from celery.exceptions import TimeoutError
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from cryptotracker.benchmark.server import StandInServer
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    Network,
+    Snapshot,
+    SnapshotBlock,
+    SnapshotRun,
+    SnapshotWorkUnit,
+    UserAddress,
+    WalletType,
+)
+from cryptotracker.tasks import (
+    SNAPSHOT_SOURCES,
+    build_snapshot_units,
+    complete_work_unit,
+    fail_on_call_errors,
+    resume_snapshot,
+    run_daily_snapshot_update,
+    track_work_units,
+    update_address_source,
+    update_cryptocurrency_price,
+    WorkUnitKey,
+)
+from cryptotracker.timing import record_call, timed_stage
+from dcp.celery import app
+
+
+class UnavailableStandIn(StandInServer):
+    name = "unavailable"
+
+    def handle_get(self, path, params):
+        return 503, {"error": "Service unavailable"}
+
+
+class ResumeSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="alice")
+        self.network = Network.objects.create(name="Ethereum")
+        self.user_address = UserAddress.objects.create(
+            user=self.user,
+            public_address="0x" + "ab" * 20,
+            account=Account.objects.create(user=self.user, name="Main"),
+            wallet_type=WalletType.objects.create(name="Hot"),
+        )
+        self.sources = {source: MagicMock() for source in SNAPSHOT_SOURCES}
+
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, "task_always_eager", eager)
+        for target, value in [
+            ("cryptotracker.tasks.fetch_cryptocurrency_price", {}),
+            ("cryptotracker.tasks.sweep_assets", []),
+        ]:
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch(
+            "cryptotracker.tasks.pin_snapshot_blocks", side_effect=self.pin_blocks
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.dict(SNAPSHOT_SOURCES, self.sources)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pin_blocks(self, snapshot):
+        SnapshotBlock.objects.create(
+            snapshot=snapshot, network=self.network, block_number=21000000
+        )
+
+    def units(self, snapshot):
+        return {
+            (unit.source, unit.status, unit.attempts)
+            for unit in SnapshotWorkUnit.objects.filter(snapshot=snapshot)
+        }
+
+    def test_units_are_tracked_and_skipped_once_completed(self):
+        snapshot = Snapshot.objects.create(date="2025-01-01T00:00:00Z")
+        run = SnapshotRun.objects.create(snapshot=snapshot)
+
+        # prices, tokens of the network and the 4 sources of the address
+        self.assertEqual(len(build_snapshot_units(snapshot.id, None, run.id)), 6)
+        self.assertEqual(
+            set(SnapshotWorkUnit.objects.values_list("status", flat=True)),
+            {SnapshotWorkUnit.PENDING},
+        )
+        complete_work_unit(snapshot.id, run.id, WorkUnitKey("prices"))
+        complete_work_unit(
+            snapshot.id, run.id, WorkUnitKey("tokens", network_id=self.network.id)
+        )
+        complete_work_unit(
+            snapshot.id,
+            run.id,
+            WorkUnitKey("aave", user_address_id=self.user_address.id),
+            "TimeoutError",
+        )
+
+        units = build_snapshot_units(snapshot.id, None, run.id, unfinished_only=True)
+
+        self.assertEqual(len(units), 4)
+        self.assertEqual(
+            {unit.args[2] for unit in units}, {"staking", "liquity", "aave", "uniswap"}
+        )
+        # The retried units are pending again, without duplicates
+        self.assertEqual(SnapshotWorkUnit.objects.count(), 6)
+        self.assertEqual(
+            SnapshotWorkUnit.objects.get(source="aave").status,
+            SnapshotWorkUnit.PENDING,
+        )
+
+    def test_resume_only_reruns_the_failed_units(self):
+        self.sources["aave"].side_effect = TimeoutError()
+        summary = run_daily_snapshot_update.apply(kwargs={"user_id": self.user.id})
+        self.assertIn("1 failed", summary.get().get())
+        snapshot = Snapshot.objects.get()
+        self.assertIn(("aave", SnapshotWorkUnit.FAILED, 1), self.units(snapshot))
+
+        self.sources["aave"].side_effect = None
+        summary = resume_snapshot.apply(args=(snapshot.id,))
+
+        self.assertIn("0 failed", summary.get().get())
+        self.assertEqual(Snapshot.objects.count(), 1)
+        for source, calls in [("aave", 2), ("staking", 1), ("uniswap", 1)]:
+            self.assertEqual(self.sources[source].call_count, calls)
+        self.assertEqual(
+            self.units(snapshot),
+            {
+                ("prices", SnapshotWorkUnit.SUCCESS, 1),
+                ("tokens", SnapshotWorkUnit.SUCCESS, 1),
+                ("staking", SnapshotWorkUnit.SUCCESS, 1),
+                ("liquity", SnapshotWorkUnit.SUCCESS, 1),
+                ("aave", SnapshotWorkUnit.SUCCESS, 2),
+                ("uniswap", SnapshotWorkUnit.SUCCESS, 1),
+            },
+        )
+        resumed = SnapshotRun.objects.first()
+        self.assertEqual((resumed.user, resumed.units), (self.user, 1))
+
+        # Nothing is left to resume
+        self.assertIsNone(resume_snapshot.apply(args=(snapshot.id,)).get())
+
+    def test_command_reports_and_resumes(self):
+        self.sources["staking"].side_effect = ValueError("beaconcha.in is down")
+        run_daily_snapshot_update.apply(kwargs={"user_id": self.user.id})
+        self.sources["staking"].side_effect = None
+
+        out = StringIO()
+        call_command("resume_snapshot", "--dry-run", stdout=out)
+        self.assertIn("staking failed: 1", out.getvalue())
+        self.assertEqual(self.sources["staking"].call_count, 1)
+
+        out = StringIO()
+        call_command("resume_snapshot", "--eager", stdout=out)
+        self.assertIn("staking success: 1", out.getvalue())
+        self.assertEqual(self.sources["staking"].call_count, 2)
+
+    def test_units_never_scheduled_are_not_resumed(self):
+        self.sources["aave"].side_effect = TimeoutError()
+        run_daily_snapshot_update.apply(kwargs={"user_id": self.user.id})
+        self.sources["aave"].side_effect = None
+        # An address added after the snapshot was taken
+        UserAddress.objects.create(
+            user=self.user,
+            public_address="0x" + "ef" * 20,
+            account=Account.objects.get(),
+            wallet_type=WalletType.objects.get(),
+        )
+
+        resume_snapshot.apply(args=(Snapshot.objects.get().id,))
+
+        for source, calls in [("aave", 2), ("staking", 1), ("uniswap", 1)]:
+            self.assertEqual(self.sources[source].call_count, calls)
+
+    def test_untracked_or_unpinned_snapshots_are_refused(self):
+        snapshot = Snapshot.objects.create(date="2024-01-01T00:00:00Z")
+
+        with self.assertRaisesMessage(ValueError, "not tracked"):
+            resume_snapshot.apply(args=(snapshot.id,)).get()
+        with self.assertRaisesMessage(CommandError, "--force"):
+            call_command("resume_snapshot", "--eager", stdout=StringIO())
+        track_work_units(snapshot.id, [WorkUnitKey("prices")])
+        with self.assertRaisesMessage(ValueError, "not pinned"):
+            resume_snapshot.apply(args=(snapshot.id,)).get()
+        for source in self.sources.values():
+            source.assert_not_called()
+
+        call_command("resume_snapshot", "--eager", "--force", stdout=StringIO())
+
+        # Every unit that did not succeed is fetched again
+        self.assertEqual(
+            SnapshotWorkUnit.objects.filter(
+                snapshot=snapshot, status=SnapshotWorkUnit.SUCCESS
+            ).count(),
+            6,
+        )
+
+
+class WorkUnitFailureTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="bob")
+        self.user_address = UserAddress.objects.create(
+            user=user,
+            public_address="0x" + "cd" * 20,
+            account=Account.objects.create(user=user, name="Main"),
+            wallet_type=WalletType.objects.create(name="Hot"),
+        )
+        self.snapshot = Snapshot.objects.create(date=timezone.now())
+        self.run = SnapshotRun.objects.create(snapshot=self.snapshot)
+
+    def test_failed_api_call_fails_the_unit(self):
+        key = WorkUnitKey("staking", user_address_id=self.user_address.id)
+        track_work_units(self.snapshot.id, [key])
+
+        # The source skips the validators it could not fetch instead of raising
+        with UnavailableStandIn() as beaconchain, override_settings(
+            BEACONCHAIN_API_URL=beaconchain.url
+        ):
+            unit = update_address_source(
+                self.snapshot.id, self.user_address.id, "staking", self.run.id
+            )
+
+        self.assertEqual(unit["status"], "failed")
+        work_unit = SnapshotWorkUnit.objects.get()
+        self.assertEqual(work_unit.status, SnapshotWorkUnit.FAILED)
+        self.assertEqual(work_unit.error, "1 of 1 external calls failed")
+
+    def test_single_failed_items_are_tolerated(self):
+        with timed_stage(None, "aave") as stage:
+            record_call(100)
+            record_call(20, error=True)
+        unit = {"source": "aave", "status": "success"}
+
+        fail_on_call_errors(unit, stage)
+        self.assertEqual(unit["status"], "success")
+
+        # Once every call failed, nothing was read
+        stage.errors = stage.calls
+        fail_on_call_errors(unit, stage)
+        self.assertEqual(unit["status"], "failed")
+
+    @patch("cryptotracker.tasks.fetch_cryptocurrency_price")
+    def test_missing_prices_fail_the_unit(self, fetch_cryptocurrency_price):
+        for name, symbol in [("ethereum", "ETH"), ("bitcoin", "BTC")]:
+            Cryptocurrency.objects.create(name=name, symbol=symbol, image="")
+        fetch_cryptocurrency_price.return_value = {"ethereum": {"eur": 3000}}
+        track_work_units(self.snapshot.id, [WorkUnitKey("prices")])
+
+        update_cryptocurrency_price(self.snapshot.id, self.run.id)
+
+        work_unit = SnapshotWorkUnit.objects.get()
+        self.assertEqual(work_unit.status, SnapshotWorkUnit.FAILED)
+        self.assertEqual(work_unit.error, "No price returned for bitcoin")
@@ -0,0 +1,50 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import TransactionTestCase
+
+from cryptotracker.management.commands.stress_sqlite import sqlite_file
+
+
+class StressSqliteTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "stress.sqlite3"
+
+    def test_file_is_opened_with_the_project_settings(self):
+        configured = connections["default"]
+        with sqlite_file(self.path):
+            connection = connections["default"]
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "wal")
+            self.assertEqual(connection.settings_dict["NAME"], str(self.path))
+            self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+            self.assertGreater(connection.settings_dict["OPTIONS"]["timeout"], 0)
+        self.assertIs(connections["default"], configured)
+
+    def test_concurrent_writers_do_not_lock_the_database(self):
+        out = StringIO()
+        call_command(
+            "stress_sqlite",
+            database=self.path,
+            writers=4,
+            readers=2,
+            units=5,
+            rows=20,
+            stdout=out,
+        )
+
+        self.assertIn("Writers: 4 x 5 units, 80 asset rows written", out.getvalue())
+        self.assertIn("No lock errors", out.getvalue())
+        self.assertFalse(self.path.exists())
+
+    def test_existing_file_is_refused(self):
+        self.path.touch()
+        with self.assertRaisesMessage(CommandError, "already exists"):
+            call_command("stress_sqlite", database=self.path, stdout=StringIO())
+        self.assertTrue(self.path.exists())
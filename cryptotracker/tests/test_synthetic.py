@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from cryptotracker.models import (
+    Cryptocurrency,
+    PoolPosition,
+    PortfolioValuation,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    TroveSnapshot,
+    UserAddress,
+    ValidatorSnapshot,
+)
+
+
+class GenerateSyntheticPortfolioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+
+    def _generate(self, **options) -> None:
+        call_command(
+            "generate_synthetic_portfolio",
+            users=2,
+            addresses=3,
+            snapshots=4,
+            tokens=5,
+            positions=2,
+            staking_share=1,
+            trove_share=1,
+            stdout=StringIO(),
+            **options,
+        )
+
+    def test_generates_every_row_of_every_snapshot(self):
+        self._generate()
+
+        self.assertEqual(
+            User.objects.filter(username__startswith="synthetic-").count(), 2
+        )
+        self.assertEqual(UserAddress.objects.count(), 6)
+        self.assertEqual(PoolPosition.objects.count(), 12)
+        self.assertEqual(Snapshot.objects.count(), 4)
+        self.assertEqual(Price.objects.count(), 4 * Cryptocurrency.objects.count())
+        self.assertEqual(SnapshotAssets.objects.count(), 4 * 6 * 5)
+        self.assertEqual(ValidatorSnapshot.objects.count(), 4 * 6 * 2)
+        self.assertEqual(TroveSnapshot.objects.count(), 4 * 6)
+        self.assertEqual(PortfolioValuation.objects.count(), 4 * 6)
+        self.assertFalse(PortfolioValuation.objects.filter(total__lte=0).exists())
+
+    def test_reruns_add_new_users(self):
+        self._generate(no_valuations=True)
+        self._generate(no_valuations=True)
+
+        self.assertEqual(
+            User.objects.filter(username__startswith="synthetic-").count(), 4
+        )
+        self.assertFalse(PortfolioValuation.objects.exists())
+
+    def test_reruns_after_a_deletion_take_free_usernames(self):
+        self._generate(no_valuations=True)
+        User.objects.get(username="synthetic-0").delete()
+        self._generate(no_valuations=True)
+
+        self.assertEqual(
+            set(
+                User.objects.filter(username__startswith="synthetic-").values_list(
+                    "username", flat=True
+                )
+            ),
+            {"synthetic-1", "synthetic-2", "synthetic-3"},
+        )
@@ -0,0 +1,134 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+
+from cryptotracker.models import (
+    Cryptocurrency,
+    HistoricalPrice,
+    Network,
+    Price,
+    Snapshot,
+)
+from cryptotracker.providers import ProviderManager
+from cryptotracker.tasks import pin_snapshot_blocks, update_cryptocurrency_price
+
+
+class UpdateCryptocurrencyPriceTests(TestCase):
+    def setUp(self):
+        for name, symbol in [("ethereum", "ETH"), ("bitcoin", "BTC"), ("lusd", "LUSD")]:
+            Cryptocurrency.objects.create(name=name, symbol=symbol, image="")
+        self.snapshot = Snapshot.objects.create(date=datetime.now(timezone.utc))
+
+    @patch("cryptotracker.tasks.fetch_cryptocurrency_price")
+    def test_prices_are_written_in_bulk(self, fetch_cryptocurrency_price):
+        fetch_cryptocurrency_price.return_value = {
+            "ethereum": {"eur": 3000},
+            "bitcoin": {"eur": 90000},
+            "lusd": {},
+        }
+        for _ in range(2):
+            unit = update_cryptocurrency_price(self.snapshot.id)
+        self.assertEqual(unit["status"], "failed")
+        self.assertIn("lusd", unit["error"])
+        self.assertEqual(
+            dict(Price.objects.values_list("cryptocurrency__name", "price")),
+            {"ethereum": 3000, "bitcoin": 90000},
+        )
+
+    @patch("cryptotracker.tasks.fetch_cryptocurrency_price")
+    def test_query_count_does_not_grow_with_coins(self, fetch_cryptocurrency_price):
+        fetch_cryptocurrency_price.return_value = {
+            "ethereum": {"eur": 3000},
+            "bitcoin": {"eur": 90000},
+            "lusd": {"eur": 1},
+        }
+        # snapshot, cryptocurrencies, upsert
+        with self.assertNumQueries(3):
+            update_cryptocurrency_price(self.snapshot.id)
+
+    @patch("cryptotracker.tasks.fetch_cryptocurrency_price")
+    def test_errors_fail_the_unit_instead_of_raising(self, fetch_cryptocurrency_price):
+        fetch_cryptocurrency_price.side_effect = KeyError("prices")
+        unit = update_cryptocurrency_price(self.snapshot.id)
+        self.assertEqual(
+            unit, {"source": "prices", "status": "failed", "error": "'prices'"}
+        )
+
+        fetch_cryptocurrency_price.side_effect = None
+        fetch_cryptocurrency_price.return_value = {}
+        unit = update_cryptocurrency_price(self.snapshot.id + 1)
+        self.assertEqual(unit["status"], "failed")
+        self.assertFalse(Price.objects.exists())
+
+    @patch("cryptotracker.prices.fetch_historical_price")
+    @patch("cryptotracker.tasks.fetch_cryptocurrency_price")
+    def test_older_snapshot_stores_the_prices_of_its_day(
+        self, fetch_cryptocurrency_price, fetch_historical_price
+    ):
+        snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+        )
+        HistoricalPrice.objects.create(
+            cryptocurrency=Cryptocurrency.objects.get(name="ethereum"),
+            date=date(2025, 1, 1),
+            price=Decimal("3300"),
+        )
+        fetch_historical_price.side_effect = lambda crypto_id, day: {
+            "bitcoin": Decimal("94000")
+        }.get(crypto_id)
+
+        unit = update_cryptocurrency_price(snapshot.id)
+
+        fetch_cryptocurrency_price.assert_not_called()
+        self.assertEqual(unit["error"], "No price returned for lusd")
+        self.assertEqual(
+            dict(
+                Price.objects.filter(snapshot=snapshot).values_list(
+                    "cryptocurrency__name", "price"
+                )
+            ),
+            {"ethereum": 3300, "bitcoin": 94000},
+        )
+
+
+@override_settings(RPC_URLS={})
+@patch("cryptotracker.providers.networks")
+class PinSnapshotBlocksTests(TestCase):
+    def setUp(self):
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        for name, url_rpc in [
+            ("Ethereum", "ethereum:mainnet:alchemy"),
+            ("Arbitrum", "arbitrum:mainnet:alchemy"),
+            ("Base", "base:mainnet:alchemy"),
+            ("Local", None),
+        ]:
+            Network.objects.create(name=name, url_rpc=url_rpc)
+
+    def test_blocks_are_stored_per_network(self, networks):
+        latest = {
+            "ethereum:mainnet:alchemy": 21000000,
+            "arbitrum:mainnet:alchemy": 3000,
+        }
+
+        def get_provider(network_choice):
+            provider = MagicMock()
+            if network_choice in latest:
+                provider.get_block.return_value.number = latest[network_choice]
+            else:
+                provider.get_block.side_effect = ConnectionError("node unreachable")
+            return provider
+
+        networks.get_provider_from_choice.side_effect = get_provider
+        with patch("cryptotracker.tasks.provider_manager", ProviderManager()):
+            pin_snapshot_blocks(self.snapshot)
+
+        # Base cannot be reached and Local has no RPC: both are read at the latest block
+        self.assertEqual(
+            dict(self.snapshot.blocks.values_list("network__name", "block_number")),
+            {"Ethereum": 21000000, "Arbitrum": 3000},
+        )
+        self.assertIsNone(self.snapshot.block_number("Base"))
@@ -0,0 +1,164 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from web3 import HTTPProvider
+
+from cryptotracker.models import (
+    Cryptocurrency,
+    Network,
+    Snapshot,
+    SnapshotRun,
+    SnapshotStageTiming,
+)
+from cryptotracker.providers import meter_rpc
+from cryptotracker.tasks import finalize_snapshot, update_cryptocurrency_price
+from cryptotracker.timing import (
+    active_meter,
+    record_call,
+    record_write,
+    source_trends,
+    summarise_sources,
+    timed_stage,
+)
+
+
+class TimedStageTests(TestCase):
+    def setUp(self):
+        snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        self.run = SnapshotRun.objects.create(snapshot=snapshot)
+        self.network = Network.objects.create(name="Ethereum")
+
+    def test_stage_records_its_calls_and_writes(self):
+        with timed_stage(self.run.id, "tokens", network_id=self.network.id):
+            record_call(100)
+            record_call(20, error=True)
+            record_write(0.5, 7)
+
+        stage = SnapshotStageTiming.objects.get()
+        self.assertEqual(stage.network, self.network)
+        self.assertEqual((stage.calls, stage.bytes, stage.errors), (2, 120, 1))
+        self.assertEqual((stage.rows, stage.write_duration), (7, 0.5))
+        self.assertGreater(stage.duration, 0)
+        self.assertIsNone(active_meter())
+
+    def test_exception_is_counted_and_raised(self):
+        with self.assertRaises(ValueError):
+            with timed_stage(self.run.id, "staking"):
+                raise ValueError("boom")
+
+        self.assertEqual(SnapshotStageTiming.objects.get().errors, 1)
+
+    def test_nothing_is_stored_without_a_run(self):
+        # Calls outside of a stage are ignored
+        record_call(10)
+        with self.assertNumQueries(0), timed_stage(None, "prices") as stage:
+            record_call(10)
+        self.assertEqual(stage.calls, 1)
+        self.assertFalse(SnapshotStageTiming.objects.exists())
+
+    def test_summaries(self):
+        other_run = SnapshotRun.objects.create(snapshot=self.run.snapshot)
+        for run, source, duration, calls in [
+            (self.run, "staking", 1.0, 2),
+            (self.run, "staking", 3.0, 4),
+            (self.run, "prices", 0.5, 1),
+            (other_run, "staking", 6.0, 4),
+        ]:
+            SnapshotStageTiming.objects.create(
+                run=run, source=source, duration=duration, calls=calls
+            )
+
+        staking, prices = summarise_sources(self.run.stages.all())
+        self.assertEqual(
+            (staking.source, staking.stages, staking.duration, staking.max_duration),
+            ("staking", 2, 4.0, 3.0),
+        )
+        self.assertEqual((prices.source, prices.calls), ("prices", 1))
+        self.assertEqual(
+            source_trends([self.run, other_run]),
+            {"prices": [0.5, None], "staking": [4.0, 6.0]},
+        )
+
+
+class RunRecordingTests(TestCase):
+    def setUp(self):
+        for name, symbol in [("ethereum", "ETH"), ("bitcoin", "BTC")]:
+            Cryptocurrency.objects.create(name=name, symbol=symbol, image="")
+        self.snapshot = Snapshot.objects.create(date=datetime.now(timezone.utc))
+        self.run = SnapshotRun.objects.create(snapshot=self.snapshot, units=3)
+
+    @patch("cryptotracker.tasks.fetch_cryptocurrency_price")
+    def test_price_unit_records_its_stage(self, fetch_cryptocurrency_price):
+        fetch_cryptocurrency_price.return_value = {
+            "ethereum": {"eur": 3000},
+            "bitcoin": {"eur": 90000},
+        }
+        update_cryptocurrency_price(self.snapshot.id, self.run.id)
+
+        stage = self.run.stages.get()
+        self.assertEqual((stage.source, stage.rows, stage.errors), ("prices", 2, 0))
+
+    def test_finalize_closes_the_run(self):
+        results = [{"status": "success"}, {"status": "failed"}, {"status": "success"}]
+        finalize_snapshot(results, self.snapshot.id, None, self.run.id)
+
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.failed_units, 1)
+        self.assertIsNotNone(self.run.duration)
+        self.assertEqual(self.run.stages.get().source, "valuations")
+
+
+class MeterRpcTests(TestCase):
+    def test_responses_are_counted_in_the_stage(self):
+        web3_provider = HTTPProvider("http://127.0.0.1:8545")
+        provider = SimpleNamespace(web3=SimpleNamespace(provider=web3_provider))
+        # Metering a provider twice counts its responses once
+        meter_rpc(provider, "ethereum:mainnet")
+        meter_rpc(provider, "ethereum:mainnet")
+        ok = json.dumps({"jsonrpc": "2.0", "id": 1, "result": "0x1"}).encode()
+        error = json.dumps(
+            [{"jsonrpc": "2.0", "id": 2, "error": {"code": 3, "message": "reverted"}}]
+        ).encode()
+
+        with timed_stage(None, "tokens") as stage:
+            self.assertEqual(web3_provider.decode_rpc_response(ok)["result"], "0x1")
+            web3_provider.decode_rpc_response(error)
+
+        self.assertEqual(
+            (stage.calls, stage.bytes, stage.errors), (2, len(ok) + len(error), 1)
+        )
+
+    def test_providers_without_web3_are_ignored(self):
+        meter_rpc(SimpleNamespace(), "ethereum:mainnet")
+
+
+class SnapshotRunAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        self.run = SnapshotRun.objects.create(snapshot=snapshot, units=1)
+        SnapshotStageTiming.objects.create(
+            run=self.run, source="liquity", duration=2.5, calls=3, bytes=2048
+        )
+
+    def test_pages_show_the_per_source_summary(self):
+        for url in [
+            reverse("admin:cryptotracker_snapshotrun_changelist"),
+            reverse("admin:cryptotracker_snapshotrun_change", args=[self.run.id]),
+            reverse("admin:cryptotracker_snapshotstagetiming_changelist"),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "liquity")
+            self.assertContains(response, "2.50")
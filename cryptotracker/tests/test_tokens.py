@@ -0,0 +1,88 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from cryptotracker.models import (
+    Account,
+    CryptocurrencyNetwork,
+    HistoricalPrice,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    UserAddress,
+    WalletType,
+)
+from cryptotracker.tokens import fetch_aggregated_assets
+
+
+class AggregatedAssetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+
+    def setUp(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        account = Account.objects.create(user=user, name="Test Account")
+        self.user_addresses = [
+            UserAddress.objects.create(
+                user=user,
+                public_address=f"0x{index:040x}",
+                account=account,
+                wallet_type=WalletType.objects.get(name="HOT"),
+            )
+            for index in range(2)
+        ]
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        self.eth, self.lusd = (
+            CryptocurrencyNetwork.objects.filter(
+                cryptocurrency__symbol=symbol, network__name="Ethereum"
+            ).first()
+            for symbol in ("ETH", "LUSD")
+        )
+        Price.objects.create(
+            cryptocurrency=self.eth.cryptocurrency,
+            price=Decimal("3000"),
+            snapshot=self.snapshot,
+        )
+        for user_address in self.user_addresses:
+            for token, quantity in [(self.eth, "1.5"), (self.lusd, "100")]:
+                SnapshotAssets.objects.create(
+                    cryptocurrency=token,
+                    user_address=user_address,
+                    quantity=Decimal(quantity),
+                    snapshot=self.snapshot,
+                )
+
+    def test_assets_are_summed_per_token_and_network(self):
+        HistoricalPrice.objects.create(
+            cryptocurrency=self.lusd.cryptocurrency,
+            date=date(2025, 1, 1),
+            price=Decimal("1"),
+        )
+        assets = fetch_aggregated_assets(self.user_addresses, self.snapshot)
+        self.assertEqual(
+            assets["ETH_Ethereum"],
+            {
+                "symbol": "ETH",
+                "network": "Ethereum",
+                "amount": Decimal("3"),
+                "image": self.eth.cryptocurrency.image,
+                "amount_eur": Decimal("9000"),
+            },
+        )
+        self.assertEqual(assets["LUSD_Ethereum"]["amount_eur"], Decimal("200"))
+
+    def test_priced_snapshot_is_aggregated_in_one_query(self):
+        Price.objects.create(
+            cryptocurrency=self.lusd.cryptocurrency,
+            price=Decimal("1"),
+            snapshot=self.snapshot,
+        )
+        with self.assertNumQueries(1):
+            assets = fetch_aggregated_assets(self.user_addresses, self.snapshot)
+        self.assertEqual(len(assets), 2)
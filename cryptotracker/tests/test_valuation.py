@@ -0,0 +1,195 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from cryptotracker.constants import PROTOCOLS_DATA
+from cryptotracker.models import (
+    Account,
+    Cryptocurrency,
+    CryptocurrencyNetwork,
+    Pool,
+    PortfolioValuation,
+    Price,
+    Snapshot,
+    SnapshotAssets,
+    UserAddress,
+    Validator,
+    ValidatorSnapshot,
+    WalletType,
+)
+from cryptotracker.valuation import (
+    PortfolioValues,
+    compute_address_totals,
+    get_address_totals,
+    get_value_history,
+    write_portfolio_valuations,
+)
+from cryptotracker.views import calculate_total_value
+from cryptotracker.writer import SnapshotWriter
+
+
+class PortfolioValuationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+
+    def setUp(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        account = Account.objects.create(user=user, name="Test Account")
+        self.user_addresses = [
+            UserAddress.objects.create(
+                user=user,
+                public_address=f"0x{index:040x}",
+                account=account,
+                wallet_type=WalletType.objects.get(name="HOT"),
+            )
+            for index in range(2)
+        ]
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        for symbol, price in [("ETH", "3000"), ("LUSD", "1")]:
+            Price.objects.create(
+                cryptocurrency=Cryptocurrency.objects.get(symbol=symbol),
+                price=Decimal(price),
+                snapshot=self.snapshot,
+            )
+
+        first, second = self.user_addresses
+        SnapshotAssets.objects.create(
+            cryptocurrency=CryptocurrencyNetwork.objects.filter(
+                cryptocurrency__symbol="ETH"
+            ).first(),
+            user_address=first,
+            quantity=Decimal("2"),
+            snapshot=self.snapshot,
+        )
+        validator = Validator.objects.create(
+            user_address=second, validator_index=1, public_key="0x", activation_date=""
+        )
+        ValidatorSnapshot.objects.create(
+            validator=validator,
+            balance=Decimal("32"),
+            status="active_online",
+            rewards=Decimal("1"),
+            snapshot=self.snapshot,
+        )
+        pool = Pool.objects.get(
+            protocol_network__protocol__name=PROTOCOLS_DATA["UNI_V3"]["name"]
+        )
+        with SnapshotWriter(self.snapshot) as writer:
+            writer.add_pool_row(pool, second, "LUSD", Decimal("500"), position_id="1")
+            writer.add_pool_row(
+                pool, second, "ETH", Decimal("1"), is_reward=True, position_id="1"
+            )
+
+    def test_totals_per_category(self):
+        first, second = self.user_addresses
+        totals = compute_address_totals(self.user_addresses, self.snapshot)
+        self.assertEqual(totals[first.id]["assets"], 6000)
+        self.assertEqual(totals[first.id]["total"], 6000)
+        self.assertEqual(totals[second.id]["staking"], 96000)
+        self.assertEqual(totals[second.id]["protocols"], 500)
+        self.assertEqual(totals[second.id]["total"], 96500)
+
+    def test_views_read_stored_valuations(self):
+        live_value = calculate_total_value(self.user_addresses, self.snapshot)
+        self.assertEqual(
+            write_portfolio_valuations(self.snapshot, self.user_addresses), 2
+        )
+        self.assertEqual(PortfolioValuation.objects.count(), 2)
+        with self.assertNumQueries(1):
+            stored_value = calculate_total_value(self.user_addresses, self.snapshot)
+        self.assertEqual(stored_value, live_value)
+
+    def test_missing_valuations_are_computed(self):
+        write_portfolio_valuations(self.snapshot, self.user_addresses[:1])
+        totals = get_address_totals(self.user_addresses, self.snapshot)
+        self.assertEqual(totals[self.user_addresses[1].id]["total"], 96500)
+
+    def test_values_are_rolled_up_in_one_pass(self):
+        write_portfolio_valuations(self.snapshot, self.user_addresses)
+        first, second = self.user_addresses
+        second.wallet_type = WalletType.objects.get(name="COLD")
+        second.save()
+        addresses = UserAddress.objects.filter(
+            id__in=[first.id, second.id]
+        ).select_related("wallet_type")
+        with self.assertNumQueries(2):
+            values = PortfolioValues(addresses, self.snapshot)
+            by_wallet = values.by(lambda address: address.wallet_type.name)
+            by_account = values.by(lambda address: address.account_id)
+        self.assertEqual(by_wallet, {"HOT": 6000, "COLD": 96500})
+        self.assertEqual(by_account, {first.account_id: 102500})
+        self.assertEqual(values.address(second), 96500)
+        self.assertEqual(values.total(), 102500)
+
+
+class ValueHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.client.login(username="testuser", password="testpassword")
+        self.user_address = UserAddress.objects.create(
+            user=self.user,
+            public_address="0x1234567890abcdef1234567890abcdef12345678",
+            account=Account.objects.create(user=self.user, name="Test Account"),
+            wallet_type=WalletType.objects.get(name="HOT"),
+        )
+        # Wednesday, Thursday and the next Monday
+        for day, total in [(1, 100), (2, 200), (6, 300)]:
+            PortfolioValuation.objects.create(
+                user_address=self.user_address,
+                snapshot=Snapshot.objects.create(
+                    date=datetime(2025, 1, day, 12, tzinfo=timezone.utc)
+                ),
+                assets=Decimal(total),
+                total=Decimal(total),
+            )
+
+    def test_history_is_bucketed_by_last_snapshot(self):
+        with self.assertNumQueries(1):
+            points = get_value_history(
+                UserAddress.objects.filter(user=self.user),
+                date(2025, 1, 1),
+                date(2025, 1, 31),
+                "week",
+            )
+        self.assertEqual(
+            [(point["date"], point["total"]) for point in points],
+            [("2024-12-30", 200.0), ("2025-01-06", 300.0)],
+        )
+
+    def test_history_endpoint(self):
+        response = self.client.get(
+            reverse("portfolio_history"),
+            {"start": "2025-01-02", "end": "2025-01-31", "interval": "month"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["points"],
+            [
+                {
+                    "date": "2025-01-01",
+                    "snapshot_date": "2025-01-06T12:00:00+00:00",
+                    "total": 300.0,
+                    "assets": 300.0,
+                    "staking": 0.0,
+                    "protocols": 0.0,
+                    "troves": 0.0,
+                }
+            ],
+        )
+        response = self.client.get(reverse("portfolio_history"), {"interval": "year"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("portfolio_history"), {"account": "abc"})
+        self.assertEqual(response.status_code, 400)
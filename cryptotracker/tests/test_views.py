@@ -1,9 +1,11 @@
+from unittest.mock import MagicMock, patch
+
 from django.contrib.auth.models import User
 from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 
-from cryptotracker.models import Account, UserAddress, WalletType
+from cryptotracker.models import Account, Snapshot, UserAddress, WalletType
 
 
 class CryptoTrackerViewTests(TestCase):
@@ -96,9 +98,36 @@ class CryptoTrackerViewTests(TestCase):
         )  # Redirect after successful deletion
         self.assertFalse(Account.objects.filter(id=self.account.id).exists())
 
-    def test_refresh_view(self):
+    @patch("cryptotracker.views.run_daily_snapshot_update")
+    def test_refresh_view(self, run_daily_snapshot_update):
+        run_daily_snapshot_update.delay.return_value.id = "snapshot-task"
         response = self.client.get(reverse("refresh"))
         self.assertEqual(response.status_code, 302)  # Redirect to waiting page
+        # The snapshot is created by the task, not in the request
+        run_daily_snapshot_update.delay.assert_called_once_with(self.user.id)
+        self.assertFalse(Snapshot.objects.exists())
+        self.assertEqual(self.client.session["snapshot_task_id"], "snapshot-task")
+
+    @patch("cryptotracker.views.AsyncResult")
+    def test_task_status_waits_for_the_completion_callback(self, async_result):
+        results = {
+            "snapshot-task": MagicMock(result=[["callback", None], None]),
+            "callback": MagicMock(),
+        }
+        async_result.side_effect = results.get
+        session = self.client.session
+        session["snapshot_task_id"] = "snapshot-task"
+        session.save()
+
+        for task_ready, callback_ready, status in [
+            (False, False, "pending"),
+            (True, False, "pending"),
+            (True, True, "complete"),
+        ]:
+            results["snapshot-task"].ready.return_value = task_ready
+            results["callback"].ready.return_value = callback_ready
+            response = self.client.get(reverse("check_task_status"))
+            self.assertEqual(response.json(), {"status": status})
 
     def test_statistics_view(self):
         response = self.client.get(reverse("statistics"))
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from cryptotracker.models import (
+    Account,
+    Pool,
+    PoolBalanceSnapshot,
+    PoolPosition,
+    PoolRewardsSnapshot,
+    Snapshot,
+    UserAddress,
+    WalletType,
+)
+from cryptotracker.protocols.protocols import save_pool_snapshot
+from cryptotracker.writer import SnapshotWriter
+
+
+class SnapshotWriterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initialize_db")
+
+    def setUp(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        self.user_address = UserAddress.objects.create(
+            user=user,
+            public_address="0x1234567890abcdef1234567890abcdef12345678",
+            account=Account.objects.create(user=user, name="Test Account"),
+            wallet_type=WalletType.objects.get(name="HOT"),
+        )
+        self.snapshot = Snapshot.objects.create(
+            date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        self.pools = list(Pool.objects.all()[:2])
+
+    def _save(self, writer, pool, symbol, is_reward=False):
+        save_pool_snapshot(
+            pool, self.user_address, symbol, 1, self.snapshot, is_reward, writer=writer
+        )
+
+    def test_rows_are_written_on_flush(self):
+        with SnapshotWriter(self.snapshot) as writer:
+            for pool in self.pools:
+                self._save(writer, pool, "LUSD")
+                self._save(writer, pool, "ETH", is_reward=True)
+            self._save(writer, self.pools[0], "UNKNOWN")
+            self.assertFalse(PoolBalanceSnapshot.objects.exists())
+
+        self.assertEqual(PoolPosition.objects.count(), 2)
+        self.assertEqual(PoolBalanceSnapshot.objects.count(), 2)
+        self.assertEqual(PoolRewardsSnapshot.objects.count(), 2)
+
+    def test_flush_query_count_does_not_grow_with_rows(self):
+        PoolPosition.objects.create(user_address=self.user_address, pool=self.pools[0])
+        writer = SnapshotWriter(self.snapshot)
+        for _ in range(20):
+            for pool in self.pools:
+                self._save(writer, pool, "LUSD")
+        # savepoint, tokens, positions, new position, positions, balances, release
+        with self.assertNumQueries(7):
+            writer.flush()
+        self.assertEqual(PoolPosition.objects.count(), 2)
+
+    def test_rewritten_unit_updates_its_rows(self):
+        for quantity in (1, 2):
+            with SnapshotWriter(self.snapshot) as writer:
+                save_pool_snapshot(
+                    self.pools[0],
+                    self.user_address,
+                    "LUSD",
+                    quantity,
+                    self.snapshot,
+                    writer=writer,
+                )
+        self.assertEqual(PoolPosition.objects.count(), 1)
+        self.assertEqual(
+            list(PoolBalanceSnapshot.objects.values_list("quantity", flat=True)), [2]
+        )
+
+    def test_failed_unit_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            with SnapshotWriter(self.snapshot) as writer:
+                self._save(writer, self.pools[0], "LUSD")
+                raise ValueError("source failed")
+        self.assertFalse(PoolPosition.objects.exists())
+        self.assertFalse(PoolBalanceSnapshot.objects.exists())
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from django.db.models import Count, Max, QuerySet, Sum
+
+from cryptotracker.models import SnapshotRun, SnapshotStageTiming
+
+# Meter of the stage running in the current thread, fed by the HTTP and JSON-RPC clients
+_active = threading.local()
+
+
+class StageMeter:
+    """
+    Accumulates the external calls, response bytes, errors and database writes of
+    one stage of a snapshot run.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+        self.errors = 0
+        self.rows = 0
+        self.write_duration = 0.0
+
+
+def active_meter() -> Optional[StageMeter]:
+    """
+    Returns the meter of the stage running in the current thread, if any.
+    """
+    return getattr(_active, "meter", None)
+
+
+def record_call(size: int, error: bool = False) -> None:
+    """
+    Counts an external call (HTTP request or JSON-RPC response) in the running stage.
+    Args:
+        size (int): The size of the response body in bytes.
+        error (bool): Whether the call failed.
+    """
+    meter = active_meter()
+    if meter is None:
+        return
+    meter.calls += 1
+    meter.bytes += size
+    meter.errors += int(error)
+
+
+def record_write(seconds: float, rows: int) -> None:
+    """
+    Counts a database write of the running stage.
+    Args:
+        seconds (float): The time spent writing.
+        rows (int): The number of rows written.
+    """
+    meter = active_meter()
+    if meter is None:
+        return
+    meter.write_duration += seconds
+    meter.rows += rows
+
+
+@contextmanager
+def timed_stage(
+    run_id: Optional[int],
+    source: str,
+    user_address_id: Optional[int] = None,
+    network_id: Optional[int] = None,
+) -> Iterator[StageMeter]:
+    """
+    Meters a stage of a snapshot run and stores its SnapshotStageTiming on exit.
+    An exception leaving the stage is counted as an error and re-raised. Nothing is
+    stored without a run, and a failure to store the timing is only logged.
+    Args:
+        run_id (int, optional): The ID of the SnapshotRun the stage belongs to.
+        source (str): The source read by the stage (prices, tokens, staking, ...).
+        user_address_id (int, optional): The ID of the UserAddress read by the stage.
+        network_id (int, optional): The ID of the Network read by the stage.
+    Yields:
+        StageMeter: The meter of the stage.
+    """
+    meter = StageMeter()
+    previous = active_meter()
+    _active.meter = meter
+    start = time.perf_counter()
+    try:
+        yield meter
+    except Exception:
+        meter.errors += 1
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _active.meter = previous
+        if run_id is not None:
+            try:
+                SnapshotStageTiming.objects.create(
+                    run_id=run_id,
+                    source=source,
+                    user_address_id=user_address_id,
+                    network_id=network_id,
+                    duration=duration,
+                    write_duration=meter.write_duration,
+                    calls=meter.calls,
+                    bytes=meter.bytes,
+                    errors=meter.errors,
+                    rows=meter.rows,
+                )
+            except Exception as e:
+                logging.error(f"Could not store the timing of {source}: {e}")
+
+
+class SourceSummary(NamedTuple):
+    """
+    The totals of the stages of one source.
+    """
+
+    source: str
+    stages: int
+    duration: float
+    max_duration: float
+    write_duration: float
+    calls: int
+    bytes: int
+    errors: int
+
+
+def summarise_sources(stages: QuerySet) -> List[SourceSummary]:
+    """
+    Totals stage timings per source, the slowest source first.
+    Args:
+        stages (QuerySet): The SnapshotStageTiming rows to total.
+    Returns:
+        list: A SourceSummary per source.
+    """
+    rows = (
+        stages.values("source")
+        .annotate(
+            stages=Count("id"),
+            total_duration=Sum("duration"),
+            max_duration=Max("duration"),
+            total_write_duration=Sum("write_duration"),
+            total_calls=Sum("calls"),
+            total_bytes=Sum("bytes"),
+            total_errors=Sum("errors"),
+        )
+        .order_by("-total_duration")
+    )
+    return [
+        SourceSummary(
+            source=row["source"],
+            stages=row["stages"],
+            duration=row["total_duration"],
+            max_duration=row["max_duration"],
+            write_duration=row["total_write_duration"],
+            calls=row["total_calls"],
+            bytes=row["total_bytes"],
+            errors=row["total_errors"],
+        )
+        for row in rows
+    ]
+
+
+def source_trends(runs: List[SnapshotRun]) -> Dict[str, List[Optional[float]]]:
+    """
+    Returns the time spent on each source in each run, to spot the source that regressed.
+    Args:
+        runs (list): The runs to compare, in display order.
+    Returns:
+        dict: For each source, its total stage duration in each run (None when the run
+        has no stage of the source).
+    """
+    durations = {
+        (row["run"], row["source"]): row["total_duration"]
+        for row in SnapshotStageTiming.objects.filter(run__in=runs)
+        .values("run", "source")
+        .annotate(total_duration=Sum("duration"))
+    }
+    sources = sorted({source for _, source in durations})
+    return {
+        source: [durations.get((run.id, source)) for run in runs] for source in sources
+    }
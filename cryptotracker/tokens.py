@@ -1,9 +1,8 @@
 import logging
-from typing import Optional
+from collections import defaultdict
+from typing import List, Optional
 
-from decimal import Decimal
-
-from ape import Contract, networks
+from django.db.models import F, FilteredRelation, Q, Sum
 
 from cryptotracker.models import (
     CryptocurrencyNetwork,
@@ -12,53 +11,118 @@ from cryptotracker.models import (
     SnapshotAssets,
     UserAddress,
 )
-from cryptotracker.utils import get_last_price
+from cryptotracker.multicall import aggregate, balance_of_call, native_balance_call
+from cryptotracker.providers import provider_manager
+from cryptotracker.writer import SnapshotWriter, save_rows
+from cryptotracker.prices import PriceMatrix
 
 
 def fetch_assets(user_address: UserAddress, snapshot: Snapshot) -> None:
     """
     Fetches the assets of a user from the Ethereum blockchain and stores them in the database.
-    This function uses the Ape library to interact with the Ethereum blockchain and fetch the balance of each token.
+    This function uses the Ape library to interact with the blockchain. The balances of all the tokens
+    of a network (native token included) are read in a single Multicall3 call.
     It also fetches the current price of each token using the fetch_historical_price function from Coingeko app
 
     """
-    crypto_networks = Network.objects.all()
-    for network in crypto_networks:
-        with networks.parse_network_choice(network.url_rpc) as provider:
-            public_address = user_address.public_address
-            # Fetch tokens balance
-            for token in CryptocurrencyNetwork.objects.filter(network=network):
-                if token.token_address == "NativeToken":
-                    logging.info(
-                        f"Fetching balance for Ethereum on network {network.name}"
-                    )
-                    token_asset = provider.get_balance(public_address)
-                else:
-                    if not token.token_address:
-                        logging.warning(
-                            f"Token {token.cryptocurrency.name} does not have a token address on network {network.name}"
-                        )
-                        continue
-                    token_contract = Contract(token.token_address)
-                    token_asset = token_contract.balanceOf(public_address)
-
-                if token_asset != 0:
-                    asset_snapshot = SnapshotAssets(
-                        cryptocurrency=token,
-                        user_address=user_address,
-                        quantity=token_asset / 1e18,
-                        snapshot=snapshot,
-                    )
-                    asset_snapshot.save()
+    sweep_assets([user_address], snapshot)
+
+
+def sweep_assets(
+    user_addresses: list[UserAddress],
+    snapshot: Snapshot,
+    network: Optional[Network] = None,
+    writer: Optional[SnapshotWriter] = None,
+) -> List[Network]:
+    """
+    Fetches the assets of a list of user_addresses network by network and stores them in the database.
+    For each network the full (address x token) balance matrix is read in chunked Multicall3 calls
+    using a single provider session at the block the snapshot is pinned to,
+    and the non-zero balances are written in bulk.
+    Args:
+        user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot): The Snapshot to associate with the assets.
+        network (Network, optional): Restrict the sweep to this network (default: all networks).
+        writer (SnapshotWriter, optional): The writer of the work unit.
+    Returns:
+        list: The networks whose balances could not be fetched.
+    """
+    failed_networks: List[Network] = []
+    user_addresses = list(user_addresses)
+    if not user_addresses:
+        return failed_networks
+
+    crypto_networks = CryptocurrencyNetwork.objects.select_related(
+        "cryptocurrency", "network"
+    )
+    if network is not None:
+        crypto_networks = crypto_networks.filter(network=network)
+
+    tokens_by_network: dict = defaultdict(list)
+    for token in crypto_networks:
+        if not token.token_address:
+            logging.warning(
+                f"Token {token.cryptocurrency.name} does not have a token address on network {token.network.name}"
+            )
+            continue
+        tokens_by_network[token.network].append(token)
+
+    for token_network, tokens in tokens_by_network.items():
+        try:
+            with provider_manager.borrow(token_network.url_rpc) as provider:
+                logging.info(
+                    f"Fetching {len(tokens)} token balances of {len(user_addresses)} addresses on network {token_network.name}"
+                )
+                keys = []
+                calls = []
+                for user_address in user_addresses:
+                    public_address = user_address.public_address
+                    for token in tokens:
+                        if token.token_address == "NativeToken":
+                            calls.append(native_balance_call(provider, public_address))
+                        else:
+                            calls.append(
+                                balance_of_call(token.token_address, public_address)
+                            )
+                        keys.append((user_address, token))
+
+                balances = aggregate(
+                    calls, block_id=snapshot.block_number(token_network.name)
+                )
+        except Exception as e:
+            logging.error(
+                f"Error fetching balances on network {token_network.name}: {e}"
+            )
+            failed_networks.append(token_network)
+            continue
+
+        save_rows(
+            [
+                SnapshotAssets(
+                    cryptocurrency=token,
+                    user_address=user_address,
+                    quantity=token_asset / 1e18,
+                    snapshot=snapshot,
+                )
+                for (user_address, token), token_asset in zip(keys, balances)
+                if token_asset
+            ],
+            writer,
+        )
+    return failed_networks
 
 
 def fetch_aggregated_assets(
-    user_addresses: list[UserAddress], snapshot: Optional[Snapshot] = None
+    user_addresses: list[UserAddress],
+    snapshot: Optional[Snapshot] = None,
+    prices: Optional[PriceMatrix] = None,
 ) -> dict:
     """
     Fetches the aggregated assets of a list of user_addresses.
     Args:
         user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot, optional): The snapshot to value (default: the last one).
+        prices (PriceMatrix, optional): The prices of the snapshot, loaded if not given.
     Returns:
         dict: A dictionary containing the aggregated assets and their values.
     """
@@ -67,40 +131,50 @@ def fetch_aggregated_assets(
         if not snapshot:
             return {}
 
-    # Filter assets for the given user_addresses and snapshot date
-    last_assets = SnapshotAssets.objects.filter(
-        user_address__in=user_addresses, snapshot=snapshot
+    # Sum the quantities per token and network in the database, joined to the
+    # prices stored with the snapshot
+    rows = (
+        SnapshotAssets.objects.filter(
+            user_address__in=user_addresses, snapshot=snapshot
+        )
+        .annotate(
+            snapshot_price=FilteredRelation(
+                "cryptocurrency__cryptocurrency__price",
+                condition=Q(cryptocurrency__cryptocurrency__price__snapshot=snapshot),
+            )
+        )
+        .values(
+            name=F("cryptocurrency__cryptocurrency__name"),
+            symbol=F("cryptocurrency__cryptocurrency__symbol"),
+            image=F("cryptocurrency__cryptocurrency__image"),
+            network=F("cryptocurrency__network__name"),
+            price=F("snapshot_price__price"),
+        )
+        .annotate(amount=Sum("quantity"))
+        .order_by("symbol", "network")
     )
 
-    if not last_assets.exists():
-        return {}
-
-    # Aggregate assets by cryptocurrency and network
     aggregated_assets: dict = {}
-    for asset in last_assets:
-        token = asset.cryptocurrency.cryptocurrency
-        network = asset.cryptocurrency.network
-        symbol = token.symbol
-
+    missing_prices = []
+    for row in rows:
         # Use a combination of symbol and network name as the key
-        key = f"{symbol}_{network.name}"
-
-        # Fetch the current price
-        current_price = get_last_price(token.name, snapshot.date)
-
-        # Update or initialize the aggregated data
-        if key not in aggregated_assets:
-            aggregated_assets[key] = {
-                "symbol": symbol,
-                "network": network.name,
-                "amount": Decimal(0),
-                "image": token.image,
-                "amount_eur": Decimal(0),
-            }
-
-        aggregated_assets[key]["amount"] += asset.quantity
-        aggregated_assets[key]["amount_eur"] = (
-            aggregated_assets[key]["amount"] * current_price
-        )
+        aggregated_assets[f"{row['symbol']}_{row['network']}"] = row
+        if row["price"] is None:
+            missing_prices.append(row["name"])
+
+    if prices is None:
+        # The prices stored with the snapshot are already joined to the rows
+        prices = PriceMatrix(snapshot, {})
+    prices.resolve(missing_prices)
+
+    for key, row in aggregated_assets.items():
+        price = row["price"] if row["price"] is not None else prices.get(row["name"])
+        aggregated_assets[key] = {
+            "symbol": row["symbol"],
+            "network": row["network"],
+            "amount": row["amount"],
+            "image": row["image"],
+            "amount_eur": row["amount"] * price,
+        }
 
     return aggregated_assets
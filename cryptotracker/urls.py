@@ -10,6 +10,7 @@ from cryptotracker.views import (
     edit_object,
     home,
     portfolio,
+    portfolio_history,
     refresh,
     sign_up,
     staking,
@@ -23,6 +24,7 @@ from cryptotracker.views import (
     revoke_invite_code,
     user_management,
     toggle_admin_status,
+    metrics,
 )
 
 urlpatterns = [
@@ -30,6 +32,7 @@ urlpatterns = [
     path("accounts/", accounts, name="accounts"),
     path("portfolio/", portfolio, name="portfolio"),
     path("portfolio/<str:date_str>/", portfolio, name="portfolio_with_date"),
+    path("portfolio_history/", portfolio_history, name="portfolio_history"),
     path("user_addresses/", user_addresses, name="user_addresses"),
     path("user_address/<str:public_address>/", address_detail, name="address_detail"),
     path("user_addresses/", include("django.contrib.auth.urls")),
@@ -78,6 +81,8 @@ urlpatterns = [
     path("check_task_status/", check_task_status, name="check_task_status"),
     path("statistics/", statistics, name="statistics"),
     path("rewards/", rewards, name="rewards"),
+    # Scraped by Prometheus at its default path, without a trailing slash
+    path("metrics", metrics, name="metrics"),
     # Admin URLs
     path("admin/", admin_panel, name="admin_panel"),
     path("admin/generate_invite_code/", generate_invite_code, name="generate_invite_code"),
@@ -1,13 +1,30 @@
 import logging
-from datetime import date, datetime
+import threading
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 import backoff
 import requests
+from django.conf import settings
+from django.core.cache import cache
 
 
-from cryptotracker.models import Cryptocurrency, Price
+from cryptotracker.metrics import observe_external_request
+from cryptotracker.models import Cryptocurrency, HistoricalPrice, Price, Snapshot
+from cryptotracker.timing import record_call
+
+# Seconds a price stays in the shared cache. Prices of a snapshot only change when
+# new Price rows are written, which invalidates them.
+PRICE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Longest date range requested at once from the market_chart/range endpoint. Coingecko
+# returns hourly samples up to 90 days, but a single 00:00 sample per day beyond, which
+# would be collapsed to the open of each day instead of its close.
+PRICE_RANGE_CHUNK_DAYS = 90
+
+# Memo of the prices read by the current request or task (one per thread)
+_price_memo = threading.local()
 
 
 def log_backoff(details):
@@ -36,8 +53,14 @@ def APIquery(url: str, params: Dict) -> Optional[Dict]:
         response = requests.get(url, params=params)
     except requests.exceptions.RequestException as e:
         logging.error(f"{url} request failed: {e}")
+        record_call(0, error=True)
+        observe_external_request(url, "error")
         return None
 
+    record_call(len(response.content), error=response.status_code != 200)
+    observe_external_request(
+        url, str(response.status_code), response.elapsed.total_seconds()
+    )
     if response.status_code != 200:
         logging.error(
             f"{url} request {response.url} failed "
@@ -60,7 +83,7 @@ def fetch_historical_price(
     Returns:
         Decimal: The historical price of the cryptocurrency, or None if the request fails.
     """
-    url = f"https://api.coingecko.com/api/v3/coins/{crypto_id}/history"
+    url = f"{settings.COINGECKO_API_URL}/coins/{crypto_id}/history"
     params = {"date": date.strftime("%d-%m-%Y")}
 
     data = APIquery(url, params)
@@ -69,6 +92,110 @@ def fetch_historical_price(
     return Decimal(data["market_data"]["current_price"][currency])
 
 
+def fetch_price_range(
+    crypto_id: str, start: date, end: date, currency: str = "eur"
+) -> Optional[Dict[date, Decimal]]:
+    """
+    Fetches the daily closing prices of a cryptocurrency over a date range from the Coingecko API.
+    The range is requested in chunks of PRICE_RANGE_CHUNK_DAYS, and the samples of each day
+    are collapsed to the last one (the close, in UTC).
+    Args:
+        crypto_id (str): The ID of the cryptocurrency.
+        start (datetime.date): The first day of the range.
+        end (datetime.date): The last day of the range (included).
+        currency (str): The currency in which to fetch the prices (default is "eur").
+    Returns:
+        dict: The closing price of each day, or None if a request fails.
+    """
+    url = f"{settings.COINGECKO_API_URL}/coins/{crypto_id}/market_chart/range"
+    closes: Dict[date, Decimal] = {}
+
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=PRICE_RANGE_CHUNK_DAYS - 1), end)
+        params = {
+            "vs_currency": currency,
+            "from": int(
+                datetime.combine(
+                    chunk_start, datetime.min.time(), timezone.utc
+                ).timestamp()
+            ),
+            "to": int(
+                datetime.combine(
+                    chunk_end, datetime.max.time(), timezone.utc
+                ).timestamp()
+            ),
+        }
+        data = APIquery(url, params)
+        if data is None:
+            return None
+        # Samples are sorted by time, so the last one of each day wins
+        for timestamp, price in data["prices"]:
+            day = datetime.fromtimestamp(timestamp / 1000, timezone.utc).date()
+            if chunk_start <= day <= chunk_end:
+                closes[day] = Decimal(str(price))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    return closes
+
+
+def backfill_historical_prices(
+    crypto_ids: Iterable[str], start: date, end: date
+) -> Dict[str, int]:
+    """
+    Stores the daily closing prices of the given cryptocurrencies over a date range.
+    Existing rows are overwritten, so running it twice over the same range is harmless,
+    and the cached prices of the snapshots taken in the range are invalidated.
+    Args:
+        crypto_ids (list): The IDs of the cryptocurrencies.
+        start (datetime.date): The first day of the range.
+        end (datetime.date): The last day of the range (included).
+    Returns:
+        dict: The number of days stored for each cryptocurrency (-1 when the fetch failed).
+    """
+    crypto_ids = list(crypto_ids)
+    cryptocurrencies = {
+        crypto.name: crypto
+        for crypto in Cryptocurrency.objects.filter(name__in=crypto_ids)
+    }
+    stored = {}
+    for crypto_id in crypto_ids:
+        cryptocurrency = cryptocurrencies.get(crypto_id)
+        if cryptocurrency is None:
+            logging.error(f"Cryptocurrency {crypto_id} not found in the database")
+            stored[crypto_id] = -1
+            continue
+
+        closes = fetch_price_range(crypto_id, start, end)
+        if closes is None:
+            logging.error(
+                f"Could not fetch prices of {crypto_id} from {start} to {end}"
+            )
+            stored[crypto_id] = -1
+            continue
+
+        HistoricalPrice.objects.bulk_create(
+            [
+                HistoricalPrice(cryptocurrency=cryptocurrency, date=day, price=price)
+                for day, price in closes.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["cryptocurrency", "date"],
+            update_fields=["price"],
+        )
+        stored[crypto_id] = len(closes)
+        logging.info(f"Stored {len(closes)} daily prices of {crypto_id}")
+
+    updated = [crypto_id for crypto_id, days in stored.items() if days > 0]
+    if updated:
+        for snapshot_date in Snapshot.objects.filter(
+            date__date__range=(start, end)
+        ).values_list("date", flat=True):
+            invalidate_price_cache(snapshot_date, updated)
+
+    return stored
+
+
 def fetch_cryptocurrency_price(
     crypto_ids: List[str],
 ) -> Optional[Dict[str, Dict[str, Decimal]]]:
@@ -79,7 +206,7 @@ def fetch_cryptocurrency_price(
     Returns:
         dict: A dictionary containing the current price of each cryptocurrency, or None if the request fails.
     """
-    url = "https://api.coingecko.com/api/v3/simple/price"
+    url = f"{settings.COINGECKO_API_URL}/simple/price"
     params = {
         "ids": ",".join(crypto_ids),
         "vs_currencies": "eur",
@@ -109,28 +236,82 @@ def convertWeiIntStr(value: int) -> str:
     return f"{value_decimal.normalize():,.3f} ether"
 
 
+def _price_cache_key(crypto_id: str, snapshot: datetime) -> str:
+    return f"price:{crypto_id}:{snapshot.isoformat()}"
+
+
+def _get_price_memo() -> Dict[str, Decimal]:
+    if not hasattr(_price_memo, "prices"):
+        _price_memo.prices = {}
+    return _price_memo.prices
+
+
+def clear_price_memo() -> None:
+    """
+    Clears the per-request (or per-task) memo of get_last_price.
+    """
+    _price_memo.prices = {}
+
+
+def invalidate_price_cache(snapshot: datetime, crypto_ids: Iterable[str]) -> None:
+    """
+    Drops the cached prices of a snapshot, to be called when new Price rows are written for it.
+    Args:
+        snapshot (datetime): The date of the snapshot.
+        crypto_ids (list): The IDs of the cryptocurrencies whose prices were written.
+    """
+    keys = [_price_cache_key(crypto_id, snapshot) for crypto_id in crypto_ids]
+    cache.delete_many(keys)
+    memo = _get_price_memo()
+    for key in keys:
+        memo.pop(key, None)
+
+
 def get_last_price(crypto_id: str, snapshot: datetime) -> Decimal:
     """
     Fetches the last price of a cryptocurrency from the database or API if not found.
+    Prices are cached in two levels: a memo local to the current request or task,
+    and the shared Django cache keyed by (cryptocurrency, snapshot).
     Args:
         crypto_id (str): The ID of the cryptocurrency.
         snapshot (datetime): The date of the snapshot.
     Returns:
         Decimal: The last price of the cryptocurrency.
     """
+    key = _price_cache_key(crypto_id, snapshot)
+    memo = _get_price_memo()
+    if key in memo:
+        return memo[key]
+
+    price = cache.get(key)
+    if price is None:
+        price = _get_last_price(crypto_id, snapshot)
+        cache.set(key, price, PRICE_CACHE_TIMEOUT)
+
+    memo[key] = price
+    return price
+
+
+def _get_last_price(crypto_id: str, snapshot: datetime) -> Decimal:
     cryptocurrency = Cryptocurrency.objects.get(name=crypto_id)
     current_price = Price.objects.filter(
         cryptocurrency=cryptocurrency, snapshot__date=snapshot
     ).first()
 
-    if not current_price:
-        # Fetch historical price if not found in the database
-        historical_price = fetch_historical_price(crypto_id, snapshot.date())
-        if historical_price:
-            return historical_price
-        else:
-            raise ValueError(
-                f"Price data for {crypto_id} on {snapshot.date()} not found."
-            )
+    if current_price:
+        return current_price.price
 
-    return current_price.price
+    # Daily close stored by a backfill, then a one-day request as a last resort
+    historical_price = HistoricalPrice.objects.filter(
+        cryptocurrency=cryptocurrency, date=snapshot.date()
+    ).first()
+    if historical_price:
+        return historical_price.price
+
+    price = fetch_historical_price(crypto_id, snapshot.date())
+    if not price:
+        raise ValueError(f"Price data for {crypto_id} on {snapshot.date()} not found.")
+    HistoricalPrice.objects.get_or_create(
+        cryptocurrency=cryptocurrency, date=snapshot.date(), defaults={"price": price}
+    )
+    return price
@@ -0,0 +1,286 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from django.db.models import F, Sum
+
+from cryptotracker.models import (
+    PoolBalanceSnapshot,
+    PortfolioValuation,
+    Snapshot,
+    SnapshotAssets,
+    TroveSnapshot,
+    UserAddress,
+    ValidatorSnapshot,
+)
+from cryptotracker.prices import PriceMatrix
+
+# EUR totals stored per address and snapshot, besides the overall total
+CATEGORIES = ("assets", "staking", "protocols", "troves")
+
+
+def _empty_totals() -> Dict[str, Decimal]:
+    return {category: Decimal(0) for category in CATEGORIES + ("total",)}
+
+
+def compute_address_totals(
+    user_addresses: Iterable[UserAddress],
+    snapshot: Snapshot,
+    prices: Optional[PriceMatrix] = None,
+) -> Dict[int, Dict[str, Decimal]]:
+    """
+    Computes the EUR value of each address at a snapshot, per category, from the raw snapshot rows.
+    Each category is summed per address (and token) by one grouped query, so the number of
+    queries does not depend on the number of addresses or positions.
+    Args:
+        user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot): The snapshot to value.
+        prices (PriceMatrix, optional): The prices of the snapshot, loaded if not given.
+    Returns:
+        dict: The totals of each category and the overall total, keyed by UserAddress ID.
+    """
+    totals = {user_address.id: _empty_totals() for user_address in user_addresses}
+    if not totals:
+        return totals
+    ids = list(totals)
+
+    assets = list(
+        SnapshotAssets.objects.filter(user_address_id__in=ids, snapshot=snapshot)
+        .values(
+            address_id=F("user_address_id"),
+            name=F("cryptocurrency__cryptocurrency__name"),
+        )
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+    )
+    staking = list(
+        ValidatorSnapshot.objects.filter(
+            validator__user_address_id__in=ids, snapshot=snapshot
+        )
+        .values(address_id=F("validator__user_address_id"))
+        .annotate(quantity=Sum("balance"))
+        .order_by()
+    )
+    protocols = list(
+        PoolBalanceSnapshot.objects.filter(
+            pool_position__user_address_id__in=ids, snapshot=snapshot
+        )
+        .values(address_id=F("pool_position__user_address_id"), name=F("token__name"))
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+    )
+    troves = (
+        TroveSnapshot.objects.filter(trove__user_address_id__in=ids, snapshot=snapshot)
+        .values(address_id=F("trove__user_address_id"))
+        .annotate(balance=Sum("balance"))
+        .order_by()
+    )
+
+    if prices is None:
+        prices = PriceMatrix.for_snapshot(snapshot)
+    prices.resolve(row["name"] for row in assets + protocols)
+
+    for row in assets:
+        price = prices.get(row["name"])
+        totals[row["address_id"]]["assets"] += row["quantity"] * price
+    for row in protocols:
+        price = prices.get(row["name"])
+        totals[row["address_id"]]["protocols"] += row["quantity"] * price
+    for row in staking:
+        price = prices.get("ethereum")
+        totals[row["address_id"]]["staking"] += row["quantity"] * price
+    for row in troves:
+        totals[row["address_id"]]["troves"] += row["balance"]
+
+    for address_totals in totals.values():
+        address_totals["total"] = sum(
+            (address_totals[category] for category in CATEGORIES), Decimal(0)
+        )
+    return totals
+
+
+def write_portfolio_valuations(
+    snapshot: Snapshot, user_addresses: Iterable[UserAddress]
+) -> int:
+    """
+    Stores the valuation of each address at a snapshot, replacing the previous ones.
+    Args:
+        snapshot (Snapshot): The completed snapshot.
+        user_addresses (list): The UserAddress objects covered by the snapshot.
+    Returns:
+        int: The number of valuations written.
+    """
+    totals = compute_address_totals(user_addresses, snapshot)
+    PortfolioValuation.objects.bulk_create(
+        [
+            PortfolioValuation(
+                user_address_id=user_address_id, snapshot=snapshot, **address_totals
+            )
+            for user_address_id, address_totals in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["snapshot", "user_address"],
+        update_fields=[*CATEGORIES, "total"],
+    )
+    logging.info(f"Stored {len(totals)} valuations of snapshot {snapshot.id}")
+    return len(totals)
+
+
+def get_address_totals(
+    user_addresses: List[UserAddress],
+    snapshot: Snapshot,
+    prices: Optional[PriceMatrix] = None,
+) -> Dict[int, Dict[str, Decimal]]:
+    """
+    Returns the valuation of each address at a snapshot, read from the stored valuations.
+    Addresses without one (e.g. added after the snapshot) are valued from the raw rows.
+    Args:
+        user_addresses (list): A list of UserAddress objects.
+        snapshot (Snapshot): The snapshot to value.
+        prices (PriceMatrix, optional): The prices of the snapshot, used for the missing valuations.
+    Returns:
+        dict: The totals of each category and the overall total, keyed by UserAddress ID.
+    """
+    totals = {
+        valuation["user_address_id"]: valuation
+        for valuation in PortfolioValuation.objects.filter(
+            snapshot=snapshot, user_address__in=user_addresses
+        ).values("user_address_id", "total", *CATEGORIES)
+    }
+    for address_totals in totals.values():
+        del address_totals["user_address_id"]
+
+    missing = [
+        user_address for user_address in user_addresses if user_address.id not in totals
+    ]
+    if missing:
+        totals.update(compute_address_totals(missing, snapshot, prices))
+    return totals
+
+
+class PortfolioValues:
+    """
+    Total value of each address of a portfolio at a snapshot, computed in one pass
+    and rolled up in memory by account, wallet type or any other address attribute.
+    """
+
+    def __init__(
+        self, user_addresses: Iterable[UserAddress], snapshot: Optional[Snapshot] = None
+    ):
+        """
+        Args:
+            user_addresses (list): The UserAddress objects of the portfolio.
+            snapshot (Snapshot, optional): The snapshot to value (default: the last one).
+        """
+        self.user_addresses = list(user_addresses)
+        self.snapshot = snapshot or Snapshot.objects.first()
+        if self.snapshot is None:
+            logging.warning("No snapshot available for calculating total value.")
+            self.totals: Dict[int, Dict[str, Decimal]] = {}
+        else:
+            self.totals = get_address_totals(self.user_addresses, self.snapshot)
+
+    def address(self, user_address: UserAddress) -> Decimal:
+        """
+        Returns the total value of an address.
+        """
+        return self.totals.get(user_address.id, {}).get("total", Decimal(0))
+
+    def by(self, key: Callable[[UserAddress], Hashable]) -> Dict[Hashable, Decimal]:
+        """
+        Sums the total value of the addresses grouped by key(user_address).
+        Args:
+            key (callable): Returns the group of an address, e.g. its account ID.
+        Returns:
+            dict: The total value of each group.
+        """
+        values: Dict[Hashable, Decimal] = defaultdict(Decimal)
+        for user_address in self.user_addresses:
+            values[key(user_address)] += self.address(user_address)
+        return dict(values)
+
+    def total(self) -> Decimal:
+        """
+        Returns the total value of the portfolio.
+        """
+        return sum(
+            (self.address(user_address) for user_address in self.user_addresses),
+            Decimal(0),
+        )
+
+
+# Bucket sizes of the value history
+HISTORY_INTERVALS = ("day", "week", "month")
+
+
+def _bucket(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def get_value_history(
+    user_addresses: Iterable[UserAddress], start: date, end: date, interval: str = "day"
+) -> List[Dict]:
+    """
+    Returns the value of a set of addresses over a date range, from the stored valuations.
+    The valuations are summed per snapshot by a single grouped query, and each day, week or
+    month is represented by its last snapshot.
+    Args:
+        user_addresses (list): The UserAddress objects (or a queryset of them).
+        start (datetime.date): The first day of the range.
+        end (datetime.date): The last day of the range (included).
+        interval (str): One of HISTORY_INTERVALS.
+    Returns:
+        list: One point per bucket, in date order, with the date of the bucket, the date of
+        its snapshot, the total value and the value of each category.
+    """
+    if interval not in HISTORY_INTERVALS:
+        raise ValueError(f"Unknown interval {interval}")
+
+    rows = (
+        PortfolioValuation.objects.filter(
+            user_address__in=user_addresses,
+            snapshot__date__gte=datetime.combine(start, time.min, timezone.utc),
+            snapshot__date__lt=datetime.combine(
+                end + timedelta(days=1), time.min, timezone.utc
+            ),
+        )
+        .values("snapshot_id", snapshot_date=F("snapshot__date"))
+        .annotate(
+            value_total=Sum("total"),
+            **{f"value_{category}": Sum(category) for category in CATEGORIES},
+        )
+        .order_by("snapshot_date")
+    )
+
+    # Rows are sorted by date, so the last snapshot of each bucket wins
+    points: Dict[date, Dict] = {}
+    for row in rows:
+        bucket = _bucket(row["snapshot_date"].date(), interval)
+        points[bucket] = {
+            "date": bucket.isoformat(),
+            "snapshot_date": row["snapshot_date"].isoformat(),
+            "total": float(row["value_total"]),
+            **{category: float(row[f"value_{category}"]) for category in CATEGORIES},
+        }
+    return list(points.values())
+
+
+def covered_addresses(snapshot: Snapshot) -> List[UserAddress]:
+    """
+    Returns the addresses that have any row in a snapshot.
+    """
+    ids: Set[int] = set()
+    for rows, field in (
+        (SnapshotAssets.objects, "user_address_id"),
+        (ValidatorSnapshot.objects, "validator__user_address_id"),
+        (PoolBalanceSnapshot.objects, "pool_position__user_address_id"),
+        (TroveSnapshot.objects, "trove__user_address_id"),
+    ):
+        ids.update(rows.filter(snapshot=snapshot).values_list(field, flat=True))
+    return list(UserAddress.objects.filter(id__in=ids))
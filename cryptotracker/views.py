@@ -1,17 +1,19 @@
 from decimal import Decimal
 import logging
 from typing import Any, List, Type, cast, Optional
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 
-from celery.result import GroupResult
+from celery.result import AsyncResult, result_from_tuple
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from prometheus_client import CONTENT_TYPE_LATEST
 from web3 import Web3
 
 from cryptotracker.form import AccountForm, UserAddressForm, Dateform, SignUpForm, GenerateInviteCodeForm
@@ -21,7 +23,10 @@ from cryptotracker.eth_staking import get_aggregated_staking, get_last_validator
 from cryptotracker.tasks import run_daily_snapshot_update
 from cryptotracker.tokens import fetch_aggregated_assets
 from cryptotracker.constants import WALLET_TYPES
+from cryptotracker.prices import PriceMatrix
+from cryptotracker.metrics import render_metrics
 from cryptotracker.utils import get_last_price
+from cryptotracker.valuation import PortfolioValues, get_address_totals, get_value_history
 
 # Create your views here.
 
@@ -29,31 +34,20 @@ from cryptotracker.utils import get_last_price
 def calculate_total_value(
     user_addresses: List[UserAddress],
     snapshot: Optional[Snapshot] = None,
+    prices: Optional[PriceMatrix] = None,
 ) -> Decimal:
     """
     Helper function to calculate the total value for a given set of user_addresses.
+    The totals are read from the valuations stored when the snapshot completed; the given
+    prices are only used to value the addresses without one.
     """
     if not snapshot:
         snapshot = Snapshot.objects.first()
         if not snapshot:
             logging.warning("No snapshot available for calculating total value.")
             return Decimal(0)
-    aggregated_assets = fetch_aggregated_assets(user_addresses, snapshot=snapshot)
-    total_eth_staking = get_aggregated_staking(user_addresses, snapshot=snapshot)
-    total_protocols = get_protocols_snapshots(user_addresses, snapshot=snapshot)
-
-    total_value = Decimal(0)
-    for asset in aggregated_assets.values():
-        total_value += asset["amount_eur"]
-    if total_eth_staking:
-        total_value += total_eth_staking["balance_eur"]
-    if total_protocols:
-        for protocol_pools in total_protocols["pool_data"].values():
-            total_value += sum(data.balance_eur for data in protocol_pools)
-        if total_protocols["troves"]:
-            for trove in total_protocols["troves"]:
-                total_value += trove.balance
-    return total_value
+    totals = get_address_totals(user_addresses, snapshot, prices)
+    return sum((address_totals["total"] for address_totals in totals.values()), Decimal(0))
 
 
 def sign_up(request: HttpRequest) -> HttpResponse:
@@ -104,7 +98,9 @@ def portfolio(request: HttpRequest, date_str: Optional[str] = None) -> HttpRespo
         # If a date is provided, filter the snapshots by that date
         date = datetime.strptime(date_str, "%Y-%m-%d")
         last_snapshot_date = date
-        snapshot = Snapshot.objects.filter(date__date=date).first()
+        # A UTC range rather than date__date, so the lookup can use the date index
+        day_start = date.replace(tzinfo=timezone.utc)
+        snapshot = Snapshot.objects.filter(date__gte=day_start, date__lt=day_start + timedelta(days=1)).first()
         if not snapshot:
             # If no snapshot exists for the given date, use the most recent one
             error_warning = "No snapshot found for the given date. Using the most recent snapshot instead."
@@ -120,12 +116,19 @@ def portfolio(request: HttpRequest, date_str: Optional[str] = None) -> HttpRespo
     else:
         form = Dateform(initial={"date": date})
 
-    aggregated_assets = fetch_aggregated_assets(user_addresses, snapshot=snapshot)
-    total_eth_staking = get_aggregated_staking(user_addresses, snapshot=snapshot)
-    total_protocols = get_protocols_snapshots(user_addresses, snapshot=snapshot)
-    portfolio_value = calculate_total_value(user_addresses, snapshot=snapshot)
+    # Resolved once, so that the helpers do not each look up the last snapshot
+    snapshot = snapshot or last_snapshot
+    prices = PriceMatrix.for_snapshot(snapshot) if snapshot else None
+    aggregated_assets = fetch_aggregated_assets(user_addresses, snapshot=snapshot, prices=prices)
+    total_eth_staking = get_aggregated_staking(user_addresses, snapshot=snapshot, prices=prices)
+    total_protocols = get_protocols_snapshots(user_addresses, snapshot=snapshot, prices=prices)
+    portfolio_value = calculate_total_value(user_addresses, snapshot=snapshot, prices=prices)
     error_logs = (
-        SnapshotError.objects.filter(snapshot=last_snapshot) if last_snapshot else []
+        SnapshotError.objects.filter(snapshot=last_snapshot).select_related(
+            "error_log__error_type", "error_log__user_address"
+        )
+        if last_snapshot
+        else []
     )
 
     context = {
@@ -145,6 +148,51 @@ def portfolio(request: HttpRequest, date_str: Optional[str] = None) -> HttpRespo
     return render(request, "portfolio.html", context)
 
 
+@login_required()
+def portfolio_history(request: HttpRequest) -> JsonResponse:
+    """
+    Return the value history of the portfolio as JSON, read from the stored valuations.
+    Query parameters:
+        account (int, optional): Restrict the history to the addresses of an account.
+        address (str, optional): Restrict the history to one address.
+        start, end (YYYY-MM-DD, optional): The date range (default: the last year).
+        interval (str, optional): "day" (default), "week" or "month".
+    """
+    user = cast(User, request.user)
+    user_addresses = UserAddress.objects.filter(user=user)
+    if request.GET.get("address"):
+        user_addresses = user_addresses.filter(public_address=request.GET["address"])
+
+    interval = request.GET.get("interval", "day")
+    try:
+        if request.GET.get("account"):
+            user_addresses = user_addresses.filter(
+                account_id=int(request.GET["account"])
+            )
+        end = (
+            datetime.strptime(request.GET["end"], "%Y-%m-%d").date()
+            if request.GET.get("end")
+            else datetime.now(timezone.utc).date()
+        )
+        start = (
+            datetime.strptime(request.GET["start"], "%Y-%m-%d").date()
+            if request.GET.get("start")
+            else end - timedelta(days=365)
+        )
+        points = get_value_history(user_addresses, start, end, interval)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(
+        {
+            "interval": interval,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "points": points,
+        }
+    )
+
+
 @login_required()
 def staking(request: HttpRequest) -> HttpResponse:
     user = cast(User, request.user)
@@ -169,9 +217,11 @@ def accounts(request: HttpRequest) -> HttpResponse:
     accounts = list(Account.objects.filter(user=user))
 
     if accounts:
+        # Value every address once and sum them per account
+        values = PortfolioValues(UserAddress.objects.filter(user=user))
+        account_values = values.by(lambda user_address: user_address.account_id)
         for account in accounts:
-            user_addresses = list(UserAddress.objects.filter(account=account))
-            account_value = calculate_total_value(user_addresses)
+            account_value = account_values.get(account.id, Decimal(0))
             account_detail = {
                 "account": account,
                 "balance": f"{account_value:,.2f}",
@@ -220,9 +270,10 @@ def delete_object(
 def user_addresses(request: HttpRequest) -> HttpResponse:
     addresses_detail = []
     user = cast(User, request.user)  # Ensure user is cast to User explicitly
-    user_addresses = list(UserAddress.objects.filter(user=user))
+    user_addresses = list(UserAddress.objects.filter(user=user).select_related("account", "wallet_type"))
+    values = PortfolioValues(user_addresses)
     for user_address in user_addresses:
-        address_value = calculate_total_value([user_address])
+        address_value = values.address(user_address)
 
         address_detail = {
             "user_address": user_address,
@@ -263,17 +314,18 @@ def address_detail(request: HttpRequest, public_address: str) -> HttpResponse:
     user_address = UserAddress.objects.get(user=user, public_address=public_address)
     user_addresses = [user_address]
 
-    aggregated_assets = fetch_aggregated_assets(user_addresses)
-    total_eth_staking = get_aggregated_staking(user_addresses)
-    total_protocols = get_protocols_snapshots(user_addresses)
-    portfolio_value = calculate_total_value(user_addresses)
-
     last_snapshot = Snapshot.objects.first()
+    prices = PriceMatrix.for_snapshot(last_snapshot) if last_snapshot else None
+    aggregated_assets = fetch_aggregated_assets(user_addresses, snapshot=last_snapshot, prices=prices)
+    total_eth_staking = get_aggregated_staking(user_addresses, snapshot=last_snapshot, prices=prices)
+    total_protocols = get_protocols_snapshots(user_addresses, snapshot=last_snapshot, prices=prices)
+    portfolio_value = calculate_total_value(user_addresses, snapshot=last_snapshot, prices=prices)
+
     last_snapshot_date = last_snapshot.date if last_snapshot else None
     errors = (
         SnapshotError.objects.filter(
             snapshot=last_snapshot, error_log__user_address=user_address
-        )
+        ).select_related("error_log__error_type", "error_log__user_address")
         if last_snapshot
         else []
     )
@@ -309,10 +361,9 @@ def rewards(request: HttpRequest) -> HttpResponse:
         validators = get_last_validators(user_addresses, snapshot=snapshot)
 
         if validators:
+            # All the validators are from the same snapshot, so they share the price
+            current_price = get_last_price("ethereum", snapshot=snapshot.date)
             for validator in validators:
-                current_price = get_last_price(
-                    "ethereum", snapshot=validator.snapshot.date
-                )
                 eth_rewards += validator.rewards * current_price
 
     # Get protocol rewards
@@ -361,15 +412,14 @@ def logout_view(request: HttpRequest) -> None:
 @login_required()
 def refresh(request: HttpRequest) -> HttpResponse:
     """
-    Trigger the tasks asynchronously with a shared Snapshot.
+    Trigger the snapshot work units asynchronously with a shared Snapshot.
+    The snapshot is created and pinned to its blocks by the task, not in the request.
     """
     user = cast(User, request.user)
 
-    task_group_result = run_daily_snapshot_update(user.id)
+    snapshot_task = run_daily_snapshot_update.delay(user.id)
 
-    request.session["task_group_id"] = task_group_result.id
-
-    task_group_result.save()
+    request.session["snapshot_task_id"] = snapshot_task.id
 
     return redirect(reverse("waiting_page"))
 
@@ -379,35 +429,39 @@ def waiting_page(request: HttpRequest) -> HttpResponse:
     """
     Render the waiting page and check task status.
     """
-    task_group_id = request.session.get("task_group_id")
-    logging.info(f"Task group ID: {task_group_id}")
+    snapshot_task_id = request.session.get("snapshot_task_id")
+    logging.info(f"Snapshot task ID: {snapshot_task_id}")
 
-    if not task_group_id:
+    if not snapshot_task_id:
         return redirect(reverse("portfolio"))
 
-    return render(request, "waiting_page.html", {"task_group_id": task_group_id})
+    return render(
+        request, "waiting_page.html", {"snapshot_task_id": snapshot_task_id}
+    )
 
 
 @login_required()
 def check_task_status(request: HttpRequest) -> JsonResponse:
     """
-    Check the status of the task group and return a JSON response.
+    Check the status of the snapshot completion callback and return a JSON response.
     """
-    task_group_id = request.session.get("task_group_id")
-    if not task_group_id:
+    snapshot_task_id = request.session.get("snapshot_task_id")
+    if not snapshot_task_id:
         return JsonResponse({"status": "complete"})
 
-    logging.info(f"Checking task group ID: {task_group_id}")
+    logging.info(f"Checking snapshot task ID: {snapshot_task_id}")
 
-    task_group_result = GroupResult.restore(task_group_id)
+    snapshot_task = AsyncResult(snapshot_task_id)
+    if not snapshot_task.ready():
+        return JsonResponse({"status": "pending"})
+    if snapshot_task.successful() and snapshot_task.result:
+        # The task returns the completion callback of the work units, stored as a tuple,
+        # which runs once they are all done
+        callback_id = result_from_tuple(snapshot_task.result).id
+        if not AsyncResult(callback_id).ready():
+            return JsonResponse({"status": "pending"})
 
-    logging.info(task_group_result)
-
-    if task_group_result and task_group_result.ready():
-        # All tasks are complete
-        return JsonResponse({"status": "complete"})
-
-    return JsonResponse({"status": "pending"})
+    return JsonResponse({"status": "complete"})
 
 
 @login_required()
@@ -416,21 +470,22 @@ def statistics(request: HttpRequest) -> HttpResponse:
     Show some statistics of the portfolio.
     """
     user = cast(User, request.user)
-    user_addresses = list(UserAddress.objects.filter(user=user))
+    user_addresses = UserAddress.objects.filter(user=user).select_related("wallet_type")
 
+    # Value every address once, then roll the values up per wallet type and account
+    values = PortfolioValues(user_addresses)
+    values_by_wallet = values.by(lambda addr: addr.wallet_type.name)
     wallet_values = {
-        wallet: calculate_total_value(
-            list(filter(lambda addr: addr.wallet_type.name == wallet, user_addresses))
-        )
+        wallet: values_by_wallet.get(wallet, Decimal(0))
         for wallet in WALLET_TYPES.values()
     }
 
     # Amount (EUR) per account
     accounts_detail = []
     accounts = list(Account.objects.filter(user=user))
+    values_by_account = values.by(lambda addr: addr.account_id)
     for account in accounts:
-        account_addresses = list(UserAddress.objects.filter(account=account))
-        account_value = calculate_total_value(account_addresses)
+        account_value = values_by_account.get(account.id, Decimal(0))
         accounts_detail.append(
             {
                 "account": account,
@@ -546,3 +601,13 @@ def toggle_admin_status(request: HttpRequest, user_id: int) -> HttpResponse:
         "target_user": target_user,
     }
     return render(request, "admin/toggle_admin.html", context)
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Serves the metrics of the web process in the Prometheus text format,
+    to the scrapers listed in settings.METRICS_ALLOWED_IPS only.
+    """
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,286 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    cast,
+)
+
+from django.db import models, transaction
+
+from cryptotracker.models import (
+    Cryptocurrency,
+    Pool,
+    PoolBalanceSnapshot,
+    PoolPosition,
+    PoolRewardsSnapshot,
+    Snapshot,
+    SnapshotAssets,
+    TroveSnapshot,
+    UserAddress,
+    ValidatorSnapshot,
+)
+from cryptotracker.timing import record_write
+
+# Unique key and value fields of the snapshot tables. Rows are upserted on their key
+# (INSERT ... ON CONFLICT DO UPDATE), so a retried work unit overwrites its rows.
+UPSERT_FIELDS: Dict[Type[models.Model], Tuple[List[str], List[str]]] = {
+    SnapshotAssets: (["snapshot", "user_address", "cryptocurrency"], ["quantity"]),
+    ValidatorSnapshot: (["snapshot", "validator"], ["balance", "status", "rewards"]),
+    PoolBalanceSnapshot: (["snapshot", "pool_position", "token"], ["quantity"]),
+    PoolRewardsSnapshot: (["snapshot", "pool_position", "token"], ["quantity"]),
+    TroveSnapshot: (
+        ["snapshot", "trove"],
+        ["collateral", "debt", "balance", "interest_rate"],
+    ),
+}
+
+
+class PendingPoolRow(NamedTuple):
+    pool: Pool
+    user_address: UserAddress
+    position_id: Optional[str]
+    token_symbol: str
+    quantity: Decimal
+    is_reward: bool
+
+
+class SnapshotWriter:
+    """
+    Buffers the rows written by a work unit of a snapshot and writes them with one
+    bulk_create per table, all in a single transaction. Nothing is written when the
+    unit fails, and the shared database is locked once per unit instead of once per row.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self._rows: Dict[Type[models.Model], List[models.Model]] = defaultdict(list)
+        self._pool_rows: List[PendingPoolRow] = []
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+
+    def add(self, row: models.Model) -> None:
+        """
+        Buffers a row whose foreign keys are already saved.
+        Args:
+            row (Model): An unsaved model instance.
+        """
+        self._rows[type(row)].append(row)
+
+    def add_pool_row(
+        self,
+        pool: Pool,
+        user_address: UserAddress,
+        token_symbol: str,
+        quantity: Decimal,
+        is_reward: bool = False,
+        position_id: Optional[str] = None,
+    ) -> None:
+        """
+        Buffers a pool balance or reward. Its pool position and token are resolved on flush.
+        Args:
+            pool (Pool): The pool.
+            user_address (UserAddress): The owner of the position.
+            token_symbol (str): The symbol of the token.
+            quantity (Decimal): The quantity of the token.
+            is_reward (bool): Whether the row is a reward (default: False).
+            position_id (str, optional): The ID of the position within the pool (default: None).
+        """
+        self._pool_rows.append(
+            PendingPoolRow(
+                pool, user_address, position_id, token_symbol, quantity, is_reward
+            )
+        )
+
+    def discard(self) -> None:
+        self._rows.clear()
+        self._pool_rows.clear()
+
+    def flush(self) -> int:
+        """
+        Writes the buffered rows in one transaction and empties the buffer.
+        Returns:
+            int: The number of rows written.
+        """
+        count = 0
+        start = time.perf_counter()
+        with transaction.atomic():
+            for row in self._build_pool_rows():
+                self.add(row)
+            for model, rows in self._rows.items():
+                count += bulk_upsert(model, rows)
+        record_write(time.perf_counter() - start, count)
+        self.discard()
+        if count:
+            logging.info(f"Wrote {count} rows of snapshot {self.snapshot.id}")
+        return count
+
+    def _build_pool_rows(self) -> List[models.Model]:
+        if not self._pool_rows:
+            return []
+
+        tokens = {
+            token.symbol: token
+            for token in Cryptocurrency.objects.filter(
+                symbol__in={row.token_symbol for row in self._pool_rows}
+            )
+        }
+        positions = self._get_or_create_positions()
+
+        rows: List[models.Model] = []
+        for row in self._pool_rows:
+            token = tokens.get(row.token_symbol)
+            if token is None:
+                logging.warning(
+                    f"Error saving pool {row.pool} {'reward' if row.is_reward else 'balance'}: "
+                    f"unknown token {row.token_symbol}"
+                )
+                continue
+            snapshot_model = (
+                PoolRewardsSnapshot if row.is_reward else PoolBalanceSnapshot
+            )
+            rows.append(
+                snapshot_model(
+                    pool_position=positions[_position_key(row)],
+                    token=token,
+                    quantity=row.quantity,
+                    snapshot=self.snapshot,
+                )
+            )
+        return rows
+
+    def _get_or_create_positions(
+        self,
+    ) -> Dict[Tuple[int, int, Optional[str]], PoolPosition]:
+        """
+        Loads the pool positions of the buffered rows with one query and creates the missing ones.
+        """
+        keys = {_position_key(row) for row in self._pool_rows}
+        positions = _load_positions(keys)
+        missing = [
+            PoolPosition(user_address_id=key[0], pool_id=key[1], position_id=key[2])
+            for key in keys
+            if key not in positions
+        ]
+        if not missing:
+            return positions
+
+        # Another worker may create the same positions meanwhile, so conflicts are
+        # ignored and the positions loaded again (their IDs are not returned then)
+        PoolPosition.objects.bulk_create(missing, ignore_conflicts=True)
+        logging.info(f"Created {len(missing)} new pool positions")
+        return _load_positions(keys)
+
+
+def _load_positions(
+    keys: Iterable[Tuple[int, int, Optional[str]]],
+) -> Dict[Tuple[int, int, Optional[str]], PoolPosition]:
+    keys = list(keys)
+    return {
+        (position.user_address_id, position.pool_id, position.position_id): position
+        for position in PoolPosition.objects.filter(
+            user_address_id__in={key[0] for key in keys},
+            pool_id__in={key[1] for key in keys},
+        )
+    }
+
+
+def _position_key(row: PendingPoolRow) -> Tuple[int, int, Optional[str]]:
+    return (row.user_address.id, row.pool.id, row.position_id)
+
+
+def bulk_upsert(model: Type[models.Model], rows: Iterable[models.Model]) -> int:
+    """
+    Writes rows of a snapshot table with one statement, updating the rows of the same key.
+    Args:
+        model (Model): The model of the rows.
+        rows (list): Unsaved model instances.
+    Returns:
+        int: The number of rows written.
+    """
+    if model not in UPSERT_FIELDS:
+        return len(model._default_manager.bulk_create(rows))
+
+    unique_fields, update_fields = UPSERT_FIELDS[model]
+    attnames = [
+        cast(models.Field, model._meta.get_field(field)).attname
+        for field in unique_fields
+    ]
+    # A statement cannot update the same row twice, so the last row of a key wins
+    unique_rows = {
+        tuple(getattr(row, attname) for attname in attnames): row for row in rows
+    }
+    model._default_manager.bulk_create(
+        list(unique_rows.values()),
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+    return len(unique_rows)
+
+
+@contextmanager
+def snapshot_writer(
+    snapshot: Snapshot, writer: Optional[SnapshotWriter] = None
+) -> Iterator[SnapshotWriter]:
+    """
+    Yields the given writer, or a new one that is flushed when the context exits.
+    Lets a fetcher either join the writer of its work unit or write on its own.
+    Args:
+        snapshot (Snapshot): The snapshot the rows belong to.
+        writer (SnapshotWriter, optional): The writer of the enclosing work unit.
+    Yields:
+        SnapshotWriter: The writer to buffer the rows in.
+    """
+    if writer is not None:
+        yield writer
+        return
+    with SnapshotWriter(snapshot) as own_writer:
+        yield own_writer
+
+
+def save_row(row: models.Model, writer: Optional[SnapshotWriter] = None) -> None:
+    """
+    Buffers a row in the writer of the work unit, or saves it immediately when not given.
+    Args:
+        row (Model): An unsaved model instance.
+        writer (SnapshotWriter, optional): The writer of the work unit.
+    """
+    if writer is None:
+        row.save()
+    else:
+        writer.add(row)
+
+
+def save_rows(
+    rows: List[models.Model], writer: Optional[SnapshotWriter] = None
+) -> None:
+    """
+    Buffers rows of one table in the writer of the work unit, or bulk creates them when not given.
+    Args:
+        rows (list): Unsaved model instances of the same model.
+        writer (SnapshotWriter, optional): The writer of the work unit.
+    """
+    if not rows:
+        return
+    if writer is None:
+        bulk_upsert(type(rows[0]), rows)
+    else:
+        for row in rows:
+            writer.add(row)
@@ -6,7 +6,15 @@ from django.conf import settings
 
 from celery import Celery
 from celery.schedules import crontab
-from celery.signals import setup_logging, task_failure
+from celery.signals import (
+    setup_logging,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+    worker_ready,
+)
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "dcp.settings")
 app = Celery("dcp")
@@ -37,4 +45,59 @@ def log_task_failure(sender=None, task_id=None, exception=None,
             'task_kwargs': kwargs,
         },
         exc_info=(type(exception), exception, traceback)
-    )
\ No newline at end of file
+    )
+
+@worker_process_shutdown.connect
+def close_provider_connections(*args, **kwargs):
+    from cryptotracker.providers import provider_manager
+
+    provider_manager.close_all()
+
+
+@worker_process_shutdown.connect
+def drop_process_metrics(pid=None, *args, **kwargs):
+    from cryptotracker.metrics import process_exited
+
+    process_exited(pid or os.getpid())
+
+
+@worker_init.connect
+def reset_worker_metrics(*args, **kwargs):
+    from cryptotracker.metrics import reset_multiprocess_metrics
+
+    reset_multiprocess_metrics()
+
+
+@worker_ready.connect
+def serve_worker_metrics(*args, **kwargs):
+    from cryptotracker.metrics import start_metrics_server
+
+    start_metrics_server(settings.METRICS_WORKER_PORT, settings.METRICS_WORKER_ADDR)
+
+
+@worker_ready.connect
+def seed_abi_cache(*args, **kwargs):
+    from cryptotracker.abi import abi_store
+
+    abi_store.seed()
+
+
+@task_prerun.connect
+def reset_price_memo(*args, **kwargs):
+    from cryptotracker.utils import clear_price_memo
+
+    clear_price_memo()
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, *args, **kwargs):
+    from cryptotracker.metrics import task_started
+
+    task_started(task_id)
+
+
+@task_postrun.connect
+def record_task_metrics(task_id=None, task=None, state=None, *args, **kwargs):
+    from cryptotracker.metrics import task_finished
+
+    task_finished(task_id, task.name, state)
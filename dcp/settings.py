@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "cryptotracker.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "cryptotracker.middleware.PriceMemoMiddleware",
 ]
 
 ROOT_URLCONF = "dcp.urls"
@@ -99,13 +101,83 @@ CELERY_ENABLE_UTC = True
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# PostgreSQL when POSTGRES_DB is set, the shared SQLite file otherwise
+
+POSTGRES_DB = os.environ.get("POSTGRES_DB")
+
+# The web process and every Celery worker share the same SQLite file, so:
+# - WAL lets readers run while a worker writes, and synchronous=NORMAL is safe with it
+# - writers wait up to SQLITE_TIMEOUT seconds for the lock instead of failing at once
+# - transactions take the write lock when they begin (BEGIN IMMEDIATE), so two
+#   workers never both read then fail to upgrade to a write lock midway
+
+SQLITE_DATABASE = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": BASE_DIR / "data/db.sqlite3",
+    "OPTIONS": {
+        "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+        "timeout": int(os.environ.get("SQLITE_TIMEOUT", 20)),
+        "transaction_mode": "IMMEDIATE",
+    },
+}
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "data/db.sqlite3",
+# The web process serves requests from a pool of connections (psycopg_pool).
+# Celery workers run one task at a time per process, so they set POSTGRES_POOL=False
+# and keep their single connection open for POSTGRES_CONN_MAX_AGE seconds instead.
+# Django does not allow both at once.
+POSTGRES_POOL = os.environ.get("POSTGRES_POOL", "True") == "True"
+
+if POSTGRES_DB:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": POSTGRES_DB,
+            "USER": os.environ.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": (
+                0 if POSTGRES_POOL else int(os.environ.get("POSTGRES_CONN_MAX_AGE", 600))
+            ),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": (
+                {
+                    "pool": {
+                        "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 2)),
+                        "max_size": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 10)),
+                        "timeout": int(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+                    }
+                }
+                if POSTGRES_POOL
+                else {}
+            ),
+        },
+        # The previous SQLite file, read by the sqlite_to_postgres command
+        "sqlite": SQLITE_DATABASE,
+    }
+else:
+    DATABASES = {"default": SQLITE_DATABASE}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Shared by the web process and the workers through Redis when available
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"{REDIS_URL}/1",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
     }
-}
 
 
 # Password validation
@@ -132,6 +204,26 @@ AUTH_PASSWORD_VALIDATORS = [
 
 STATIC_URL = "/static/"
 
+# On-disk ABI store of the contracts read by the snapshot tasks
+ABI_CACHE_DIR = BASE_DIR / "data/abi_cache"
+
+# Base URLs of the APIs read by the snapshot tasks
+COINGECKO_API_URL = os.environ.get("COINGECKO_API_URL", "https://api.coingecko.com/api/v3")
+BEACONCHAIN_API_URL = os.environ.get("BEACONCHAIN_API_URL", "https://beaconcha.in/api/v1")
+THE_GRAPH_API_URL = os.environ.get("THE_GRAPH_API_URL", "https://gateway.thegraph.com/api")
+
+# JSON-RPC nodes used instead of the ape provider of a chain,
+# e.g. "ethereum:mainnet=http://localhost:8545,base:mainnet=http://localhost:8546"
+RPC_URLS = dict(
+    item.split("=", 1) for item in os.environ.get("RPC_URLS", "").split(",") if item
+)
+
+# Prometheus metrics, served by the web process at /metrics to these client IPs only,
+# and by each Celery worker on METRICS_WORKER_ADDR:METRICS_WORKER_PORT (0 to disable)
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+METRICS_WORKER_ADDR = os.environ.get("METRICS_WORKER_ADDR", "127.0.0.1")
+METRICS_WORKER_PORT = int(os.environ.get("METRICS_WORKER_PORT", 9808))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 